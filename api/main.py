@@ -17,7 +17,7 @@ from datetime import datetime
 
 from fastapi import FastAPI, HTTPException, Header, UploadFile, File, status, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field, validator
 
 # Add project root to path
@@ -36,9 +36,12 @@ from src.analytics.kpi_queries import (
     compute_delivery_metrics,
     compute_seasonal_trends,
     compute_customer_segmentation,
-    _table_cache,
+    get_pool_stats,
+    get_cache_stats,
+    clear_kpi_cache,
 )
-from src.analytics.schema_inspector import load_business_context
+from src.analytics.schema_inspector import load_business_context, discover_tables
+from src.ingestion import event_log
 from api.context_manager import get_business_contexts, save_business_contexts
 from src.utils.logging_config import get_logger
 
@@ -76,13 +79,6 @@ app = FastAPI(
     version="1.0.0",
 )
 
-@app.on_event("startup")
-def clear_caches_on_startup():
-    """Invalidate table cache on server (re)start so we always discover fresh paths."""
-    import src.analytics.kpi_queries as kpi_mod
-    kpi_mod._table_cache = None
-    logger.info("Table cache cleared on startup")
-
 # ── Auth Helpers ─────────────────────────────────────
 
 def get_role(x_user_role: str = Header(default="customer")) -> str:
@@ -390,6 +386,18 @@ def health_check():
 
 
 
+@app.get("/api/metrics/kpi-pool")
+def kpi_pool_metrics():
+    """DuckDB cursor pool metrics: size, in-use, wait times and saturation."""
+    return get_pool_stats()
+
+
+@app.get("/api/metrics/kpi-cache")
+def kpi_cache_metrics():
+    """KPI result cache metrics: hits, misses, evictions, memory and Gold generation."""
+    return get_cache_stats()
+
+
 # ── File Upload & Pipeline Endpoints ────────────────
 
 @app.post("/api/upload/scan")
@@ -638,12 +646,8 @@ async def process_mapped_file(
         output_path = raw_dir / f"{file_type}_{timestamp}.csv"
         df.to_csv(output_path, index=False)
         
-        # Clear KPI cache
-        import src.analytics.kpi_queries as kpi_mod
-        kpi_mod._table_cache = None
-        
-        # Run pipeline
-        pipeline_result = run_transformation_pipeline()
+        # Queue the pipeline; concurrent uploads coalesce into one run
+        pipeline_job = queue_transformation_pipeline(f"upload:{output_path.name}")
         
         # Clean up staging
         try:
@@ -657,7 +661,8 @@ async def process_mapped_file(
             "rows": len(df),
             "columns": list(df.columns),
             "output_file": output_path.name,
-            "pipeline": pipeline_result,
+            "job_id": pipeline_job["id"],
+            "pipeline": pipeline_job,
         }
         
     except HTTPException:
@@ -727,12 +732,8 @@ async def upload_dataset(
         
         tables_detected = auto_detect_and_save(df, raw_dir, filename)
         
-        # Clear the KPI table cache so new data is picked up
-        import src.analytics.kpi_queries as kpi_mod
-        kpi_mod._table_cache = None
-        
-        # Run the transformation pipeline
-        pipeline_result = run_transformation_pipeline()
+        # Queue the transformation pipeline; concurrent uploads coalesce into one run
+        pipeline_job = queue_transformation_pipeline(f"upload:{filename}")
         
         return {
             "status": "success",
@@ -740,7 +741,8 @@ async def upload_dataset(
             "rows": len(df),
             "columns": list(df.columns),
             "tables_detected": tables_detected,
-            "pipeline": pipeline_result,
+            "job_id": pipeline_job["id"],
+            "pipeline": pipeline_job,
         }
         
     except HTTPException:
@@ -942,42 +944,64 @@ def best_effort_transaction_mapping(df) -> 'pd.DataFrame':
     return result
 
 
-def run_transformation_pipeline() -> dict:
-    """Run the Bronze -> Silver -> Gold transformation pipeline."""
-    try:
-        pipeline_path = PROJECT_ROOT / "src" / "transformation" / "pipeline.py"
-        
-        result = subprocess.run(
-            [sys.executable, str(pipeline_path)],
-            cwd=str(PROJECT_ROOT),
-            capture_output=True,
-            text=True,
-            timeout=120,
-            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
-        )
-        
-        if result.returncode == 0:
-            return {"status": "success", "message": "Pipeline completed", "output": result.stdout}
-        else:
-            return {"status": "error", "message": "Pipeline failed", "error": result.stderr}
-    except subprocess.TimeoutExpired:
-        return {"status": "error", "message": "Pipeline timed out (>120s)"}
-    except Exception as e:
-        return {"status": "error", "message": f"Pipeline error: {str(e)}"}
+def queue_transformation_pipeline(trigger: str) -> dict:
+    """Queue a Bronze -> Silver -> Gold run on the in-process worker; returns the job."""
+    from src.transformation.engine import submit_job
+    return submit_job(trigger)
 
 
 @app.post("/api/pipeline/run")
-async def trigger_pipeline(x_user_role: str = Header(default="customer", alias="X-User-Role")):
-    """Manually trigger the transformation pipeline."""
+async def trigger_pipeline(
+    wait: bool = False,
+    x_user_role: str = Header(default="customer", alias="X-User-Role"),
+):
+    """Manually trigger the transformation pipeline.
+    Returns the queued job; with ?wait=true, waits for and returns the run result."""
     if x_user_role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Clear the KPI table cache
-    import src.analytics.kpi_queries as kpi_mod
-    kpi_mod._table_cache = None
-    
-    result = run_transformation_pipeline()
-    return result
+    if wait:
+        from src.transformation.engine import run_pipeline_async
+        return await run_pipeline_async(trigger="manual")
+    return queue_transformation_pipeline("manual")
+
+
+@app.get("/api/pipeline/status")
+def get_pipeline_status():
+    """Pending pipeline triggers (from any process), the last run and the lease holder."""
+    from src.transformation.coordinator import coordinator_status
+    return coordinator_status()
+
+
+@app.get("/api/pipeline/runs")
+def list_pipeline_runs(limit: int = 20):
+    """Recorded pipeline runs, newest first, with per-stage time, rows, bytes and peak memory."""
+    from src.transformation.run_metrics import load_run_history
+    return {"runs": load_run_history(limit)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Pipeline run metrics in Prometheus text exposition format."""
+    from src.transformation.run_metrics import prometheus_text
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/jobs")
+def list_pipeline_jobs(limit: int = 20):
+    """Recent pipeline jobs, newest first."""
+    from src.transformation.engine import list_jobs
+    return {"jobs": list_jobs(limit)}
+
+
+@app.get("/api/jobs/{job_id}")
+def get_pipeline_job(job_id: str):
+    """Status, per-stage progress and (once finished) result of a pipeline job."""
+    from src.transformation.engine import get_job
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
 
 
 @app.delete("/api/data/reset")
@@ -987,8 +1011,12 @@ async def reset_data(x_user_role: str = Header(default="customer", alias="X-User
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
+        # Release the warehouse snapshot before its directory is removed
+        from src.analytics import warehouse
+        warehouse.close_read_connection()
+        
         # Clear data directories (but NOT streaming - it needs to persist)
-        for dir_name in ["raw", "silver", "gold"]:
+        for dir_name in ["raw", "silver", "gold", "warehouse"]:
             dir_path = PROJECT_ROOT / "data" / dir_name
             if dir_path.exists():
                 shutil.rmtree(dir_path)
@@ -998,30 +1026,25 @@ async def reset_data(x_user_role: str = Header(default="customer", alias="X-User
         streaming_dir = PROJECT_ROOT / "data" / "streaming"
         streaming_dir.mkdir(parents=True, exist_ok=True)
         
-        streaming_buffer = streaming_dir / "events.jsonl"
-        marker_file = streaming_dir / "last_processed.txt"
         seed_marker = streaming_dir / ".seeded"
         
-        # Clear existing files
-        if streaming_buffer.exists():
-            streaming_buffer.unlink()
-        if marker_file.exists():
-            marker_file.unlink()
+        # Drop every log segment and consumer offset, plus pre-segmentation files
+        event_log.reset_log()
+        for name in ("events.jsonl", "processor_state.json", "last_processed.txt"):
+            path = streaming_dir / name
+            if path.exists():
+                path.unlink()
         # Also clear the seed marker so the next stream start will fully reseed
         # users/products/inventory, not assume prior base data still exists.
         if seed_marker.exists():
             seed_marker.unlink()
         
-        # Recreate marker at 0
-        marker_file.write_text("0")
-        
         # Ensure staging directory exists for column mapping
         staging_dir = PROJECT_ROOT / "data" / "staging"
         staging_dir.mkdir(parents=True, exist_ok=True)
         
-        # Clear the KPI table cache
-        import src.analytics.kpi_queries as kpi_mod
-        kpi_mod._table_cache = None
+        # Cached KPI results belong to the deleted Gold generation
+        clear_kpi_cache()
         
         return {"status": "success", "message": "All data has been cleared"}
     except Exception as e:
@@ -1036,14 +1059,12 @@ def get_data_quality_kpis(role: str = Header(default="customer", alias="X-User-R
     try:
         import duckdb
         
-        gold_dir = PROJECT_ROOT / "data" / "gold"
-        fact_txn_path = gold_dir / "fact_transactions.parquet"
+        fact_txn = discover_tables("data/gold").get("fact_transactions")
         
-        if not fact_txn_path.exists():
+        if not fact_txn:
             return {"completeness": 0, "accuracy": 0, "consistency": 0, "timeliness": 0}
         
         conn = duckdb.connect()
-        gold_path = str(gold_dir).replace("\\", "/")
         
         # Completeness: % of non-null values in key columns
         completeness_result = conn.sql(f"""
@@ -1054,14 +1075,14 @@ def get_data_quality_kpis(role: str = Header(default="customer", alias="X-User-R
                          SUM(CASE WHEN user_key IS NULL THEN 1 ELSE 0 END) AS DOUBLE) /
                     (COUNT(*) * 3.0)
                 )) * 100 as completeness
-            FROM read_parquet('{gold_path}/fact_transactions.parquet')
+            FROM {fact_txn}
         """).fetchone()
         
         # Accuracy: % of positive amounts
         accuracy_result = conn.sql(f"""
             SELECT 
                 CAST(SUM(CASE WHEN amount > 0 THEN 1 ELSE 0 END) AS DOUBLE) / NULLIF(COUNT(*), 0) * 100 as accuracy
-            FROM read_parquet('{gold_path}/fact_transactions.parquet')
+            FROM {fact_txn}
         """).fetchone()
         
         # Consistency: % of records with valid foreign keys
@@ -1069,7 +1090,7 @@ def get_data_quality_kpis(role: str = Header(default="customer", alias="X-User-R
             SELECT 
                 CAST(SUM(CASE WHEN user_key != -1 AND product_key != -1 THEN 1 ELSE 0 END) AS DOUBLE) / 
                 NULLIF(COUNT(*), 0) * 100 as consistency
-            FROM read_parquet('{gold_path}/fact_transactions.parquet')
+            FROM {fact_txn}
         """).fetchone()
         
         conn.close()
@@ -1090,14 +1111,12 @@ def get_data_quality_trend(role: str = Header(default="customer", alias="X-User-
     try:
         import duckdb
         
-        gold_dir = PROJECT_ROOT / "data" / "gold"
-        fact_txn_path = gold_dir / "fact_transactions.parquet"
+        fact_txn = discover_tables("data/gold").get("fact_transactions")
         
-        if not fact_txn_path.exists():
+        if not fact_txn:
             return []
         
         conn = duckdb.connect()
-        gold_path = str(gold_dir).replace("\\", "/")
         
         df = conn.sql(f"""
             SELECT 
@@ -1105,7 +1124,7 @@ def get_data_quality_trend(role: str = Header(default="customer", alias="X-User-
                 (1.0 - CAST(SUM(CASE WHEN amount IS NULL THEN 1 ELSE 0 END) AS DOUBLE) / NULLIF(COUNT(*), 0)) * 100 as completeness,
                 CAST(SUM(CASE WHEN amount > 0 THEN 1 ELSE 0 END) AS DOUBLE) / NULLIF(COUNT(*), 0) * 100 as accuracy,
                 CAST(SUM(CASE WHEN user_key != -1 THEN 1 ELSE 0 END) AS DOUBLE) / NULLIF(COUNT(*), 0) * 100 as consistency
-            FROM read_parquet('{gold_path}/fact_transactions.parquet')
+            FROM {fact_txn}
             GROUP BY strftime(timestamp, '%Y-%m')
             ORDER BY month
         """).df()
@@ -1122,20 +1141,18 @@ def get_data_quality_checks(role: str = Header(default="customer", alias="X-User
     try:
         import duckdb
         
-        gold_dir = PROJECT_ROOT / "data" / "gold"
         checks = []
         now = datetime.now().isoformat()
         
-        # Check each gold table
-        for table_file in gold_dir.glob("*.parquet"):
+        # Check each gold table (single files and partitioned directories)
+        for table_name, read_expr in discover_tables("data/gold").items():
             try:
                 conn = duckdb.connect()
-                table_path = str(table_file).replace("\\", "/")
-                result = conn.sql(f"SELECT COUNT(*) as cnt FROM read_parquet('{table_path}')").fetchone()
+                result = conn.sql(f"SELECT COUNT(*) as cnt FROM {read_expr}").fetchone()
                 conn.close()
                 
                 checks.append({
-                    "check": table_file.stem,
+                    "check": table_name,
                     "status": "pass" if result[0] > 0 else "warning",
                     "records": result[0],
                     "issues": 0,
@@ -1143,7 +1160,7 @@ def get_data_quality_checks(role: str = Header(default="customer", alias="X-User
                 })
             except Exception:
                 checks.append({
-                    "check": table_file.stem,
+                    "check": table_name,
                     "status": "fail",
                     "records": 0,
                     "issues": 1,
@@ -1287,17 +1304,24 @@ def get_stream_status():
                     stream_state["processor_pid"] = None
                     break
     
-    # Count events from buffer
-    buffer_path = PROJECT_ROOT / "data" / "streaming" / "events.jsonl"
-    events_count = 0
-    if buffer_path.exists():
-        with open(buffer_path, 'r') as f:
-            events_count = sum(1 for _ in f)
+    # Counters come from the log index and the processor's committed offset
+    log = event_log.log_stats()
+    processor = event_log.get_position("processor") or {}
+    events_processed = processor.get("events_processed", 0)
+    # Events appended to the log that the processor has not consumed yet
+    unprocessed = event_log.consumer_lag("processor")
     
     return {
         "status": stream_state["status"],
         "started_at": stream_state["started_at"],
-        "events_in_buffer": events_count,
+        "events_in_buffer": unprocessed["events"],
+        "next_seq": log["next_seq"],
+        "events_processed": events_processed,
+        "consumer_lag": unprocessed["events"],
+        "consumer_lag_bytes": unprocessed["bytes"],
+        "log_segments": log["segments"],
+        "log_bytes": log["bytes_retained"],
+        "last_processed_at": processor.get("updated_at"),
     }
 
 
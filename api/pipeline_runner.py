@@ -9,6 +9,7 @@ import sys
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
 
 async def run_generator(num_transactions: int = 200) -> dict:
     """
@@ -68,49 +69,15 @@ async def run_generator(num_transactions: int = 200) -> dict:
 
 async def run_pipeline() -> dict:
     """
-    Run the transformation pipeline asynchronously.
+    Run the transformation pipeline on the in-process worker
+    (src/transformation/engine.py) without blocking the event loop.
     
     Returns:
         dict with status and message
     """
     try:
-        pipeline_path = PROJECT_ROOT / "src" / "transformation" / "pipeline.py"
-        
-        # Create async subprocess
-        process = await asyncio.create_subprocess_exec(
-            sys.executable,
-            str(pipeline_path),
-            cwd=str(PROJECT_ROOT),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # Wait for completion with timeout
-        try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=120.0
-            )
-        except asyncio.TimeoutError:
-            process.kill()
-            await process.wait()
-            return {
-                "status": "error",
-                "message": "Pipeline timed out (>120s)"
-            }
-        
-        if process.returncode == 0:
-            return {
-                "status": "success",
-                "message": "Pipeline completed successfully",
-                "output": stdout.decode('utf-8')
-            }
-        else:
-            return {
-                "status": "error",
-                "message": "Pipeline failed",
-                "error": stderr.decode('utf-8')
-            }
+        from src.transformation.engine import run_pipeline_async
+        return await run_pipeline_async()
     except Exception as e:
         return {
             "status": "error",
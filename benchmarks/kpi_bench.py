@@ -0,0 +1,329 @@
+"""
+RetailNexus — KPI Query Benchmark
+==================================
+Latency regression suite for the compute_* functions in
+src/analytics/kpi_queries.py and the API endpoints that serve them.
+
+Gold layers of configurable size are built once with the pipeline benchmark
+(pipeline_bench.py: seeded dataset -> full pipeline) and reused. Against
+each, in a separate process pointed at it through RETAILNEXUS_DATA_DIR:
+
+  functions  Every compute_* is timed `--iterations` times cold (KPI result
+             cache cleared before each call, so the query runs) and warm
+             (served from the cache), plus its first call in the process.
+             Reported as mean/p50/p95/p99/max in milliseconds.
+             Selective Gold scans (SCAN_PROBES: one store, one day) are timed
+             alongside as "scan <name>", to show row-group skipping.
+  load       (--load) A weighted mix of dashboard endpoint calls is
+             replayed against the FastAPI app in-process (TestClient) from
+             `--concurrency` threads; reports per-endpoint percentiles,
+             throughput and errors.
+
+Results go to one JSON file tagged with the git commit. With --compare, cold
+p95 per function and p95 per endpoint are checked against an earlier results
+file; the run exits with status 1 if any regressed by more than --threshold
+percent (and --min-delta-ms), so it can gate a deploy.
+
+Usage:
+    python benchmarks/kpi_bench.py --rows 100000
+    python benchmarks/kpi_bench.py --rows 1000000 --load --concurrency 16
+    python benchmarks/kpi_bench.py --compare benchmarks/results/kpi_<commit>_<stamp>.json
+"""
+import argparse
+import inspect
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.pipeline_bench import (
+    DEFAULT_WORK_DIR, RESULTS_DIR, ensure_dataset, ensure_gold_layer,
+    git_revision, host_info, run_child,
+)
+
+# Argument sets timed per function; functions not listed run with their defaults
+KPI_VARIANTS = {
+    "compute_revenue_timeseries": ({"granularity": "daily"}, {"granularity": "monthly"}),
+    "compute_top_products": ({"limit": 10},),
+}
+
+# (name, Gold table, measure, WHERE clause) for filtered scans. {store_key} and
+# {date_key} are the first store and the middle day of the data, filled in as
+# literals so the filters can skip row groups on parquet statistics.
+SCAN_PROBES = (
+    ("fact_transactions[store]", "fact_transactions", "SUM(amount)", "store_key = {store_key}"),
+    ("fact_transactions[day,store]", "fact_transactions", "SUM(amount)",
+     "date_key = {date_key} AND store_key = {store_key}"),
+    ("fact_inventory[store]", "fact_inventory", "SUM(stock_level)", "store_key = {store_key}"),
+    ("agg_store_daily[store]", "agg_store_daily", "SUM(revenue)", "store_key = {store_key}"),
+    ("agg_store_daily[day]", "agg_store_daily", "SUM(revenue)", "date_key = {date_key}"),
+)
+
+# (path, weight): roughly what the dashboard polls
+ENDPOINT_MIX = (
+    ("/api/kpis", 5),
+    ("/api/revenue/timeseries?granularity=daily", 3),
+    ("/api/revenue/timeseries?granularity=monthly", 1),
+    ("/api/products/top?limit=10", 2),
+    ("/api/sales/city", 2),
+    ("/api/clv", 1),
+    ("/api/basket", 1),
+    ("/api/inventory/turnover", 1),
+    ("/api/delivery/metrics", 1),
+    ("/api/trends/seasonal", 1),
+    ("/api/customers/segmentation", 1),
+)
+
+
+def _percentiles(samples_ms: List[float]) -> Dict:
+    if not samples_ms:
+        return {"n": 0}
+    if len(samples_ms) == 1:
+        cuts = samples_ms * 99
+    else:
+        cuts = statistics.quantiles(samples_ms, n=100, method="inclusive")
+    return {
+        "n": len(samples_ms),
+        "mean": round(statistics.fmean(samples_ms), 3),
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+        "max": round(max(samples_ms), 3),
+    }
+
+
+def _label(name: str, kwargs: Dict) -> str:
+    return name + "".join(f"[{k}={v}]" for k, v in kwargs.items())
+
+
+# ─────────────────────────────────────────────────
+# Child processes (RETAILNEXUS_DATA_DIR is set before src modules import)
+# ─────────────────────────────────────────────────
+def _child_functions(output: str, iterations: int):
+    from src.analytics import kpi_queries
+
+    calls = []
+    for name, func in inspect.getmembers(kpi_queries, inspect.isfunction):
+        if name.startswith("compute_") and func.__module__ == kpi_queries.__name__:
+            for kwargs in KPI_VARIANTS.get(name, ({},)):
+                calls.append((_label(name, kwargs), func, kwargs))
+
+    def timed(func, kwargs) -> float:
+        started = time.perf_counter()
+        func(**kwargs)
+        return (time.perf_counter() - started) * 1000
+
+    results = {}
+    for label, func, kwargs in calls:
+        try:
+            kpi_queries.clear_kpi_cache()
+            first = timed(func, kwargs)
+            cold = []
+            for _ in range(iterations):
+                kpi_queries.clear_kpi_cache()
+                cold.append(timed(func, kwargs))
+            warm = [timed(func, kwargs) for _ in range(iterations)]
+            results[label] = {"first_ms": round(first, 3), "cold": _percentiles(cold), "warm": _percentiles(warm)}
+        except Exception as e:
+            results[label] = {"error": str(e)}
+        print(f"[KPIBench] {label}: {results[label].get('cold', {}).get('p50', '-')} ms cold p50")
+
+    tables = kpi_queries._get_table_paths()
+    with kpi_queries._get_conn() as conn:
+        store_key, date_key = conn.sql(f"""
+            SELECT MIN(store_key), QUANTILE_DISC(date_key, 0.5) FROM {tables['agg_store_daily']}
+        """).fetchone() if "agg_store_daily" in tables else (None, None)
+        for name, table, measure, where in SCAN_PROBES:
+            label = f"scan {name}"
+            if table not in tables or store_key is None:
+                continue
+            where = where.format(store_key=store_key, date_key=date_key)
+            query = f"SELECT COUNT(*), {measure} FROM {tables[table]} WHERE {where}"
+            samples = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                conn.sql(query).fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[label] = {"cold": _percentiles(samples)}
+            print(f"[KPIBench] {label}: {results[label]['cold']['p50']} ms p50")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"functions": results, "cache_enabled": kpi_queries.KPI_CACHE_ENABLED}, f)
+
+
+def _child_load(output: str, concurrency: int, requests: int, seed: int):
+    from fastapi.testclient import TestClient
+    from api.main import app
+
+    headers = {"X-User-Role": "admin"}
+    weighted = [path for path, weight in ENDPOINT_MIX for _ in range(weight)]
+    rng = random.Random(seed)
+    plan = [rng.choice(weighted) for _ in range(requests)]
+
+    # One warm-up call per endpoint, so the mix measures steady-state serving
+    warmup = TestClient(app)
+    for path, _ in ENDPOINT_MIX:
+        warmup.get(path, headers=headers)
+
+    samples: Dict[str, List[float]] = {path: [] for path, _ in ENDPOINT_MIX}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    cursor = {"next": 0}
+
+    def worker():
+        client = TestClient(app)
+        while True:
+            with lock:
+                if cursor["next"] >= len(plan):
+                    return
+                path = plan[cursor["next"]]
+                cursor["next"] += 1
+            started = time.perf_counter()
+            status = client.get(path, headers=headers).status_code
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[path].append(elapsed)
+                if status >= 400:
+                    errors[path] = errors.get(path, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    all_samples = [ms for values in samples.values() for ms in values]
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "concurrency": concurrency,
+            "requests": len(plan),
+            "seconds": round(wall, 3),
+            "requests_per_second": round(len(plan) / wall, 1) if wall else None,
+            "errors": errors,
+            "overall": _percentiles(all_samples),
+            "endpoints": {path: _percentiles(values) for path, values in samples.items()},
+        }, f)
+
+
+# ─────────────────────────────────────────────────
+# Orchestration
+# ─────────────────────────────────────────────────
+def run_benchmark(rows_list: List[int], iterations: int = 30, seed: int = 42, load: bool = False,
+                  concurrency: int = 8, requests: int = 500,
+                  work_dir: Path = DEFAULT_WORK_DIR, verbose: bool = False) -> Dict:
+    report = {
+        "benchmark": "kpi",
+        **git_revision(),
+        "created_at": datetime.now().isoformat(),
+        "host": host_info(),
+        "config": {"seed": seed, "iterations": iterations, "load": load,
+                   "concurrency": concurrency, "requests": requests},
+        "results": [],
+    }
+    for rows in rows_list:
+        dataset = ensure_dataset(work_dir, rows, seed, verbose)
+        data_dir = ensure_gold_layer(work_dir, dataset, verbose)
+        print(f"[KPIBench] {rows:,} rows: timing compute_* ({iterations} iterations)")
+        result = {"rows_target": rows, "raw_rows": dataset["raw_rows"]}
+        result.update(run_child("functions", data_dir, work_dir / "_kpi_functions.json",
+                                ["--iterations", str(iterations)], verbose, script=__file__))
+        if load:
+            print(f"[KPIBench] {rows:,} rows: {requests} requests from {concurrency} threads")
+            result["load"] = run_child(
+                "load", data_dir, work_dir / "_kpi_load.json",
+                ["--concurrency", str(concurrency), "--requests", str(requests), "--seed", str(seed)],
+                verbose, script=__file__)
+        report["results"].append(result)
+    return report
+
+
+def compare(report: Dict, baseline: Dict, threshold: float = 20.0, min_delta_ms: float = 2.0) -> List[str]:
+    """Print p95 changes against a baseline; returns the regressions beyond the threshold."""
+    base = {r["rows_target"]: r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n  vs {baseline.get('commit', '?')} ({baseline.get('created_at', '?')}), "
+          f"regression = p95 +{threshold:.0f}% and +{min_delta_ms:g} ms")
+    print(f"  {'rows':>10}  {'measure':<58} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    def check(rows, name, before, after):
+        if before is None or after is None:
+            return
+        change = (after - before) / before * 100 if before else 0.0
+        regressed = change > threshold and after - before > min_delta_ms
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {rows:>10,}  {name:<58} {before:>8.2f}ms {after:>8.2f}ms {change:>+7.1f}%{flag}")
+        if regressed:
+            regressions.append(f"{rows} rows: {name} p95 {before:.2f} -> {after:.2f} ms")
+
+    for result in report["results"]:
+        old = base.get(result["rows_target"])
+        if old is None:
+            continue
+        for label, stats in result["functions"].items():
+            before = old["functions"].get(label, {}).get("cold", {}).get("p95")
+            check(result["rows_target"], f"{label} cold", before, stats.get("cold", {}).get("p95"))
+        if result.get("load") and old.get("load"):
+            for path, stats in result["load"]["endpoints"].items():
+                before = old["load"]["endpoints"].get(path, {}).get("p95")
+                check(result["rows_target"], f"GET {path}", before, stats.get("p95"))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RetailNexus KPI query latency benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10 ** 5],
+                        help="Transaction line items in the generated Gold layers (default: 1e5)")
+    parser.add_argument("--iterations", type=int, default=30, help="Timed calls per function, cold and warm")
+    parser.add_argument("--seed", type=int, default=42, help="Generator and request-mix seed")
+    parser.add_argument("--load", action="store_true", help="Also replay the endpoint mix against the API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads issuing API requests")
+    parser.add_argument("--requests", type=int, default=500, help="API requests in the load mix")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR,
+                        help="Cached datasets and Gold layers")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Results JSON (default: benchmarks/results/kpi_<commit>_<stamp>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Regression threshold in percent of p95")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Ignore p95 increases smaller than this (timer noise)")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline and query output")
+    parser.add_argument("--child", choices=["functions", "load"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "functions":
+        _child_functions(str(args.output), args.iterations)
+        sys.exit(0)
+    if args.child == "load":
+        _child_load(str(args.output), args.concurrency, args.requests, args.seed)
+        sys.exit(0)
+
+    report = run_benchmark(args.rows, args.iterations, args.seed, args.load, args.concurrency,
+                           args.requests, args.work_dir, args.verbose)
+    output = args.output
+    if output is None:
+        suffix = "-dirty" if report["dirty"] else ""
+        output = RESULTS_DIR / f"kpi_{report['commit']}{suffix}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"[KPIBench] Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n[KPIBench] {len(regressions)} latency regression(s):")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
@@ -0,0 +1,318 @@
+"""
+RetailNexus — Pipeline Benchmark
+=================================
+Reproducible Bronze -> Silver -> Gold benchmark at scale.
+
+For each target size (default 10^5, 10^6 and 10^7 transaction rows) the
+schema-driven generator synthesizes a seeded dataset once (vectorized and
+chunk-seeded, so it is byte-identical per seed); it is cached under
+--work-dir and reused by later runs with the same size and seed. Each
+repetition copies the raw files into a fresh data root and runs, in a
+separate process pointed at it through RETAILNEXUS_DATA_DIR:
+
+    clean_all  ->  apply_scd_type_2  ->  build_star_schema
+
+(full refresh, so runs are comparable). Per stage it records wall time, rows
+and bytes in/out, throughput, peak DuckDB memory (run_metrics.py) and the
+process peak RSS. Results go to one JSON file tagged with the git commit;
+--compare prints the change against an earlier results file.
+
+Usage:
+    python benchmarks/pipeline_bench.py
+    python benchmarks/pipeline_bench.py --rows 100000 --repeat 3
+    python benchmarks/pipeline_bench.py --rows 1000000 --compare benchmarks/results/pipeline_<commit>_<stamp>.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_ROWS = (10 ** 5, 10 ** 6, 10 ** 7)
+DEFAULT_WORK_DIR = PROJECT_ROOT / "data" / "benchmarks"
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+DATASET_MARKER = "_dataset.json"
+# Cached datasets from another generator mode are regenerated
+GENERATOR_MODE = "vectorized-chunk-seeded"
+# Reference date for the generator's relative dates, so datasets are byte-identical per seed
+GENERATOR_AS_OF = "2025-01-01"
+GOLD_MARKER = "_generation.json"  # gold_layout.GOLD_GENERATION_FILE
+
+STAGES = ("clean_all", "apply_scd_type_2", "build_star_schema")
+
+
+# ─────────────────────────────────────────────────
+# Helpers
+# ─────────────────────────────────────────────────
+def git_revision() -> Dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"),
+                "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+
+
+def host_info() -> Dict:
+    import duckdb
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "duckdb": duckdb.__version__, "cpu_count": os.cpu_count()}
+
+
+def _max_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # KiB on Linux
+
+
+def _transactions_for(rows: int) -> int:
+    """Transactions to request from the generator so it emits about `rows` line items."""
+    from src.ingestion.generator import load_business_context
+
+    config = load_business_context().get("schema", {}).get("transactions", {})
+    low, high = config.get("products_per_transaction", [1, 5])
+    lines_per_txn = (low + high) / 2 * (1 + config.get("duplicate_rate", 0.02))
+    return max(1, math.ceil(rows / lines_per_txn))
+
+
+def run_child(mode: str, data_dir: Path, output: Path, extra: List[str], verbose: bool,
+              script: str = __file__) -> Dict:
+    """Run `script --child mode` with RETAILNEXUS_DATA_DIR=data_dir; returns the JSON it wrote."""
+    env = {**os.environ, "RETAILNEXUS_DATA_DIR": str(data_dir), "PYTHONUNBUFFERED": "1"}
+    cmd = [sys.executable, str(Path(script).resolve()), "--child", mode, "--output", str(output), *extra]
+    proc = subprocess.run(cmd, env=env, cwd=PROJECT_ROOT,
+                          stdout=None if verbose else subprocess.PIPE,
+                          stderr=subprocess.STDOUT, text=True)
+    if proc.returncode != 0:
+        if not verbose:
+            print(proc.stdout[-4000:])
+        raise RuntimeError(f"benchmark {mode} step failed (exit {proc.returncode})")
+    with open(output, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ─────────────────────────────────────────────────
+# Child processes (RETAILNEXUS_DATA_DIR is set before src modules import)
+# ─────────────────────────────────────────────────
+def _child_generate(output: str, transactions: int, seed: int):
+    from src.ingestion import generator
+
+    started = time.perf_counter()
+    generator.main(num_transactions=transactions, vectorized=True, seed=seed,
+                   workers=os.cpu_count(), as_of=datetime.fromisoformat(GENERATOR_AS_OF))
+    seconds = time.perf_counter() - started
+
+    from src.transformation.run_metrics import path_stats
+    files: Dict[str, List[str]] = {}
+    for path in sorted(generator.RAW_DIR.glob("*.csv")):
+        # <table>_<YYYYmmdd>_<HHMMSS>[_<chunk>].csv
+        table = re.match(r"(.+?)_\d{8}_\d{6}", path.name).group(1)
+        files.setdefault(table, []).append(str(path))
+    tables = {table: path_stats(paths) for table, paths in files.items()}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"seconds": round(seconds, 3), "tables": tables}, f)
+
+
+def _child_run(output: str, workers: Optional[int]):
+    from src.transformation import run_metrics
+    from src.transformation.cleaner import clean_all
+    from src.transformation.scd_logic import apply_scd_type_2
+    from src.transformation.star_schema import build_star_schema
+
+    funcs = {
+        "clean_all": lambda: clean_all(incremental=False, workers=workers),
+        "apply_scd_type_2": apply_scd_type_2,
+        "build_star_schema": lambda: build_star_schema(incremental=False, workers=workers),
+    }
+    stages = {}
+    with run_metrics.RunMetrics() as metrics:
+        for name in STAGES:
+            started = time.perf_counter()
+            with metrics.stage(name):
+                result = funcs[name]()
+            stages[name] = {"seconds": round(time.perf_counter() - started, 3),
+                            "result": result, "max_rss_bytes": _max_rss_bytes()}
+
+    for name, stage in stages.items():
+        stage.update(metrics.stages[name])
+        seconds = max(stage["seconds"], 1e-9)
+        stage["rows_per_second"] = round(stage["rows_in"] / seconds)
+        stage["mb_per_second"] = round(stage["bytes_read"] / seconds / 1e6, 2)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"stages": stages, "peak_memory_bytes": metrics.peak_memory_bytes,
+                   "max_rss_bytes": _max_rss_bytes()}, f, default=str)
+
+
+# ─────────────────────────────────────────────────
+# Orchestration
+# ─────────────────────────────────────────────────
+def ensure_dataset(work_dir: Path, rows: int, seed: int, verbose: bool = False) -> Dict:
+    """Generate (or reuse) the raw dataset for `rows` line items; returns its description."""
+    dataset_dir = work_dir / "datasets" / f"rows_{rows}_seed_{seed}"
+    marker = dataset_dir / DATASET_MARKER
+    transactions = _transactions_for(rows)
+    if marker.exists():
+        with open(marker, "r", encoding="utf-8") as f:
+            dataset = json.load(f)
+        if dataset.get("transactions") == transactions and dataset.get("generator") == GENERATOR_MODE:
+            print(f"[Bench] Reusing dataset {dataset_dir.name}")
+            return dataset
+
+    print(f"[Bench] Generating {rows:,} rows ({transactions:,} transactions, seed {seed})...")
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    dataset_dir.mkdir(parents=True)
+    generated = run_child("generate", dataset_dir, dataset_dir / "_generate.json",
+                           ["--transactions", str(transactions), "--seed", str(seed)], verbose)
+    dataset = {
+        "rows_target": rows,
+        "transactions": transactions,
+        "seed": seed,
+        "generator": GENERATOR_MODE,
+        "path": str(dataset_dir),
+        "generate_seconds": generated["seconds"],
+        "raw_rows": {table: stats["rows"] for table, stats in generated["tables"].items()},
+        "raw_bytes": sum(stats["bytes"] for stats in generated["tables"].values()),
+    }
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(dataset, f, indent=2)
+    return dataset
+
+
+def _run_pipeline_on_copy(dataset: Dict, run_dir: Path, workers: Optional[int], verbose: bool) -> Dict:
+    shutil.rmtree(run_dir, ignore_errors=True)
+    shutil.copytree(Path(dataset["path"]) / "raw", run_dir / "raw")
+    extra = ["--workers", str(workers)] if workers is not None else []
+    return run_child("run", run_dir, run_dir.parent / f"_{run_dir.name}.json", extra, verbose)
+
+
+def run_once(work_dir: Path, dataset: Dict, workers: Optional[int], verbose: bool = False) -> Dict:
+    """Run the three stages on a fresh copy of the dataset."""
+    run_dir = work_dir / "runs" / f"rows_{dataset['rows_target']}"
+    try:
+        return _run_pipeline_on_copy(dataset, run_dir, workers, verbose)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def ensure_gold_layer(work_dir: Path, dataset: Dict, verbose: bool = False) -> Path:
+    """Data root holding a Gold layer built from `dataset` (built once, then reused)."""
+    data_dir = work_dir / "gold_layers" / Path(dataset["path"]).name
+    if not (data_dir / "gold" / GOLD_MARKER).exists():
+        print(f"[Bench] Building Gold layer for {dataset['rows_target']:,} rows...")
+        _run_pipeline_on_copy(dataset, data_dir, None, verbose)
+    return data_dir
+
+
+def _median_stages(runs: List[Dict]) -> Dict:
+    median = {}
+    for name in STAGES:
+        stage_runs = [run["stages"][name] for run in runs]
+        median[name] = {field: statistics.median(s[field] for s in stage_runs)
+                        for field in ("seconds", "rows_per_second", "mb_per_second", "peak_memory_bytes")}
+    median["total_seconds"] = statistics.median(
+        sum(run["stages"][name]["seconds"] for name in STAGES) for run in runs)
+    return median
+
+
+def run_benchmark(rows_list: List[int], repeat: int = 1, seed: int = 42,
+                  workers: Optional[int] = None, work_dir: Path = DEFAULT_WORK_DIR,
+                  verbose: bool = False) -> Dict:
+    report = {
+        "benchmark": "pipeline",
+        **git_revision(),
+        "created_at": datetime.now().isoformat(),
+        "host": host_info(),
+        "config": {"seed": seed, "repeat": repeat, "workers": workers,
+                   "duckdb_threads": os.getenv("DUCKDB_THREADS", "0")},
+        "results": [],
+    }
+    for rows in rows_list:
+        dataset = ensure_dataset(work_dir, rows, seed, verbose)
+        runs = []
+        for i in range(repeat):
+            print(f"[Bench] {rows:,} rows: run {i + 1}/{repeat}")
+            runs.append(run_once(work_dir, dataset, workers, verbose))
+        median = _median_stages(runs)
+        report["results"].append({**{k: v for k, v in dataset.items() if k != "path"},
+                                  "runs": runs, "median": median})
+        print(f"[Bench] {rows:,} rows: " + ", ".join(
+            f"{name} {median[name]['seconds']:.2f}s" for name in STAGES)
+            + f" (total {median['total_seconds']:.2f}s)")
+    return report
+
+
+def compare(report: Dict, baseline: Dict):
+    """Print median stage times against a baseline results file."""
+    base = {r["rows_target"]: r["median"] for r in baseline.get("results", [])}
+    print(f"\n  vs {baseline.get('commit', '?')} ({baseline.get('created_at', '?')})")
+    print(f"  {'rows':>12}  {'stage':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in report["results"]:
+        old = base.get(result["rows_target"])
+        if old is None:
+            continue
+        for name in (*STAGES, "total_seconds"):
+            before = old[name]["seconds"] if name in STAGES else old[name]
+            after = result["median"][name]["seconds"] if name in STAGES else result["median"][name]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"  {result['rows_target']:>12,}  {name:<20} {before:>9.2f}s {after:>9.2f}s {change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RetailNexus Bronze -> Silver -> Gold benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS),
+                        help="Target transaction line items per dataset (default: 1e5 1e6 1e7)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the median is reported")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Concurrent pipeline steps (default: PIPELINE_WORKERS)")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR,
+                        help="Cached datasets and scratch data roots")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Results JSON (default: benchmarks/results/pipeline_<commit>_<stamp>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline output")
+    parser.add_argument("--child", choices=["generate", "run"], help=argparse.SUPPRESS)
+    parser.add_argument("--transactions", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "generate":
+        _child_generate(str(args.output), args.transactions, args.seed)
+        sys.exit(0)
+    if args.child == "run":
+        _child_run(str(args.output), args.workers)
+        sys.exit(0)
+
+    report = run_benchmark(args.rows, args.repeat, args.seed, args.workers, args.work_dir, args.verbose)
+    output = args.output
+    if output is None:
+        suffix = "-dirty" if report["dirty"] else ""
+        output = RESULTS_DIR / f"pipeline_{report['commit']}{suffix}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"[Bench] Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
@@ -0,0 +1,118 @@
+"""
+RetailNexus — DuckDB Read-Cursor Pool
+======================================
+Bounded pool of DuckDB cursors that all share one database instance, so up to
+`size` read-only KPI queries run concurrently instead of queueing behind a
+single global lock.
+
+The database instance is supplied by a callable on every checkout. When it
+returns a different connection (e.g. a new warehouse snapshot was published),
+idle cursors from the old instance are closed and in-flight ones are closed
+as they are returned.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+import duckdb
+
+
+class DuckDBCursorPool:
+    """Fixed-size pool of cursors over a shared DuckDB database."""
+
+    def __init__(self, size: int, get_database: Callable[[], duckdb.DuckDBPyConnection],
+                 timeout: float = 30.0):
+        """
+        Args:
+            size: Maximum number of cursors checked out at once
+            get_database: Returns the connection whose database cursors are taken from
+            timeout: Seconds to wait for a free cursor before raising TimeoutError
+        """
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._get_database = get_database
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._database = None
+        self._epoch = 0
+        self._idle: List[duckdb.DuckDBPyConnection] = []
+        self._stats = {
+            "acquisitions": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "in_use": 0,
+            "peak_in_use": 0,
+        }
+
+    def _checkout(self):
+        database = self._get_database()
+        with self._lock:
+            if database is not self._database:
+                stale, self._idle = self._idle, []
+                self._database = database
+                self._epoch += 1
+                for cursor in stale:
+                    _close_quietly(cursor)
+            cursor = self._idle.pop() if self._idle else self._database.cursor()
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+            return cursor, self._epoch
+
+    def _checkin(self, cursor, epoch: int):
+        with self._lock:
+            self._stats["in_use"] -= 1
+            if epoch == self._epoch:
+                self._idle.append(cursor)
+                return
+        _close_quietly(cursor)
+
+    @contextmanager
+    def connection(self):
+        """Check out a cursor, blocking while all `size` cursors are busy."""
+        started = time.perf_counter()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"No DuckDB cursor available within {self.timeout}s")
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["acquisitions"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            if waited:
+                self._stats["waits"] += 1
+
+        try:
+            cursor, epoch = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            yield cursor
+        finally:
+            self._checkin(cursor, epoch)
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Pool size, utilisation, wait-time and saturation counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        acquisitions = stats["acquisitions"]
+        stats["size"] = self.size
+        stats["avg_wait_ms"] = round(stats["total_wait_ms"] / acquisitions, 3) if acquisitions else 0.0
+        stats["saturation_ratio"] = round(stats["waits"] / acquisitions, 4) if acquisitions else 0.0
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        return stats
+
+
+def _close_quietly(cursor):
+    try:
+        cursor.close()
+    except duckdb.Error:
+        pass
@@ -0,0 +1,150 @@
+"""
+RetailNexus — KPI Result Cache
+===============================
+LRU cache for compute_* results, keyed by function, arguments and the Gold
+Layer generation published by the star-schema builder.
+
+A new Gold publish changes the generation, so stale entries are never served
+and simply age out of the LRU. Results are only cached while a generation
+exists and only if it did not change while the query was running. A
+function returns Uncached(value) for a fallback result (missing file, query
+error) so it is handed to the caller but never stored.
+"""
+import functools
+import inspect
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+
+def _estimate_bytes(value: Any) -> int:
+    """Approximate in-memory size of a cached KPI result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+def _copy(value: Any) -> Any:
+    """Hand out copies so callers can't mutate cached results in place."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class Uncached:
+    """Marks a fallback result that memoize() returns without caching."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def _unwrap(value: Any) -> Any:
+    return value.value if isinstance(value, Uncached) else value
+
+
+class KPIResultCache:
+    """Thread-safe LRU cache bounded by entry count and estimated memory."""
+
+    def __init__(self, max_bytes: int, max_entries: int = 256, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0, "fallbacks": 0}
+
+    def get(self, key: Hashable):
+        """Return (hit, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, _copy(entry[0])
+
+    def put(self, key: Hashable, value: Any):
+        size = _estimate_bytes(value)
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (_copy(value), size)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                enabled=self.enabled,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                max_entries=self.max_entries,
+            )
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def memoize(self, generation_fn: Callable[[], Optional[Hashable]]):
+        """
+        Decorator caching a KPI function per (name, bound arguments, generation).
+
+        Args:
+            generation_fn: Returns the current Gold generation, or None when
+                           no Gold Layer is published (results are not cached).
+        """
+        def decorator(func: Callable):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                generation = generation_fn() if self.enabled else None
+                if generation is None:
+                    return _unwrap(func(*args, **kwargs))
+
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = (func.__name__, tuple(sorted(bound.arguments.items())), generation)
+
+                hit, value = self.get(key)
+                if hit:
+                    return value
+                value = func(*args, **kwargs)
+                if isinstance(value, Uncached):
+                    with self._lock:
+                        self._stats["fallbacks"] += 1
+                    return value.value
+                # Don't cache a result that may straddle a Gold publish
+                if generation_fn() == generation:
+                    self.put(key, value)
+                return value
+
+            wrapper.cache = self
+            return wrapper
+        return decorator
@@ -3,14 +3,24 @@ RetailNexus — KPI Queries
 ==========================
 All heavy lifts use duckdb — no Python for-loops on data.
 Schema-agnostic: Uses dynamic table discovery instead of hardcoded paths.
-Thread-safe: Uses a lock to serialize DuckDB access.
+Rollup-aware: Time-series and top-N KPIs read the agg_* rollups built by
+star_schema.build_rollups() when present, else aggregate fact_transactions.
+Concurrent: KPI reads check out cursors from a bounded pool over one shared
+DuckDB instance (KPI_POOL_SIZE), so independent reads run in parallel.
+Warehouse-aware: With WAREHOUSE_ENABLED=true, queries read native tables from
+the persistent warehouse snapshot (see warehouse.py) through one long-lived
+read-only connection, falling back to Gold parquet when no snapshot exists.
+Cached: Results are memoized per (function, arguments, Gold generation) in a
+memory-capped LRU (KPI_CACHE_MAX_MB), so repeated dashboard polls between
+pipeline runs are served without re-running the query.
 """
+import json
 import os
 import sys
 import threading
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, Optional
 
 import duckdb
 import pandas as pd
@@ -19,16 +29,100 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 from src.utils.retry_utils import retry_with_backoff
 from src.analytics.schema_inspector import load_business_context, discover_tables
+from src.analytics import warehouse
+from src.analytics.connection_pool import DuckDBCursorPool
+from src.analytics.kpi_cache import KPIResultCache, Uncached
+from src.utils.gold_layout import GOLD_GENERATION_FILE
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
 # Keep a module-level `_table_cache` for backward compatibility with
-# other modules that import it, but `_get_table_paths` no longer relies
-# on this cache (it does fresh discovery each call).
+# other modules that import it. Result caching lives in `_result_cache`.
 _table_cache = None
 
-# ── Thread-safe DuckDB access ──────────────────────────
-_duckdb_lock = threading.Lock()
+# ── Concurrent DuckDB access ──────────────────────────
+KPI_POOL_SIZE = int(os.getenv("KPI_POOL_SIZE", "4"))
+KPI_POOL_TIMEOUT = float(os.getenv("KPI_POOL_TIMEOUT", "30"))
+
+_memory_db = None
+_memory_db_lock = threading.Lock()
+
+
+def _shared_database() -> duckdb.DuckDBPyConnection:
+    """Database that pool cursors come from: the warehouse snapshot if published,
+    otherwise one process-wide in-memory instance that reads Gold parquet."""
+    global _memory_db
+    if warehouse.WAREHOUSE_ENABLED:
+        shared = warehouse.get_read_connection()
+        if shared is not None:
+            return shared
+    with _memory_db_lock:
+        if _memory_db is None:
+            _memory_db = duckdb.connect()
+        return _memory_db
+
+
+_pool = DuckDBCursorPool(KPI_POOL_SIZE, _shared_database, timeout=KPI_POOL_TIMEOUT)
+
+
+def get_pool_stats() -> Dict[str, float]:
+    """Size, utilisation, wait-time and saturation metrics of the KPI cursor pool."""
+    return _pool.stats()
+
+
+# ── Result cache ──────────────────────────────────────
+KPI_CACHE_ENABLED = os.getenv("KPI_CACHE_ENABLED", "true").lower() == "true"
+KPI_CACHE_MAX_MB = float(os.getenv("KPI_CACHE_MAX_MB", "64"))
+KPI_CACHE_MAX_ENTRIES = int(os.getenv("KPI_CACHE_MAX_ENTRIES", "256"))
+
+_result_cache = KPIResultCache(
+    max_bytes=int(KPI_CACHE_MAX_MB * 1024 * 1024),
+    max_entries=KPI_CACHE_MAX_ENTRIES,
+    enabled=KPI_CACHE_ENABLED,
+)
+
+_generation_lock = threading.Lock()
+_generation_seen = {"stat": None, "generation": None}
+
+
+def _gold_generation() -> Optional[tuple]:
+    """
+    Current Gold generation as published by star_schema.publish_gold_generation().
+    The marker file is only re-read when its mtime/size change, so a cache hit
+    costs one os.stat(). Returns None when no generation has been published.
+    """
+    context = load_business_context()
+    path = PROJECT_ROOT / context['gold_layer_path'] / GOLD_GENERATION_FILE
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stat_key = (str(path), st.st_mtime_ns, st.st_size)
+    with _generation_lock:
+        if _generation_seen["stat"] == stat_key:
+            return _generation_seen["generation"]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        generation = (record["generation"], record["token"])
+    except (OSError, ValueError, KeyError):
+        return None
+    with _generation_lock:
+        _generation_seen.update(stat=stat_key, generation=generation)
+    return generation
+
+
+def clear_kpi_cache():
+    """Drop all cached KPI results (e.g. after the data directories are reset)."""
+    _result_cache.clear()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and memory usage of the KPI result cache."""
+    stats = _result_cache.stats()
+    stats["generation"] = _gold_generation()
+    return stats
+
 
 def _get_table_paths() -> Dict[str, str]:
     """
@@ -38,39 +132,47 @@ def _get_table_paths() -> Dict[str, str]:
     discovery is fast for the current data volume and guarantees fresh paths.
     
     Returns:
-        Dict mapping table names to their DuckDB read paths.
+        Dict mapping table names to their DuckDB read paths
+        (or native table names when the warehouse is enabled and published).
     """
+    if warehouse.WAREHOUSE_ENABLED:
+        tables = warehouse.get_tables()
+        if tables:
+            return tables
     context = load_business_context()
     return discover_tables(context['gold_layer_path'])
 
+def _customer_facts(fact_txn: str, dim_users: Optional[str]) -> str:
+    """
+    fact_transactions with the customer's durable user_id. user_key points at
+    the dim_users version in effect at purchase time, so one customer can
+    have several keys; customer-level KPIs group on user_id instead.
+    """
+    if not dim_users:
+        return f"(SELECT *, NULLIF(user_key, -1)::VARCHAR AS user_id FROM {fact_txn})"
+    return f"""(
+        SELECT ft.*, du.user_id
+        FROM {fact_txn} ft
+        LEFT JOIN {dim_users} du ON ft.user_key = du.surrogate_key
+    )"""
+
 @contextmanager
 def _get_conn():
-    """Thread-safe DuckDB connection. Acquires lock, yields connection, then cleans up."""
-    _duckdb_lock.acquire()
-    conn = None
-    try:
-        conn = duckdb.connect()
+    """Check out a pooled DuckDB cursor; blocks only when every cursor is busy."""
+    with _pool.connection() as conn:
         yield conn
-    finally:
-        if conn:
-            try:
-                conn.close()
-            except Exception as e:
-                # Log warning but don't fail
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Error closing DuckDB connection: {e}")
-        _duckdb_lock.release()
 
 
 # ─────────────────────────────────────────────────
 # 1.  CUSTOMER LIFETIME VALUE  (CLV)
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_clv() -> pd.DataFrame:
     """
     CLV = total_spend per customer, plus average order value and
-    purchase frequency.
+    purchase frequency. Spend across all of a customer's dim_users versions
+    is summed; name and city are the current version's.
     
     Schema-agnostic: Uses dynamic table discovery.
     """
@@ -86,18 +188,18 @@ def compute_clv() -> pd.DataFrame:
             df = conn.sql(f"""
                 WITH user_purchases AS (
                     SELECT
-                        ft.user_key,
+                        ft.user_id,
                         COUNT(DISTINCT ft.transaction_id) AS purchase_count,
                         SUM(ft.amount)                     AS total_spend,
                         MIN(ft.timestamp)::DATE            AS first_purchase,
                         MAX(ft.timestamp)::DATE            AS last_purchase
-                    FROM {fact_txn} ft
-                    WHERE ft.user_key != -1
-                    GROUP BY ft.user_key
+                    FROM {_customer_facts(fact_txn, dim_users)} ft
+                    WHERE ft.user_id IS NOT NULL
+                    GROUP BY ft.user_id
                 ),
                 clv_calc AS (
                     SELECT
-                        up.user_key,
+                        up.user_id,
                         up.purchase_count,
                         up.total_spend,
                         up.total_spend / NULLIF(up.purchase_count, 0) AS avg_order_value,
@@ -116,23 +218,24 @@ def compute_clv() -> pd.DataFrame:
                     clv.estimated_clv
                 FROM clv_calc clv
                 LEFT JOIN {dim_users} du
-                    ON clv.user_key = du.surrogate_key
+                    ON clv.user_id = du.user_id
                 WHERE du.is_current = TRUE
                 ORDER BY clv.estimated_clv DESC
             """).df()
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions or dim_users not found. Returning empty frame.")
-        return pd.DataFrame(columns=[
+        return Uncached(pd.DataFrame(columns=[
             "user_id", "customer_name", "customer_city",
             "purchase_count", "total_spend", "avg_order_value",
             "customer_lifespan_days", "estimated_clv",
-        ])
+        ]))
 
 
 # ─────────────────────────────────────────────────
 # 2.  MARKET BASKET ANALYSIS  (What sells together?)
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_market_basket(min_support: int = 3) -> pd.DataFrame:
     """
@@ -185,15 +288,16 @@ def compute_market_basket(min_support: int = 3) -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions or dim_products not found. Returning empty frame.")
-        return pd.DataFrame(columns=[
+        return Uncached(pd.DataFrame(columns=[
             "product_a_name", "product_b_name",
             "times_bought_together", "product_a", "product_b",
-        ])
+        ]))
 
 
 # ─────────────────────────────────────────────────
 # 3.  SUMMARY KPIs  (Revenue, Users, Turnover)
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_summary_kpis() -> dict:
     """
@@ -211,9 +315,9 @@ def compute_summary_kpis() -> dict:
             result = conn.sql(f"""
                 SELECT
                     SUM(amount)::DOUBLE                                              AS total_revenue,
-                    COUNT(DISTINCT user_key) FILTER (WHERE user_key != -1)::INTEGER  AS active_users,
+                    COUNT(DISTINCT user_id)::INTEGER                                 AS active_users,
                     COUNT(DISTINCT transaction_id)::INTEGER                          AS total_orders
-                FROM {fact_txn}
+                FROM {_customer_facts(fact_txn, tables.get('dim_users'))}
             """).fetchone()
 
         # Ensure we return actual values from database, not hardcoded zeros
@@ -231,12 +335,13 @@ def compute_summary_kpis() -> dict:
         import logging
         logger = logging.getLogger(__name__)
         logger.warning(f"Summary KPIs unavailable: {e}")
-        return {"total_revenue": 0.0, "active_users": 0, "total_orders": 0}
+        return Uncached({"total_revenue": 0.0, "active_users": 0, "total_orders": 0})
 
 
 # ─────────────────────────────────────────────────
 # 4. DAILY/MONTHLY REVENUE TIME-SERIES
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_revenue_timeseries(granularity: str = 'daily') -> pd.DataFrame:
     """
@@ -250,7 +355,22 @@ def compute_revenue_timeseries(granularity: str = 'daily') -> pd.DataFrame:
         tables = _get_table_paths()
         fact_txn = tables.get('fact_transactions')
         dim_dates = tables.get('dim_dates')
-        
+        rollup = tables.get('agg_sales_monthly' if granularity == 'monthly' else 'agg_sales_daily')
+
+        if rollup:
+            with _get_conn() as conn:
+                if granularity == 'monthly':
+                    return conn.sql(f"""
+                        SELECT year, month, revenue, order_count
+                        FROM {rollup}
+                        ORDER BY year, month
+                    """).df()
+                return conn.sql(f"""
+                    SELECT full_date, day_of_week, revenue, order_count
+                    FROM {rollup}
+                    ORDER BY full_date
+                """).df()
+
         if not fact_txn or not dim_dates:
             raise FileNotFoundError("Required tables not found in Gold Layer")
         
@@ -282,20 +402,35 @@ def compute_revenue_timeseries(granularity: str = 'daily') -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions or dim_dates not found. Returning empty frame.")
-        return pd.DataFrame()
+        return Uncached(pd.DataFrame())
 
 
 # ─────────────────────────────────────────────────
 # 5. CITY-WISE SALES
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_city_sales() -> pd.DataFrame:
-    """Revenue and order count by customer city. Schema-agnostic."""
+    """Revenue and order count by the customer's city at purchase time. Schema-agnostic."""
     try:
         tables = _get_table_paths()
         fact_txn = tables.get('fact_transactions')
         dim_users = tables.get('dim_users')
-        
+        rollup = tables.get('agg_city_sales')
+
+        if rollup:
+            with _get_conn() as conn:
+                return conn.sql(f"""
+                    SELECT
+                        city,
+                        order_count,
+                        total_revenue,
+                        total_revenue / line_count as avg_order_value,
+                        unique_customers
+                    FROM {rollup}
+                    ORDER BY total_revenue DESC
+                """).df()
+
         if not fact_txn or not dim_users:
             raise FileNotFoundError("Required tables not found in Gold Layer")
         
@@ -306,22 +441,23 @@ def compute_city_sales() -> pd.DataFrame:
                     COUNT(DISTINCT ft.transaction_id) as order_count,
                     SUM(ft.amount) as total_revenue,
                     AVG(ft.amount) as avg_order_value,
-                    COUNT(DISTINCT ft.user_key) as unique_customers
+                    COUNT(DISTINCT du.user_id) as unique_customers
                 FROM {fact_txn} ft
                 JOIN {dim_users} du ON ft.user_key = du.surrogate_key
-                WHERE du.is_current = TRUE AND ft.user_key != -1
+                WHERE ft.user_key != -1
                 GROUP BY du.city
                 ORDER BY total_revenue DESC
             """).df()
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions or dim_users not found. Returning empty frame.")
-        return pd.DataFrame(columns=["city", "order_count", "total_revenue", "avg_order_value", "unique_customers"])
+        return Uncached(pd.DataFrame(columns=["city", "order_count", "total_revenue", "avg_order_value", "unique_customers"]))
 
 
 # ─────────────────────────────────────────────────
 # 6. TOP-SELLING PRODUCTS
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_top_products(limit: int = 10) -> pd.DataFrame:
     """Top products by revenue and quantity sold. Schema-agnostic."""
@@ -329,7 +465,23 @@ def compute_top_products(limit: int = 10) -> pd.DataFrame:
         tables = _get_table_paths()
         fact_txn = tables.get('fact_transactions')
         dim_products = tables.get('dim_products')
-        
+        rollup = tables.get('agg_product_sales')
+
+        if rollup:
+            with _get_conn() as conn:
+                return conn.sql(f"""
+                    SELECT
+                        product_name,
+                        category,
+                        price,
+                        units_sold,
+                        total_revenue,
+                        total_revenue / units_sold as avg_sale_price
+                    FROM {rollup}
+                    ORDER BY total_revenue DESC
+                    LIMIT {int(limit)}
+                """).df()
+
         if not fact_txn or not dim_products:
             raise FileNotFoundError("Required tables not found in Gold Layer")
         
@@ -352,12 +504,13 @@ def compute_top_products(limit: int = 10) -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions or dim_products not found. Returning empty frame.")
-        return pd.DataFrame(columns=["product_name", "category", "price", "units_sold", "total_revenue", "avg_sale_price"])
+        return Uncached(pd.DataFrame(columns=["product_name", "category", "price", "units_sold", "total_revenue", "avg_sale_price"]))
 
 
 # ─────────────────────────────────────────────────
 # 7. INVENTORY TURNOVER RATIO
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_inventory_turnover() -> pd.DataFrame:
     """Inventory turnover ratio: Sales / Average Inventory. Schema-agnostic."""
@@ -404,12 +557,13 @@ def compute_inventory_turnover() -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_inventory or fact_transactions not found. Returning empty frame.")
-        return pd.DataFrame(columns=["product_name", "category", "units_sold", "avg_stock", "turnover_ratio", "reorder_instances"])
+        return Uncached(pd.DataFrame(columns=["product_name", "category", "units_sold", "avg_stock", "turnover_ratio", "reorder_instances"]))
 
 
 # ─────────────────────────────────────────────────
 # 8. AVERAGE DELIVERY TIMES
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_delivery_metrics() -> pd.DataFrame:
     """Average delivery times by carrier and region. Schema-agnostic."""
@@ -442,12 +596,13 @@ def compute_delivery_metrics() -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_shipments or dim_stores not found. Returning empty frame.")
-        return pd.DataFrame(columns=["carrier", "origin_region", "avg_delivery_days", "min_delivery_days", "max_delivery_days", "shipment_count", "fast_deliveries", "delayed_deliveries", "avg_shipping_cost"])
+        return Uncached(pd.DataFrame(columns=["carrier", "origin_region", "avg_delivery_days", "min_delivery_days", "max_delivery_days", "shipment_count", "fast_deliveries", "delayed_deliveries", "avg_shipping_cost"]))
 
 
 # ─────────────────────────────────────────────────
 # 9. SEASONAL DEMAND TRENDS
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_seasonal_trends() -> pd.DataFrame:
     """Monthly/quarterly demand trends by product category. Schema-agnostic."""
@@ -456,7 +611,23 @@ def compute_seasonal_trends() -> pd.DataFrame:
         fact_txn = tables.get('fact_transactions')
         dim_dates = tables.get('dim_dates')
         dim_products = tables.get('dim_products')
-        
+        rollup = tables.get('agg_category_monthly')
+
+        if rollup:
+            with _get_conn() as conn:
+                return conn.sql(f"""
+                    SELECT
+                        year,
+                        quarter,
+                        month,
+                        category,
+                        units_sold,
+                        revenue,
+                        revenue / units_sold as avg_transaction_value
+                    FROM {rollup}
+                    ORDER BY year, quarter, month, revenue DESC
+                """).df()
+
         if not fact_txn or not dim_dates or not dim_products:
             raise FileNotFoundError("Required tables not found in Gold Layer")
         
@@ -480,12 +651,13 @@ def compute_seasonal_trends() -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions, dim_dates, or dim_products not found. Returning empty frame.")
-        return pd.DataFrame(columns=["year", "quarter", "month", "category", "units_sold", "revenue", "avg_transaction_value"])
+        return Uncached(pd.DataFrame(columns=["year", "quarter", "month", "category", "units_sold", "revenue", "avg_transaction_value"]))
 
 
 # ─────────────────────────────────────────────────
 # 10. NEW VS. RETURNING CUSTOMERS
 # ─────────────────────────────────────────────────
+@_result_cache.memoize(_gold_generation)
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def compute_customer_segmentation() -> pd.DataFrame:
     """New vs. Returning customers based on purchase history. Schema-agnostic."""
@@ -495,20 +667,21 @@ def compute_customer_segmentation() -> pd.DataFrame:
         
         if not fact_txn:
             raise FileNotFoundError("fact_transactions not found in Gold Layer")
+        customer_facts = _customer_facts(fact_txn, tables.get('dim_users'))
         
         with _get_conn() as conn:
             df = conn.sql(f"""
                 WITH first_purchase AS (
                     SELECT
-                        user_key,
+                        user_id,
                         MIN(timestamp)::DATE as first_purchase_date
-                    FROM {fact_txn}
-                    WHERE user_key != -1
-                    GROUP BY user_key
+                    FROM {customer_facts}
+                    WHERE user_id IS NOT NULL
+                    GROUP BY user_id
                 ),
                 customer_classification AS (
                     SELECT
-                        ft.user_key,
+                        ft.user_id,
                         ft.transaction_id,
                         ft.amount,
                         ft.timestamp,
@@ -518,13 +691,12 @@ def compute_customer_segmentation() -> pd.DataFrame:
                             WHEN DATEDIFF('day', fp.first_purchase_date, ft.timestamp::DATE) <= 7 THEN 'New'
                             ELSE 'Returning'
                         END as customer_type
-                    FROM {fact_txn} ft
-                    JOIN first_purchase fp ON ft.user_key = fp.user_key
-                    WHERE ft.user_key != -1
+                    FROM {customer_facts} ft
+                    JOIN first_purchase fp ON ft.user_id = fp.user_id
                 )
                 SELECT
                     customer_type,
-                    COUNT(DISTINCT user_key) as customer_count,
+                    COUNT(DISTINCT user_id) as customer_count,
                     COUNT(DISTINCT transaction_id) as order_count,
                     SUM(amount) as total_revenue,
                     AVG(amount) as avg_order_value
@@ -535,7 +707,7 @@ def compute_customer_segmentation() -> pd.DataFrame:
         return df
     except FileNotFoundError:
         print("[KPI] fact_transactions not found. Returning empty frame.")
-        return pd.DataFrame(columns=["customer_type", "customer_count", "order_count", "total_revenue", "avg_order_value"])
+        return Uncached(pd.DataFrame(columns=["customer_type", "customer_count", "order_count", "total_revenue", "avg_order_value"]))
 
 
 # ─────────────────────────────────────────────────
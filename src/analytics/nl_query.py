@@ -160,7 +160,7 @@ CRITICAL RULES:
 6. For partitioned tables (fact_*), use the read_parquet() syntax shown in the schema
 7. For dimension tables (dim_*), use the direct file paths shown in the schema
 8. For temporal queries ("last month", "this year", etc.), use the dim_dates table for proper date filtering
-9. When filtering dim_users, always add "WHERE is_current = TRUE" to get current records only
+9. fact_transactions.user_key points at the dim_users version valid at purchase time: join on surrogate_key without an is_current filter, count customers with COUNT(DISTINCT du.user_id), and add "WHERE is_current = TRUE" only when listing current customer attributes
 10. Pay close attention to the similar examples above - they show the correct patterns for common queries
 """
     
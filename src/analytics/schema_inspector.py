@@ -5,11 +5,14 @@ Dynamically discovers and inspects Gold Layer tables without hardcoding.
 Extracts schema information and sample data for LLM context injection.
 """
 import json
+import os
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 import duckdb
 import pandas as pd
 
+from src.utils.gold_layout import dimension_source
+
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 CONFIG_DIR = PROJECT_ROOT / "config"
 
@@ -21,7 +24,11 @@ def load_business_context() -> dict:
         contexts = json.load(f)
     
     active_name = contexts.get("active_context", "retail_general")
-    return contexts["contexts"][active_name]
+    context = contexts["contexts"][active_name]
+    # RETAILNEXUS_DATA_DIR relocates the data root (e.g. benchmark Gold layers)
+    if os.getenv("RETAILNEXUS_DATA_DIR"):
+        context["gold_layer_path"] = str(Path(os.environ["RETAILNEXUS_DATA_DIR"]) / "gold")
+    return context
 
 
 def discover_tables(gold_layer_path: str) -> Dict[str, str]:
@@ -54,9 +61,8 @@ def discover_tables(gold_layer_path: str) -> Dict[str, str]:
             parquet_path = str(item / "**" / "*.parquet").replace("\\", "/")
             tables[table_name] = f"read_parquet('{parquet_path}', hive_partitioning=true)"
         elif item.suffix == '.parquet':
-            # Single parquet file (e.g., dim_users.parquet)
-            parquet_path = str(item).replace("\\", "/")
-            tables[table_name] = f"'{parquet_path}'"
+            # Single parquet file (e.g., dim_users.parquet), plus any SCD2 delta files
+            tables[table_name] = dimension_source(table_name, str(gold_path))
     
     return tables
 
@@ -173,7 +179,8 @@ def build_schema_prompt(schema_info: Dict[str, Any], context: dict) -> str:
     parts.append(f"- All monetary values are in {context['business_rules']['currency']}")
     parts.append(f"- Timestamps are in {context['business_rules']['timezone']}")
     parts.append("- Limit results to 100 rows maximum unless specifically asked for more")
-    parts.append("- When querying dim_users, filter by is_current = TRUE to get current records only")
+    parts.append("- When querying dim_users alone, filter by is_current = TRUE to get current records only")
+    parts.append("- fact_transactions.user_key is the dim_users version valid at purchase time: join it to surrogate_key without an is_current filter and count customers by user_id")
     
     return "\n".join(parts)
 
@@ -16,7 +16,7 @@ from pathlib import Path
 # PATHS
 # ──────────────────────────────────────────────
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-DATA_DIR     = PROJECT_ROOT / "data"
+DATA_DIR     = Path(os.getenv("RETAILNEXUS_DATA_DIR") or PROJECT_ROOT / "data")
 RAW_DIR      = DATA_DIR / "raw"
 SILVER_DIR   = DATA_DIR / "silver"
 GOLD_DIR     = DATA_DIR / "gold"
@@ -0,0 +1,179 @@
+"""
+RetailNexus — Persistent DuckDB Warehouse
+==========================================
+Optional DuckDB database that mirrors the Gold Layer as native tables, so KPI
+queries hit DuckDB's own storage (row-group zone maps, buffer pool) through a
+long-lived read-only connection instead of re-parsing parquet footers per call.
+
+Enable with WAREHOUSE_ENABLED=true. The star-schema builder calls
+refresh_warehouse() after every Gold build; if that fails it calls
+unpublish_warehouse(), so KPIs read the new Gold parquet rather than a stale
+snapshot.
+
+Layout:
+    data/warehouse/warehouse_<stamp>.duckdb   immutable snapshots
+    data/warehouse/CURRENT                    name of the published snapshot
+
+DuckDB does not allow one process to write a database file while another has
+it open, and the pipeline runs outside the API process. Each refresh therefore
+builds a fresh snapshot file and flips the CURRENT pointer; readers notice the
+new pointer and reopen. Old snapshots are pruned once nothing holds them.
+"""
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import duckdb
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+WAREHOUSE_DIR = Path(os.getenv("RETAILNEXUS_DATA_DIR") or PROJECT_ROOT / "data") / "warehouse"
+CURRENT_POINTER = WAREHOUSE_DIR / "CURRENT"
+
+WAREHOUSE_ENABLED = os.getenv("WAREHOUSE_ENABLED", "false").lower() == "true"
+
+# Snapshots kept besides the current one (readers may still be on them)
+_KEEP_SNAPSHOTS = 2
+
+_state_lock = threading.Lock()
+_state = {"snapshot": None, "conn": None, "tables": {}}
+
+
+# ─────────────────────────────────────────────────
+# Writer side (pipeline)
+# ─────────────────────────────────────────────────
+def refresh_warehouse(tables: Dict[str, str]) -> Optional[Path]:
+    """
+    Materialize Gold tables into a new warehouse snapshot and publish it.
+
+    Args:
+        tables: Mapping of table name to DuckDB read expression, as returned
+                by schema_inspector.discover_tables().
+
+    Returns:
+        Path of the published snapshot, or None if there was nothing to load.
+    """
+    if not tables:
+        print("[Warehouse] No Gold tables to load - skipping refresh")
+        return None
+
+    WAREHOUSE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    snapshot = WAREHOUSE_DIR / f"warehouse_{stamp}.duckdb"
+    tmp_snapshot = WAREHOUSE_DIR / f"_building_{stamp}.duckdb"
+
+    conn = duckdb.connect(str(tmp_snapshot))
+    try:
+        for name, read_expr in tables.items():
+            conn.execute(f'CREATE TABLE "{name}" AS SELECT * FROM {read_expr}')
+        conn.execute("CHECKPOINT")
+    except Exception:
+        conn.close()
+        _remove_quietly(tmp_snapshot)
+        _remove_quietly(Path(f"{tmp_snapshot}.wal"))
+        raise
+    conn.close()
+
+    os.replace(tmp_snapshot, snapshot)
+    tmp_pointer = WAREHOUSE_DIR / "CURRENT.tmp"
+    tmp_pointer.write_text(snapshot.name)
+    os.replace(tmp_pointer, CURRENT_POINTER)
+
+    _prune_snapshots(keep=snapshot.name)
+    print(f"[Warehouse] Published {snapshot.name} ({len(tables)} tables)")
+    return snapshot
+
+
+def unpublish_warehouse():
+    """
+    Remove the CURRENT pointer, so readers drop the snapshot and query Gold
+    parquet until a refresh succeeds again. Raises OSError if it can't.
+    """
+    try:
+        CURRENT_POINTER.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _remove_quietly(path: Path):
+    try:
+        if path.exists():
+            path.unlink()
+    except OSError:
+        pass
+
+
+def _prune_snapshots(keep: str):
+    """Delete old snapshots; files still open by a reader are retried next refresh."""
+    snapshots = sorted(WAREHOUSE_DIR.glob("warehouse_*.duckdb"), reverse=True)
+    older = [s for s in snapshots if s.name != keep][_KEEP_SNAPSHOTS:]
+    for path in older:
+        _remove_quietly(path)
+        _remove_quietly(Path(f"{path}.wal"))
+
+
+# ─────────────────────────────────────────────────
+# Reader side (API / KPI queries)
+# ─────────────────────────────────────────────────
+def current_snapshot() -> Optional[Path]:
+    """Return the published snapshot path, or None if no warehouse exists."""
+    try:
+        name = CURRENT_POINTER.read_text().strip()
+    except OSError:
+        return None
+    path = WAREHOUSE_DIR / name
+    return path if name and path.exists() else None
+
+
+def _sync():
+    """Reopen the shared read-only connection if a newer snapshot was published."""
+    snapshot = current_snapshot()
+    with _state_lock:
+        if snapshot == _state["snapshot"]:
+            return
+        conn, tables = None, {}
+        if snapshot is not None:
+            try:
+                conn = duckdb.connect(str(snapshot), read_only=True)
+                names = conn.execute(
+                    "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
+                ).fetchall()
+                tables = {n[0]: f'"{n[0]}"' for n in names}
+            except (duckdb.Error, OSError) as e:
+                print(f"[Warehouse] Cannot open {snapshot.name}: {e}")
+                conn, tables, snapshot = None, {}, None
+        # The previous connection is not closed here: a query on another
+        # thread may still hold it. It is released once that reference drops.
+        _state.update(snapshot=snapshot, conn=conn, tables=tables)
+
+
+def get_tables() -> Dict[str, str]:
+    """Table name -> table reference inside the current warehouse snapshot."""
+    _sync()
+    return dict(_state["tables"])
+
+
+def get_read_connection() -> Optional[duckdb.DuckDBPyConnection]:
+    """Long-lived read-only connection to the snapshot last seen by get_tables()."""
+    return _state["conn"]
+
+
+def close_read_connection():
+    """Drop the shared connection (e.g. before deleting the warehouse directory)."""
+    with _state_lock:
+        conn = _state["conn"]
+        _state.update(snapshot=None, conn=None, tables={})
+    if conn is not None:
+        try:
+            conn.close()
+        except duckdb.Error:
+            pass
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from src.analytics.schema_inspector import load_business_context, discover_tables
+
+    refresh_warehouse(discover_tables(load_business_context()["gold_layer_path"]))
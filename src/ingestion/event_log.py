@@ -0,0 +1,365 @@
+"""
+RetailNexus — Segmented Event Log
+==================================
+Streaming buffer split into append-only segments, replacing the single
+ever-growing events.jsonl.
+
+Layout:
+    data/streaming/log/segment_<base_seq>.jsonl   one JSON event per line
+    data/streaming/log/index.json                 segment metadata (written by the producer)
+    data/streaming/log/offsets/<consumer>.json    committed position per consumer
+    data/streaming/log/archive/                   consumed segments (EVENT_LOG_RETENTION=archive)
+
+The newest segment is the active one; the producer rolls to a new segment
+once it reaches EVENT_LOG_SEGMENT_MB or EVENT_LOG_SEGMENT_SECONDS, and every
+earlier segment is sealed and never written again. `base_seq` is the
+sequence number of the segment's first event, so segment order does not
+depend on the index.
+
+Consumers read independently from their own (segment, byte offset) and
+commit after processing. Sealed segments every consumer has moved past are
+deleted or archived, which bounds disk usage and keeps recovery a seek.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+STREAM_DIR = Path(os.getenv("RETAILNEXUS_DATA_DIR") or PROJECT_ROOT / "data") / "streaming"
+LOG_DIR = STREAM_DIR / "log"
+INDEX_FILE = LOG_DIR / "index.json"
+OFFSETS_DIR = LOG_DIR / "offsets"
+ARCHIVE_DIR = LOG_DIR / "archive"
+# Single-file buffer used before segmentation; adopted as the first segment
+LEGACY_BUFFER = STREAM_DIR / "events.jsonl"
+
+SEGMENT_MAX_BYTES = int(float(os.getenv("EVENT_LOG_SEGMENT_MB", "16")) * 1024 * 1024)
+SEGMENT_MAX_SECONDS = float(os.getenv("EVENT_LOG_SEGMENT_SECONDS", "3600"))
+RETENTION = os.getenv("EVENT_LOG_RETENTION", "delete").lower()  # delete | archive
+
+_SEGMENT_PREFIX = "segment_"
+_writer_lock = threading.Lock()
+_writer = {"index": None}
+
+
+def _ensure_dirs():
+    OFFSETS_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def _segment_name(base_seq: int) -> str:
+    return f"{_SEGMENT_PREFIX}{base_seq:020d}.jsonl"
+
+
+def _base_seq(name: str) -> int:
+    return int(name[len(_SEGMENT_PREFIX):].split(".")[0])
+
+
+# Name the legacy events.jsonl gets when adopted, so old checkpoints can follow it
+LEGACY_SEGMENT = _segment_name(0)
+
+
+def _write_json(path: Path, data: Dict):
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def list_segments() -> List[Path]:
+    """Retained segments, oldest first. The last one is the active segment."""
+    adopt_legacy_buffer()
+    if not LOG_DIR.exists():
+        return []
+    segments = [p for p in LOG_DIR.iterdir()
+                if p.name.startswith(_SEGMENT_PREFIX) and p.suffix == ".jsonl"]
+    return sorted(segments, key=lambda p: _base_seq(p.name))
+
+
+def adopt_legacy_buffer():
+    """Move a pre-segmentation events.jsonl into the log as its first segment."""
+    if not LEGACY_BUFFER.exists():
+        return
+    _ensure_dirs()
+    if any(p.name.startswith(_SEGMENT_PREFIX) for p in LOG_DIR.iterdir()):
+        print(f"[EventLog] Ignoring {LEGACY_BUFFER.name}: log already has segments")
+        return
+    try:
+        os.replace(LEGACY_BUFFER, LOG_DIR / LEGACY_SEGMENT)
+        print(f"[EventLog] Adopted {LEGACY_BUFFER.name} as {LEGACY_SEGMENT}")
+    except FileNotFoundError:
+        pass  # another process adopted it first
+
+
+# ─────────────────────────────────────────────────
+# Producer side
+# ─────────────────────────────────────────────────
+def _count_lines(path: Path) -> int:
+    count = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            count += block.count(b"\n")
+    return count
+
+
+def _rebuild_index(segments: List[Path]) -> Dict:
+    """Reconstruct the index from the segment files (missing or corrupt index)."""
+    index = {"next_seq": 0, "segments": {}}
+    now = datetime.now().isoformat()
+    for path in segments:
+        events = _count_lines(path)
+        index["segments"][path.name] = {
+            "base_seq": _base_seq(path.name),
+            "events": events,
+            "bytes": path.stat().st_size,
+            "created_at": now,
+            "sealed_at": None,
+        }
+        index["next_seq"] = _base_seq(path.name) + events
+    return index
+
+
+def _load_writer_index() -> Dict:
+    segments = list_segments()
+    index = _read_json(INDEX_FILE)
+    names = {p.name for p in segments}
+    if index is None or not names.issubset(index.get("segments", {})):
+        index = _rebuild_index(segments)
+    if segments:
+        # A crash mid-write can leave a partial last line; never append after it
+        active = segments[-1]
+        with open(active, "rb") as f:
+            f.seek(max(active.stat().st_size - 1, 0))
+            tail = f.read(1)
+        if tail and tail != b"\n":
+            index["segments"][active.name]["sealed_at"] = datetime.now().isoformat()
+            index["force_roll"] = True
+    return index
+
+
+def _active_segment(index: Dict) -> Tuple[Path, Dict]:
+    """Return the segment to append to, rolling a new one when the active one is full or old."""
+    segments = {name: meta for name, meta in index["segments"].items()
+                if (LOG_DIR / name).exists()}
+    index["segments"] = segments
+    if segments:
+        name = max(segments, key=_base_seq)
+        meta = segments[name]
+        created = datetime.fromisoformat(meta["created_at"]).timestamp()
+        full = meta["bytes"] >= SEGMENT_MAX_BYTES
+        expired = meta["events"] > 0 and time.time() - created >= SEGMENT_MAX_SECONDS
+        if not (full or expired or index.pop("force_roll", False)):
+            return LOG_DIR / name, meta
+        meta["sealed_at"] = meta.get("sealed_at") or datetime.now().isoformat()
+
+    name = _segment_name(index["next_seq"])
+    (LOG_DIR / name).touch()
+    meta = {
+        "base_seq": index["next_seq"],
+        "events": 0,
+        "bytes": 0,
+        "created_at": datetime.now().isoformat(),
+        "sealed_at": None,
+    }
+    segments[name] = meta
+    return LOG_DIR / name, meta
+
+
+def append_events(events: List[Dict]):
+    """Append events to the active segment (one write and one index update per call)."""
+    append_lines([json.dumps(e) for e in events])
+
+
+def append_lines(lines: List[str]):
+    """Append already serialized events (one JSON object per string, no newline) in one write."""
+    if not lines:
+        return
+    _ensure_dirs()
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    with _writer_lock:
+        if _writer["index"] is None:
+            _writer["index"] = _load_writer_index()
+        index = _writer["index"]
+        path, meta = _active_segment(index)
+        with open(path, "ab") as f:
+            f.write(payload)
+        meta["events"] += len(lines)
+        meta["bytes"] += len(payload)
+        index["next_seq"] += len(lines)
+        index["updated_at"] = datetime.now().isoformat()
+        _write_json(INDEX_FILE, index)
+
+
+# ─────────────────────────────────────────────────
+# Consumer side
+# ─────────────────────────────────────────────────
+def _offset_file(consumer: str) -> Path:
+    return OFFSETS_DIR / f"{consumer}.json"
+
+
+def get_position(consumer: str) -> Optional[Dict]:
+    """Committed position and counters of a consumer, or None if it never committed."""
+    return _read_json(_offset_file(consumer))
+
+
+def register_consumer(consumer: str):
+    """Pin a new consumer at the oldest retained segment so retention waits for it."""
+    if get_position(consumer) is not None:
+        return
+    segments = list_segments()
+    if segments:
+        _ensure_dirs()
+        _write_json(_offset_file(consumer), {
+            "segment": segments[0].name,
+            "offset": 0,
+            "updated_at": datetime.now().isoformat(),
+        })
+
+
+def read_events(consumer: str, max_bytes: Optional[int] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Read complete events after the consumer's committed position.
+
+    A trailing line without a newline in the active segment is still being
+    written and is left for the next read. With `max_bytes`, reading stops
+    at the end of the line that crosses the budget (at least one line is
+    read), so the returned position may fall inside a segment.
+
+    Returns:
+        (events, position) — pass the position to commit() once processed.
+    """
+    segments = list_segments()
+    committed = get_position(consumer) or {}
+    position = {"segment": committed.get("segment"), "offset": committed.get("offset", 0)}
+    if not segments:
+        return [], position
+
+    start_seq = _base_seq(position["segment"]) if position["segment"] else -1
+    remaining = [p for p in segments if _base_seq(p.name) >= start_seq]
+    if not remaining:
+        return [], position
+
+    events, read_bytes = [], 0
+    for i, path in enumerate(remaining):
+        offset = position["offset"] if path.name == position["segment"] else 0
+        sealed = i < len(remaining) - 1
+        try:
+            size = path.stat().st_size
+            if size < offset:
+                print(f"[EventLog] {path.name} shrank below offset {offset} - rereading it")
+                offset = 0
+            with open(path, "rb") as f:
+                f.seek(offset)
+                if max_bytes is None:
+                    chunk = f.read()
+                else:
+                    # Finish the line the budget cuts through
+                    chunk = f.read(max(max_bytes - read_bytes, 0)) + f.readline()
+                at_eof = not f.read(1)
+        except FileNotFoundError:
+            continue  # retired by another consumer between listing and reading
+
+        end = len(chunk) if sealed and at_eof else chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                print(f"[WARN] Skipping malformed event in {path.name}")
+        position = {"segment": path.name, "offset": offset + end}
+        read_bytes += end
+        if max_bytes is not None and read_bytes >= max_bytes:
+            break
+
+    return events, position
+
+
+def commit(consumer: str, position: Dict, **counters):
+    """Persist a consumer position (plus any counters), then retire consumed segments."""
+    _ensure_dirs()
+    state = {**(get_position(consumer) or {}), **counters, **position,
+             "updated_at": datetime.now().isoformat()}
+    _write_json(_offset_file(consumer), state)
+    retire_consumed_segments()
+
+
+def retire_consumed_segments() -> int:
+    """Delete (or archive) sealed segments that every consumer has moved past."""
+    if not OFFSETS_DIR.exists():
+        return 0
+    positions = [_read_json(p) for p in OFFSETS_DIR.glob("*.json")]
+    positions = [p for p in positions if p and p.get("segment")]
+    if not positions:
+        return 0
+    low_water = min(_base_seq(p["segment"]) for p in positions)
+
+    retired = 0
+    for path in list_segments()[:-1]:  # never the active segment
+        if _base_seq(path.name) >= low_water:
+            break
+        try:
+            if RETENTION == "archive":
+                ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+                os.replace(path, ARCHIVE_DIR / path.name)
+            else:
+                path.unlink()
+            retired += 1
+        except FileNotFoundError:
+            pass
+    if retired:
+        print(f"[EventLog] Retired {retired} consumed segment(s) ({RETENTION})")
+    return retired
+
+
+def log_stats() -> Dict:
+    """Retained segments/events/bytes from the index — no segment scans."""
+    index = _read_json(INDEX_FILE) or {"next_seq": 0, "segments": {}}
+    retained = {name: meta for name, meta in index.get("segments", {}).items()
+                if (LOG_DIR / name).exists()}
+    return {
+        "segments": len(retained),
+        "events_retained": sum(m["events"] for m in retained.values()),
+        "bytes_retained": sum(m["bytes"] for m in retained.values()),
+        "next_seq": index.get("next_seq", 0),
+    }
+
+
+def consumer_lag(consumer: str) -> Dict:
+    """
+    Bytes appended after a consumer's committed position, from the index.
+    `events` is estimated from each segment's average event size.
+    """
+    index = _read_json(INDEX_FILE) or {"next_seq": 0, "segments": {}}
+    position = get_position(consumer) or {}
+    start_seq = _base_seq(position["segment"]) if position.get("segment") else -1
+    lag = {"bytes": 0, "events": 0}
+    for name, meta in index.get("segments", {}).items():
+        if _base_seq(name) < start_seq:
+            continue
+        offset = position.get("offset", 0) if name == position.get("segment") else 0
+        remaining = max(meta["bytes"] - offset, 0)
+        lag["bytes"] += remaining
+        if meta["bytes"]:
+            lag["events"] += round(meta["events"] * remaining / meta["bytes"])
+    return lag
+
+
+def reset_log():
+    """Remove every segment, the index and all consumer offsets."""
+    with _writer_lock:
+        _writer["index"] = None
+        if LOG_DIR.exists():
+            shutil.rmtree(LOG_DIR)
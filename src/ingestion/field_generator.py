@@ -13,14 +13,16 @@ from faker import Faker
 class FieldGenerator:
     """Generates field values based on schema configuration."""
     
-    def __init__(self, faker_instance: Faker = None):
+    def __init__(self, faker_instance: Faker = None, as_of: datetime = None):
         """
         Initialize field generator.
         
         Args:
             faker_instance: Faker instance to use (creates new one if None)
+            as_of: Reference time for relative dates like '-30d' (default: now)
         """
         self.fake = faker_instance or Faker()
+        self.as_of = as_of
         self._id_counters = {}  # Track ID counters per prefix
         self._fk_pools = {}  # Store foreign key pools
     
@@ -111,25 +113,26 @@ class FieldGenerator:
             return str(self.fake.word())
     
     def _parse_relative_date(self, date_str: str):
-        """Parse relative date strings like '-30d', 'today'."""
+        """Parse relative date strings like '-30d', 'today' (relative to as_of)."""
+        now = self.as_of or datetime.now()
         if date_str == "today":
-            return datetime.now()
+            return now
         elif date_str == "now":
-            return datetime.now()
+            return now
         elif date_str.endswith("d"):
             # Relative days: "-30d"
             days = int(date_str[:-1])
-            return datetime.now() + timedelta(days=days)
+            return now + timedelta(days=days)
         elif date_str.endswith("y"):
             # Relative years: "-2y"
             years = int(date_str[:-1])
-            return datetime.now() + timedelta(days=years * 365)
+            return now + timedelta(days=years * 365)
         else:
             # Try parsing as ISO date
             try:
                 return datetime.fromisoformat(date_str)
             except:
-                return datetime.now()
+                return now
     
     def register_fk_pool(self, table_name: str, field_name: str, values: List[Any]):
         """
@@ -3,6 +3,12 @@ RetailNexus Schema-Driven Data Generator
 =========================================
 Generates retail data based on business context schema definitions.
 Adapts to any retail vertical (bakery, clothing, etc.) without hardcoding.
+
+Row mode (default) builds rows one at a time through FieldGenerator.
+Vectorized mode (--vectorized, see vector_generator.py) builds whole columns
+with NumPy and writes them in chunks, for millions of rows; --workers N
+generates the chunks in N processes. With --seed and --as-of the output is
+byte-identical across runs.
 """
 import os
 import random
@@ -21,6 +27,7 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.ingestion.field_generator import FieldGenerator
+from src.ingestion import vector_generator
 
 # Initialize Faker with time-based seed for unique data each run
 fake = Faker()
@@ -28,7 +35,7 @@ _seed = int(datetime.now().timestamp() * 1000) % (2**32)
 Faker.seed(_seed)
 random.seed(_seed)
 
-RAW_DIR = PROJECT_ROOT / "data" / "raw"
+RAW_DIR = Path(os.getenv("RETAILNEXUS_DATA_DIR") or PROJECT_ROOT / "data") / "raw"
 
 
 def _ensure_raw_dir():
@@ -218,13 +225,21 @@ def generate_inventory(
     return pd.DataFrame(rows)
 
 
-def main(num_transactions: int = 100, context_name: str = None):
+def main(num_transactions: int = 100, context_name: str = None, vectorized: bool = False,
+         fmt: str = "csv", seed: int = None, chunk_rows: int = None, workers: int = None,
+         as_of: datetime = None):
     """
     Generate all data files based on business context schema.
     
     Args:
         num_transactions: Number of transactions to generate
         context_name: Optional context name to override active context
+        vectorized: Generate whole columns with NumPy, written in chunks
+        fmt: Output format, "csv" or "parquet"
+        seed: Seed for reproducible output (default: time-based)
+        chunk_rows: Rows per written chunk in vectorized mode
+        workers: Processes generating chunks (implies vectorized when > 1)
+        as_of: Reference time for relative dates in the schema (default: now)
     """
     # Configure stdout for UTF-8
     if hasattr(sys.stdout, 'reconfigure'):
@@ -251,12 +266,28 @@ def main(num_transactions: int = 100, context_name: str = None):
     print(f"[START] Generating data for: {context['name']}")
     print(f"[INFO] Schema tables: {', '.join(schema.keys())}")
     
-    field_gen = FieldGenerator(fake)
+    if seed is not None:
+        Faker.seed(seed)
+        random.seed(seed)
+    field_gen = FieldGenerator(fake, as_of=as_of)
     fk_pools = {}
     
     # Generate tables in dependency order
     table_order = ["users", "products", "transactions", "inventory", "shipments"]
     
+    if vectorized or (workers or 0) > 1:
+        if num_transactions and "transactions" in schema:
+            schema["transactions"]["num_transactions"] = num_transactions
+        written = vector_generator.generate_all(
+            schema, RAW_DIR, timestamp, fmt=fmt, seed=seed, chunk_rows=chunk_rows,
+            as_of=as_of, workers=workers, table_order=table_order,
+        )
+        for table_name, info in written.items():
+            target = info["files"][0].name if len(info["files"]) == 1 else f"{len(info['files'])} files"
+            print(f"[OK] Generated {info['rows']} {table_name} → {target}")
+        print(f"[OK] Generation complete for {context['name']}!")
+        return
+    
     for table_name in table_order:
         if table_name not in schema:
             continue
@@ -270,9 +301,12 @@ def main(num_transactions: int = 100, context_name: str = None):
         # Generate table
         df = generate_table(table_name, table_config, field_gen, fk_pools)
         
-        # Save to CSV
-        file_path = RAW_DIR / f"{table_name}_{timestamp}.csv"
-        df.to_csv(file_path, index=False)
+        # Save to CSV (or Parquet)
+        file_path = RAW_DIR / f"{table_name}_{timestamp}.{fmt}"
+        if fmt == "parquet":
+            df.to_parquet(file_path, index=False)
+        else:
+            df.to_csv(file_path, index=False)
         
         # Collect foreign key pools
         id_fields = [f for f, cfg in table_config["fields"].items() if cfg.get("type") == "id"]
@@ -308,6 +342,43 @@ if __name__ == "__main__":
         default=None,
         help="Business context to use (default: active context from config)",
     )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Generate whole columns with NumPy in chunks (for millions of rows)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Output file format (default: csv)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for reproducible output (default: time-based)",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="Rows per written chunk in vectorized mode (default: GENERATOR_CHUNK_ROWS)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes generating chunks, one file per chunk (implies --vectorized; default: GENERATOR_WORKERS)",
+    )
+    parser.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Reference date for relative dates like '-30d' (ISO, default: now); fix it for repeatable datasets",
+    )
     args = parser.parse_args()
     
-    main(num_transactions=args.num_transactions, context_name=args.context)
+    main(num_transactions=args.num_transactions, context_name=args.context,
+         vectorized=args.vectorized, fmt=args.format, seed=args.seed, chunk_rows=args.chunk_rows,
+         workers=args.workers, as_of=args.as_of)
@@ -1,9 +1,13 @@
 """
 RetailNexus Stream Generator
 Simulates real-time retail events: orders, users, products, inventory, and shipments.
-Writes all event types to a single streaming buffer (JSONL).
+Writes all event types to the segmented streaming log (see event_log.py).
+
+Load mode (--rate N) appends N events per second in batches instead, to find
+the stream processor's saturation point.
 """
 import os
+import sys
 import json
 import time
 import random
@@ -12,12 +16,14 @@ from pathlib import Path
 
 from faker import Faker
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.ingestion import event_log
+
 fake = Faker()
 
 # Paths
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-STREAM_DIR = PROJECT_ROOT / "data" / "streaming"
-STREAM_BUFFER = STREAM_DIR / "events.jsonl"
+STREAM_DIR = Path(os.getenv("RETAILNEXUS_DATA_DIR") or PROJECT_ROOT / "data") / "streaming"
 
 # Stable pools
 _USER_POOL_SIZE = 50
@@ -39,6 +45,19 @@ PRODUCT_NAMES = {
     "Books": ["Python Handbook", "Data Science Guide", "AI Fundamentals", "ML Engineering", "Cloud Architecture", "DevOps Manual"],
 }
 
+# Load mode: seconds between batched writes (each carries the events due since the last)
+LOAD_TICK_SECONDS = float(os.getenv("STREAM_LOAD_TICK_SECONDS", "0.05"))
+# Load mode: share of each event type, the same mix as the continuous loop
+# (every order, 50% shipments, 20% inventory, 10% users, 10% products)
+LOAD_EVENT_MIX = (
+    ("order", 1.0),
+    ("shipment", 0.5),
+    ("inventory", 0.2),
+    ("user", 0.1),
+    ("product", 0.1),
+)
+_LOAD_TEMPLATES = 2000  # pre-serialized events per type
+
 CARRIERS = ["FedEx", "UPS", "USPS", "DHL", "Amazon Logistics"]
 SHIP_STATUSES = ["shipped", "delivered", "delivered", "delivered", "delayed"]  # weighted toward delivered
 STOCK_STATUSES = ["in_stock", "in_stock", "in_stock", "low_stock", "out_of_stock"]
@@ -152,10 +171,8 @@ def generate_shipment_event(transaction_id: str = None) -> dict:
 
 
 def append_event(event: dict):
-    """Append event to streaming buffer (JSONL format)."""
-    _ensure_dirs()
-    with open(STREAM_BUFFER, 'a') as f:
-        f.write(json.dumps(event) + '\n')
+    """Append event to the streaming log."""
+    event_log.append_events([event])
 
 
 def generate_initial_seed_data():
@@ -244,6 +261,17 @@ def generate_burst_data(num_orders: int = 50):
     return events
 
 
+def _seed_if_needed():
+    """Write the initial users/products/inventory/shipments once per streaming directory."""
+    seed_marker = STREAM_DIR / ".seeded"
+    if not seed_marker.exists():
+        print("[STREAM] Generating initial seed data (users, products, inventory, shipments)...")
+        seed_events = generate_initial_seed_data()
+        event_log.append_events(seed_events)
+        seed_marker.touch()
+        print(f"[STREAM] Seeded {len(seed_events)} initial events")
+
+
 def run_stream_generator(interval_seconds: float = 5.0, max_events: int = None, burst_on_start: bool = True):
     """
     Run the stream generator continuously.
@@ -259,23 +287,13 @@ def run_stream_generator(interval_seconds: float = 5.0, max_events: int = None,
         sys.stdout.reconfigure(encoding='utf-8')
 
     print(f"[STREAM] Stream Generator started (interval: {interval_seconds}s)")
-    
-    # Seed data: check if we need initial data
-    seed_marker = STREAM_DIR / ".seeded"
-    if not seed_marker.exists():
-        print("[STREAM] Generating initial seed data (users, products, inventory, shipments)...")
-        seed_events = generate_initial_seed_data()
-        for event in seed_events:
-            append_event(event)
-        seed_marker.touch()
-        print(f"[STREAM] Seeded {len(seed_events)} initial events")
+    _seed_if_needed()
     
     # Generate burst of data on start to populate all KPIs
     if burst_on_start:
         print("[STREAM] Generating burst data to populate all KPIs...")
         burst_events = generate_burst_data(num_orders=50)
-        for event in burst_events:
-            append_event(event)
+        event_log.append_events(burst_events)
         print(f"[STREAM] Generated {len(burst_events)} burst events")
 
     events_generated = 0
@@ -284,29 +302,27 @@ def run_stream_generator(interval_seconds: float = 5.0, max_events: int = None,
         while True:
             # Always generate an order
             order = generate_order_event()
-            append_event(order)
-            events_generated += 1
+            events = [order]
 
             # 50% chance: also generate a shipment for this order (increased from 30%)
             if random.random() < 0.5:
-                shipment = generate_shipment_event(order["transaction_id"])
-                append_event(shipment)
-                events_generated += 1
+                events.append(generate_shipment_event(order["transaction_id"]))
 
             # 20% chance: inventory update (increased from 10%)
             if random.random() < 0.2:
-                append_event(generate_inventory_event())
-                events_generated += 1
+                events.append(generate_inventory_event())
 
             # 10% chance: user update (increased from 5%)
             if random.random() < 0.1:
-                append_event(generate_user_event())
-                events_generated += 1
+                events.append(generate_user_event())
 
             # 10% chance: product update (increased from 5%)
             if random.random() < 0.1:
-                append_event(generate_product_event())
-                events_generated += 1
+                events.append(generate_product_event())
+
+            # One write for the whole group
+            event_log.append_events(events)
+            events_generated += len(events)
 
             print(f"[EVENT] #{events_generated}: {order['transaction_id']} ({len(order['products'])} products)")
 
@@ -321,6 +337,134 @@ def run_stream_generator(interval_seconds: float = 5.0, max_events: int = None,
         print(f"\n[STOP] Stream Generator stopped ({events_generated} events generated)")
 
 
+# ── Load Mode ─────────────────────────────────────────
+
+def _template(event: dict, slots: dict) -> str:
+    """Serialize an event with %(slot)s placeholders for the given fields."""
+    marked = {**event, **{field: f"__{slot}__" for field, slot in slots.items()}}
+    text = json.dumps(marked).replace("%", "%%")
+    for slot in slots.values():
+        text = text.replace(f'"__{slot}__"', f'"%({slot})s"')
+    return text
+
+
+def build_load_templates(size: int = _LOAD_TEMPLATES) -> dict:
+    """Pre-serialized events per type; order/shipment ids and order timestamps are filled per event."""
+    return {
+        "order": [_template(generate_order_event(), {"transaction_id": "txn", "timestamp": "ts"})
+                  for _ in range(size)],
+        "shipment": [_template(generate_shipment_event(), {"transaction_id": "txn", "shipment_id": "shp"})
+                     for _ in range(size)],
+        "inventory": [json.dumps(generate_inventory_event()) for _ in range(size)],
+        "user": [json.dumps(generate_user_event()) for _ in range(size)],
+        "product": [json.dumps(generate_product_event()) for _ in range(size)],
+    }
+
+
+def load_batch(templates: dict, count: int, first_seq: int, run_id: int, timestamp: str) -> list:
+    """
+    `count` serialized events in the LOAD_EVENT_MIX proportions.
+    Ids are `<run_id><seq>`, unique per run; shipments refer to the latest order.
+    """
+    kinds = random.choices([k for k, _ in LOAD_EVENT_MIX], weights=[w for _, w in LOAD_EVENT_MIX], k=count)
+    picks = random.choices(range(len(templates["order"])), k=count)
+    txn = f"TXN_{run_id}{first_seq:08d}"
+    lines = []
+    for seq, kind, pick in zip(range(first_seq, first_seq + count), kinds, picks):
+        if kind == "order":
+            txn = f"TXN_{run_id}{seq:08d}"
+            lines.append(templates["order"][pick] % {"txn": txn, "ts": timestamp})
+        elif kind == "shipment":
+            lines.append(templates["shipment"][pick] % {"txn": txn, "shp": f"SHP_{run_id}{seq:08d}"})
+        else:
+            lines.append(templates[kind][pick])
+    return lines
+
+
+def run_load_generator(rate: float, duration_seconds: float = None, max_events: int = None,
+                       report_seconds: float = 1.0, consumer: str = "processor") -> dict:
+    """
+    Append events at a target rate for load testing the stream processor.
+
+    The rate is held by a schedule (rate x elapsed time), not a sleep per
+    event: every LOAD_TICK_SECONDS one event_log.append_lines() call writes
+    all events due since the last write, formatted from pre-serialized
+    templates. If generating or writing falls behind, the next batches catch
+    up (at most one second of events per write).
+
+    Every `report_seconds` it prints the achieved rate, how far the generator
+    is behind its schedule, and the consumer's lag (log bytes/events it has
+    not committed yet). A growing consumer lag at a steady achieved rate means
+    the processor is saturated; a growing "behind" means the generator is.
+
+    Args:
+        rate: Target events per second
+        duration_seconds: Stop after this long (None = until max_events or Ctrl+C)
+        max_events: Stop after this many events
+        report_seconds: Seconds between progress lines
+        consumer: Event log consumer whose lag is reported
+
+    Returns:
+        Summary: events, seconds, achieved_rate, max_behind_seconds, consumer_lag
+    """
+    _ensure_dirs()
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8')
+    _seed_if_needed()
+
+    templates = build_load_templates()
+    run_id = int(time.time() * 1000)
+    max_batch = max(1, int(rate))
+    print(f"[LOAD] Target {rate:,.0f} events/s (tick {LOAD_TICK_SECONDS}s, reporting {consumer} lag)")
+
+    started = time.perf_counter()
+    sent, max_behind = 0, 0.0
+    window_start, window_sent = started, 0
+    try:
+        while True:
+            now = time.perf_counter()
+            elapsed = now - started
+            if duration_seconds is not None and elapsed >= duration_seconds:
+                break
+            if max_events is not None and sent >= max_events:
+                break
+
+            due = int(elapsed * rate) - sent
+            if max_events is not None:
+                due = min(due, max_events - sent)
+            if due > 0:
+                batch = min(due, max_batch)
+                event_log.append_lines(load_batch(templates, batch, sent, run_id, datetime.now().isoformat()))
+                sent += batch
+
+            behind = ((time.perf_counter() - started) * rate - sent) / rate
+            max_behind = max(max_behind, behind)
+            if now - window_start >= report_seconds:
+                lag = event_log.consumer_lag(consumer)
+                print(f"[LOAD] {elapsed:7.1f}s  {(sent - window_sent) / (now - window_start):>10,.0f} events/s  "
+                      f"behind {max(behind, 0):5.2f}s  {consumer} lag {lag['events']:,} events "
+                      f"({lag['bytes'] / 1e6:.1f} MB)")
+                window_start, window_sent = now, sent
+            if behind < LOAD_TICK_SECONDS:
+                time.sleep(LOAD_TICK_SECONDS)
+    except KeyboardInterrupt:
+        print()
+
+    seconds = time.perf_counter() - started
+    summary = {
+        "target_rate": rate,
+        "events": sent,
+        "seconds": round(seconds, 3),
+        "achieved_rate": round(sent / seconds, 1) if seconds > 0 else 0.0,
+        "max_behind_seconds": round(max(max_behind, 0.0), 3),
+        "consumer_lag": event_log.consumer_lag(consumer),
+    }
+    print(f"[LOAD] Done: {sent:,} events in {seconds:.1f}s ({summary['achieved_rate']:,.0f}/s of "
+          f"{rate:,.0f}/s target, max {summary['max_behind_seconds']:.2f}s behind, "
+          f"{consumer} lag {summary['consumer_lag']['events']:,} events)")
+    return summary
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -329,7 +473,12 @@ if __name__ == "__main__":
     parser.add_argument("--max-events", type=int, default=None, help="Maximum events to generate (default: infinite)")
     parser.add_argument("--burst-on-start", action="store_true", help="Generate burst of data on start to populate all KPIs")
     parser.add_argument("--no-burst", dest="burst_on_start", action="store_false", help="Skip burst data generation")
+    parser.add_argument("--rate", type=float, default=None, help="Load mode: target events per second (e.g. 50000)")
+    parser.add_argument("--duration", type=float, default=None, help="Load mode: seconds to run (default: until --max-events or Ctrl+C)")
     parser.set_defaults(burst_on_start=True)
     args = parser.parse_args()
 
-    run_stream_generator(interval_seconds=args.interval, max_events=args.max_events, burst_on_start=args.burst_on_start)
+    if args.rate:
+        run_load_generator(rate=args.rate, duration_seconds=args.duration, max_events=args.max_events)
+    else:
+        run_stream_generator(interval_seconds=args.interval, max_events=args.max_events, burst_on_start=args.burst_on_start)
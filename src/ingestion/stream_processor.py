@@ -2,22 +2,38 @@
 RetailNexus Stream Processor
 Watches streaming buffer and processes events in micro-batches.
 Handles all event types: orders, users, products, inventory, shipments.
-Writes to Bronze CSVs and triggers the full transformation pipeline.
+Writes typed Parquet to Bronze and triggers the full transformation pipeline.
+
+Reads the segmented event log (event_log.py) as the "processor" consumer.
+Progress is committed as a (segment, byte offset) position, so each tick
+seeks straight to the unread tail, and the committed position carries the
+counters reported by /api/stream/status.
 """
 import os
+import sys
 import json
 import time
-import csv
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.ingestion import event_log
 
 # Paths
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-STREAM_DIR = PROJECT_ROOT / "data" / "streaming"
-STREAM_BUFFER = STREAM_DIR / "events.jsonl"
-PROCESSED_MARKER = STREAM_DIR / "last_processed.txt"
-RAW_DIR = PROJECT_ROOT / "data" / "raw"
+DATA_DIR = Path(os.getenv("RETAILNEXUS_DATA_DIR") or PROJECT_ROOT / "data")
+STREAM_DIR = DATA_DIR / "streaming"
+CONSUMER = "processor"
+# Checkpoints from before the segmented log, carried over on first start
+LEGACY_STATE = STREAM_DIR / "processor_state.json"
+LEGACY_MARKER = STREAM_DIR / "last_processed.txt"
+RAW_DIR = DATA_DIR / "raw"
+# Log bytes read per micro-batch; a backlog after downtime drains over several batches
+STREAM_BATCH_MAX_BYTES = int(float(os.getenv("STREAM_BATCH_MAX_MB", "4")) * 1024 * 1024)
 
 
 def _ensure_dirs():
@@ -26,190 +42,236 @@ def _ensure_dirs():
     RAW_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def get_last_processed_line() -> int:
-    if PROCESSED_MARKER.exists():
-        with open(PROCESSED_MARKER, 'r') as f:
-            return int(f.read().strip())
-    return 0
-
-
-def set_last_processed_line(line_num: int):
-    with open(PROCESSED_MARKER, 'w') as f:
-        f.write(str(line_num))
-
-
-def read_new_events() -> List[Dict]:
-    """Read new events from streaming buffer since last processed line."""
-    if not STREAM_BUFFER.exists():
-        return []
-
-    last_processed = get_last_processed_line()
-    events = []
-
-    with open(STREAM_BUFFER, 'r') as f:
-        for i, line in enumerate(f, start=1):
-            if i > last_processed:
-                try:
-                    event = json.loads(line.strip())
-                    events.append(event)
-                except json.JSONDecodeError:
-                    print(f"[WARN] Skipping malformed event at line {i}")
-
-    return events
-
+def _migrate_legacy_checkpoint():
+    """
+    Translate a pre-segmentation checkpoint (byte offset in processor_state.json
+    or line count in last_processed.txt) into a position in the adopted
+    events.jsonl segment, so already-processed events are not replayed.
+    """
+    if not (LEGACY_STATE.exists() or LEGACY_MARKER.exists()):
+        return
+    legacy_segment = event_log.LOG_DIR / event_log.LEGACY_SEGMENT
+    event_log.list_segments()  # adopts events.jsonl if still present
+
+    if event_log.get_position(CONSUMER) is None and legacy_segment.exists():
+        offset, processed = 0, 0
+        if LEGACY_STATE.exists():
+            try:
+                with open(LEGACY_STATE, 'r') as f:
+                    legacy = json.load(f)
+                offset, processed = int(legacy.get("offset", 0)), int(legacy.get("events_processed", 0))
+            except (OSError, ValueError):
+                pass
+        else:
+            try:
+                lines = int(LEGACY_MARKER.read_text().strip() or 0)
+            except (OSError, ValueError):
+                lines = 0
+            with open(legacy_segment, 'rb') as f:
+                while processed < lines and f.readline():
+                    processed += 1
+                offset = f.tell()
+        event_log.commit(CONSUMER, {"segment": legacy_segment.name, "offset": offset},
+                         events_processed=processed, batches=0)
+        print(f"[PROCESSOR] Migrated legacy checkpoint to {legacy_segment.name}@{offset}")
+
+    for path in (LEGACY_STATE, LEGACY_MARKER):
+        if path.exists():
+            path.unlink()
+
+
+def read_new_events() -> Tuple[List[Dict], Dict]:
+    """
+    Read events committed to the log since this processor's last commit,
+    up to STREAM_BATCH_MAX_BYTES of it.
 
-def write_events_to_csv(events: List[Dict]):
+    Returns:
+        (events, position to commit once the events are in Bronze)
     """
-    Route events by type and write to appropriate Bronze CSV files.
+    return event_log.read_events(CONSUMER, max_bytes=STREAM_BATCH_MAX_BYTES)
+
+
+# Explicit Bronze schemas per entity, so the cleaner gets typed columns
+# instead of sniffing CSVs.
+BRONZE_SCHEMAS = {
+    "transactions": pa.schema([
+        ("transaction_id", pa.string()),
+        ("user_id", pa.string()),
+        ("product_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("amount", pa.float64()),
+        ("store_id", pa.string()),
+    ]),
+    "users": pa.schema([
+        ("user_id", pa.string()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("city", pa.string()),
+        ("signup_date", pa.date32()),
+    ]),
+    "products": pa.schema([
+        ("product_id", pa.string()),
+        ("product_name", pa.string()),
+        ("category", pa.string()),
+        ("price", pa.float64()),
+    ]),
+    "inventory": pa.schema([
+        ("product_id", pa.string()),
+        ("store_id", pa.string()),
+        ("stock_level", pa.int32()),
+        ("reorder_point", pa.int32()),
+        ("last_restock_date", pa.date32()),
+        ("stock_status", pa.string()),
+    ]),
+    "shipments": pa.schema([
+        ("shipment_id", pa.string()),
+        ("transaction_id", pa.string()),
+        ("origin_store_id", pa.string()),
+        ("dest_store_id", pa.string()),
+        ("shipped_date", pa.date32()),
+        ("delivered_date", pa.date32()),
+        ("delivery_days", pa.int32()),
+        ("carrier", pa.string()),
+        ("tracking_number", pa.string()),
+        ("status", pa.string()),
+        ("shipping_cost", pa.float64()),
+    ]),
+}
+
+EVENT_ENTITIES = {
+    "user_update": "users",
+    "product_update": "products",
+    "inventory_update": "inventory",
+    "shipment_update": "shipments",
+}
+
+
+def _coerce(value, arrow_type: pa.DataType):
+    """Convert a JSON value to the Python type pyarrow expects for `arrow_type`."""
+    if value is None or value == "":
+        return None
+    if pa.types.is_timestamp(arrow_type):
+        return datetime.fromisoformat(str(value))
+    if pa.types.is_date(arrow_type):
+        return date.fromisoformat(str(value)[:10])
+    if pa.types.is_integer(arrow_type):
+        return int(value)
+    if pa.types.is_floating(arrow_type):
+        return float(value)
+    return str(value)
+
+
+def _to_rows(entity: str, events: List[Dict]) -> List[Dict]:
+    """Flatten events of one entity into rows shaped like its Bronze schema."""
+    if entity == "transactions":
+        return [{
+            'transaction_id': event.get('transaction_id'),
+            'user_id': event.get('user_id'),
+            'product_id': product.get('product_id'),
+            'timestamp': event.get('timestamp'),
+            'amount': product.get('amount'),
+            'store_id': event.get('store_id'),
+        } for event in events for product in event.get("products", [])]
+    names = BRONZE_SCHEMAS[entity].names
+    return [{name: event.get(name) for name in names} for event in events]
+
+
+def _batch_tag(position: Dict) -> str:
+    """Log position a batch ends at: <segment base_seq>_<byte offset>."""
+    if not position.get("segment"):
+        return "0_0"
+    return f"{event_log._base_seq(position['segment'])}_{position.get('offset', 0)}"
+
+
+def write_events_to_bronze(events: List[Dict], batch_tag: str = ""):
+    """
+    Route events by type and write one typed Parquet file per entity
+    to the raw (Bronze) directory.
+
+    File names carry microseconds and the batch's log position, so two
+    batches within one second never overwrite each other's file.
     """
     if not events:
         return
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    # Group events by type
-    orders = [e for e in events if e.get("event_type") == "order_created"]
-    users = [e for e in events if e.get("event_type") == "user_update"]
-    products = [e for e in events if e.get("event_type") == "product_update"]
-    inventory = [e for e in events if e.get("event_type") == "inventory_update"]
-    shipments = [e for e in events if e.get("event_type") == "shipment_update"]
-
-    # ── Transactions ──
-    if orders:
-        txn_rows = []
-        for event in orders:
-            for product in event.get("products", []):
-                txn_rows.append({
-                    'transaction_id': event['transaction_id'],
-                    'user_id': event['user_id'],
-                    'product_id': product['product_id'],
-                    'timestamp': event['timestamp'],
-                    'amount': product['amount'],
-                    'store_id': event['store_id']
-                })
-        if txn_rows:
-            _write_csv(f"transactions_stream_{timestamp}.csv", txn_rows,
-                       ['transaction_id', 'user_id', 'product_id', 'timestamp', 'amount', 'store_id'])
-            print(f"  [CSV] {len(txn_rows)} transaction rows")
-
-    # ── Users ──
-    if users:
-        user_rows = [{
-            'user_id': e['user_id'],
-            'name': e['name'],
-            'email': e['email'],
-            'city': e['city'],
-            'signup_date': e['signup_date'],
-        } for e in users]
-        _write_csv(f"users_stream_{timestamp}.csv", user_rows,
-                   ['user_id', 'name', 'email', 'city', 'signup_date'])
-        print(f"  [CSV] {len(user_rows)} user rows")
-
-    # ── Products ──
-    if products:
-        prod_rows = [{
-            'product_id': e['product_id'],
-            'product_name': e['product_name'],
-            'category': e['category'],
-            'price': e['price'],
-        } for e in products]
-        _write_csv(f"products_stream_{timestamp}.csv", prod_rows,
-                   ['product_id', 'product_name', 'category', 'price'])
-        print(f"  [CSV] {len(prod_rows)} product rows")
-
-    # ── Inventory ──
-    if inventory:
-        inv_rows = [{
-            'product_id': e['product_id'],
-            'store_id': e['store_id'],
-            'stock_level': e['stock_level'],
-            'reorder_point': e['reorder_point'],
-            'last_restock_date': e['last_restock_date'],
-            'stock_status': e['stock_status'],
-        } for e in inventory]
-        _write_csv(f"inventory_stream_{timestamp}.csv", inv_rows,
-                   ['product_id', 'store_id', 'stock_level', 'reorder_point', 'last_restock_date', 'stock_status'])
-        print(f"  [CSV] {len(inv_rows)} inventory rows")
-
-    # ── Shipments ──
-    if shipments:
-        ship_rows = [{
-            'shipment_id': e['shipment_id'],
-            'transaction_id': e['transaction_id'],
-            'origin_store_id': e['origin_store_id'],
-            'dest_store_id': e['dest_store_id'],
-            'shipped_date': e['shipped_date'],
-            'delivered_date': e.get('delivered_date', ''),
-            'delivery_days': e.get('delivery_days', ''),
-            'carrier': e['carrier'],
-            'tracking_number': e['tracking_number'],
-            'status': e['status'],
-            'shipping_cost': e['shipping_cost'],
-        } for e in shipments]
-        _write_csv(f"shipments_stream_{timestamp}.csv", ship_rows,
-                   ['shipment_id', 'transaction_id', 'origin_store_id', 'dest_store_id',
-                    'shipped_date', 'delivered_date', 'delivery_days', 'carrier',
-                    'tracking_number', 'status', 'shipping_cost'])
-        print(f"  [CSV] {len(ship_rows)} shipment rows")
-
-
-def _write_csv(filename: str, rows: List[Dict], fieldnames: List[str]):
-    """Write rows to a CSV file in the raw directory."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    if batch_tag:
+        timestamp = f"{timestamp}_{batch_tag}"
+
+    grouped = {entity: [] for entity in BRONZE_SCHEMAS}
+    for event in events:
+        event_type = event.get("event_type")
+        if event_type == "order_created":
+            grouped["transactions"].append(event)
+        elif event_type in EVENT_ENTITIES:
+            grouped[EVENT_ENTITIES[event_type]].append(event)
+
+    for entity, entity_events in grouped.items():
+        rows = _to_rows(entity, entity_events)
+        if not rows:
+            continue
+        written = _write_parquet(f"{entity}_stream_{timestamp}.parquet", rows, BRONZE_SCHEMAS[entity])
+        print(f"  [PARQUET] {written} {entity} rows")
+
+
+def _write_parquet(filename: str, rows: List[Dict], schema: pa.Schema) -> int:
+    """Write rows to a Parquet file in the raw directory; returns rows written.
+    Rows that don't fit the schema are skipped rather than failing the batch."""
+    columns = {field.name: [] for field in schema}
+    for row in rows:
+        try:
+            values = {field.name: _coerce(row.get(field.name), field.type) for field in schema}
+        except (TypeError, ValueError) as e:
+            print(f"[WARN] Skipping malformed {filename.split('_')[0]} row: {e}")
+            continue
+        for name, value in values.items():
+            columns[name].append(value)
+
+    table = pa.Table.from_pydict(columns, schema=schema)
+    if table.num_rows == 0:
+        return 0
     filepath = RAW_DIR / filename
-    with open(filepath, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    tmp_path = filepath.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path)
+    # Atomic publish: the cleaner globs *.parquet and must never see a partial file
+    os.replace(tmp_path, filepath)
+    return table.num_rows
 
 
 def trigger_incremental_pipeline():
     """
-    Run the full transformation pipeline:
-      1. clean_all  — picks up all new raw CSVs and writes Silver parquets
-      2. apply_scd_type_2 — builds dim_users with SCD logic
-      3. build_star_schema — builds all Gold dimensions and facts
-      4. Clear KPI cache so new data is immediately available
+    Request a Bronze -> Silver -> Gold run through the pipeline coordinator:
+      1. Cleaners, SCD Type 2 and star schema — new raw files to Gold
+      2. Bronze compaction once enough small files have piled up
+      3. Gold generation bump — cached KPI results in the API are invalidated
+
+    Triggers from uploads, the orchestrator and this processor are debounced
+    and merged, and only one run executes at a time across processes; if a
+    run from elsewhere picks up this batch's files, that run is reported.
     """
     import sys
     sys.path.insert(0, str(PROJECT_ROOT))
+    from src.transformation.pipeline import run_pipeline
 
-    try:
-        from src.transformation.cleaner import clean_all
-        print("[PIPELINE] Running cleaner (Bronze -> Silver)...")
-        clean_all()
-    except Exception as e:
-        print(f"[ERROR] Cleaner failed: {e}")
-        return
-
-    try:
-        from src.transformation.scd_logic import apply_scd_type_2
-        print("[PIPELINE] Applying SCD Type 2 (dim_users)...")
-        apply_scd_type_2()
-    except Exception as e:
-        print(f"[WARN] SCD failed (non-fatal): {e}")
-
-    try:
-        from src.transformation.star_schema import build_star_schema
-        print("[PIPELINE] Building star schema (Gold)...")
-        build_star_schema()
-        print("[OK] Full pipeline complete")
-        
-        # Clear KPI cache so new data is immediately available for all KPIs
-        try:
-            import src.analytics.kpi_queries as kpi_mod
-            kpi_mod._table_cache = None
-            print("[PIPELINE] KPI cache cleared - new data available")
-        except Exception as e:
-            print(f"[WARN] Could not clear KPI cache: {e}")
-    except Exception as e:
-        print(f"[ERROR] Star schema failed: {e}")
+    print("[PIPELINE] Requesting pipeline run (Bronze -> Silver -> Gold)...")
+    result = run_pipeline(owner="stream_processor")
+    if result["status"] == "success":
+        served_by = f" (merged into {result.get('owner')} run)" if result.get("coalesced") else ""
+        print(f"[OK] Full pipeline complete{served_by}")
+    else:
+        print(f"[ERROR] Pipeline failed: {result.get('error', result.get('message'))}")
 
 
 def process_micro_batch():
     """Process one micro-batch of events."""
-    events = read_new_events()
+    events, position = read_new_events()
+    committed = event_log.get_position(CONSUMER) or {}
 
     if not events:
+        if position.get("segment") and (position.get("segment"), position.get("offset")) != (
+                committed.get("segment"), committed.get("offset")):
+            # Only malformed lines or segment roll-overs - don't rescan them
+            event_log.commit(CONSUMER, position)
         return 0
 
     # Count event types for logging
@@ -221,14 +283,16 @@ def process_micro_batch():
     summary = ", ".join(f"{v} {k}" for k, v in type_counts.items())
     print(f"\n[BATCH] Processing {len(events)} events: {summary}")
 
-    # Write to Bronze CSVs
-    write_events_to_csv(events)
+    # Write typed Parquet to Bronze
+    write_events_to_bronze(events, _batch_tag(position))
 
-    # Update marker
-    if STREAM_BUFFER.exists():
-        with open(STREAM_BUFFER, 'r') as f:
-            total_lines = sum(1 for _ in f)
-        set_last_processed_line(total_lines)
+    # Commit once the events are safely in Bronze; retires consumed segments
+    event_log.commit(
+        CONSUMER, position,
+        events_processed=committed.get("events_processed", 0) + len(events),
+        batches=committed.get("batches", 0) + 1,
+        last_batch={"events": len(events), "types": type_counts},
+    )
 
     # Run full pipeline
     trigger_incremental_pipeline()
@@ -249,6 +313,8 @@ def run_stream_processor(batch_interval: float = 10.0):
         sys.stdout.reconfigure(encoding='utf-8')
 
     print(f"[PROCESSOR] Stream Processor started (batch interval: {batch_interval}s)")
+    _migrate_legacy_checkpoint()
+    event_log.register_consumer(CONSUMER)
 
     total_processed = 0
 
@@ -259,6 +325,8 @@ def run_stream_processor(batch_interval: float = 10.0):
 
             if events_processed > 0:
                 print(f"[STATS] Total events processed: {total_processed}")
+                if event_log.consumer_lag(CONSUMER)["bytes"]:
+                    continue  # batch was capped: keep draining the backlog
 
             time.sleep(batch_interval)
 
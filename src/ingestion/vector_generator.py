@@ -0,0 +1,420 @@
+"""
+RetailNexus — Vectorized Data Generator
+========================================
+High-volume mode of the schema-driven generator (generator.py) for load
+testing. Instead of building one dict per row through FieldGenerator, every
+field is produced a whole column at a time with NumPy:
+
+  id        prefix + zero-padded counter
+  choice    options indexed by random integers
+  int/float uniform ranges (floats rounded to cents)
+  datetime  uniform seconds between start and end
+  date      uniform days between start and end
+  fk        sampled from the referenced table's ids
+  string    '?'/'#' patterns (bothify) filled per character position;
+  name/...  other Faker types are sampled from a pool of FAKER_POOL_SIZE
+            values made by FieldGenerator
+  null_rate applied as a validity mask
+
+Rows are written in chunks of `chunk_rows` through Arrow's Parquet/CSV
+writers, so memory stays bounded by the chunk, not the table. Foreign keys
+to id fields are kept as (prefix, width, count) ranges rather than value
+lists, so 10^7 transaction ids cost nothing to reference.
+
+Output has the same tables, columns and file naming as generator.main().
+
+Chunks and seeding: each chunk draws from its own NumPy generator seeded
+with (seed, table, chunk number), and Faker pools come from a Faker seeded
+with (seed, table, field). A chunk's content therefore depends only on the
+seed, chunk_rows and `as_of` (the reference time for '-30d'/'today'), not
+on which process made it. With workers > 1 chunks are generated in a
+process pool and written as <table>_<timestamp>_<chunk>.<fmt>; with one
+worker they are appended in order to a single <table>_<timestamp>.<fmt>.
+Either way the same seed and as_of reproduce byte-identical files.
+"""
+import os
+import string
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from faker import Faker
+
+from src.ingestion.field_generator import FieldGenerator
+
+# Rows per written chunk (bounds memory)
+CHUNK_ROWS = int(os.getenv("GENERATOR_CHUNK_ROWS", "500000"))
+# Distinct values drawn from Faker for name/email/other Faker-backed fields
+FAKER_POOL_SIZE = int(os.getenv("GENERATOR_FAKER_POOL_SIZE", "5000"))
+# Worker processes for chunk generation (1 = in-process, single file per table)
+WORKERS = int(os.getenv("GENERATOR_WORKERS", "1"))
+
+_ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "datetime": pa.timestamp("s"),
+    "date": pa.date32(),
+}
+_LETTERS = np.array(list(string.ascii_letters))
+_DIGITS = np.array(list(string.digits))
+
+
+@dataclass(frozen=True)
+class IdRange:
+    """Ids `prefix_<1..count, zero-padded to width>` as produced for an id field."""
+    prefix: str
+    width: int
+    count: int
+
+
+FkPool = Union[IdRange, np.ndarray]
+
+# Seeded Faker pools per (seed, table, field, size, as_of), reused across chunks
+_faker_pools: Dict[Tuple, np.ndarray] = {}
+
+
+# ─────────────────────────────────────────────────
+# Columns
+# ─────────────────────────────────────────────────
+def _format_ids(prefix: str, width: int, numbers: np.ndarray) -> np.ndarray:
+    digits = np.char.zfill(numbers.astype(np.int64).astype(str), width)
+    return np.char.add(f"{prefix}_", digits).astype(object)
+
+
+def _pattern_column(pattern: str, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Vectorized Faker bothify: '?' -> letter, '#' -> digit, other characters kept."""
+    column = np.full(n, "", dtype=object)
+    for char in pattern:
+        if char == "?":
+            part = _LETTERS[rng.integers(0, len(_LETTERS), n)]
+        elif char == "#":
+            part = _DIGITS[rng.integers(0, len(_DIGITS), n)]
+        else:
+            part = char
+        column = column + part
+    return column
+
+
+def _faker_values(field_name: str, config: Dict[str, Any], field_gen: FieldGenerator,
+                  size: int) -> np.ndarray:
+    config = {k: v for k, v in config.items() if k != "null_rate"}
+    return np.array([field_gen.generate(field_name, config) for _ in range(size)], dtype=object)
+
+
+def _is_faker_field(config: Dict[str, Any]) -> bool:
+    field_type = config.get("type", "string")
+    if field_type in ("id", "choice", "float", "int", "datetime", "date", "fk"):
+        return False
+    return not (field_type == "string" and config.get("faker_method") == "bothify" and config.get("text"))
+
+
+def _seeded_faker_pool(table_name: str, field_name: str, config: Dict[str, Any], size: int,
+                       seed: int, as_of: datetime) -> np.ndarray:
+    """Faker values for a field; the same in every process for a given seed."""
+    key = (seed, table_name, field_name, size, as_of)
+    if key not in _faker_pools:
+        fake = Faker()
+        fake.seed_instance(f"{seed}:{table_name}:{field_name}")
+        _faker_pools[key] = _faker_values(field_name, config, FieldGenerator(fake, as_of=as_of), size)
+    return _faker_pools[key]
+
+
+def _pool_size(pool: FkPool) -> int:
+    return pool.count if isinstance(pool, IdRange) else len(pool)
+
+
+def sample_fk(pool: FkPool, n: int, rng: np.random.Generator) -> np.ndarray:
+    """`n` values drawn uniformly from a foreign-key pool."""
+    if isinstance(pool, IdRange):
+        return _format_ids(pool.prefix, pool.width, rng.integers(1, pool.count + 1, n))
+    return pool[rng.integers(0, len(pool), n)]
+
+
+def generate_column(field_name: str, config: Dict[str, Any], n: int, rng: np.random.Generator,
+                    field_gen: FieldGenerator, fk_pools: Dict[str, FkPool],
+                    start_index: int = 1, faker_pools: Optional[Dict[str, np.ndarray]] = None) -> pa.Array:
+    """
+    One column of `n` values for a schema field, as an Arrow array.
+
+    Args:
+        start_index: Row number of the first value (id fields count from it)
+        faker_pools: Values to sample Faker-backed fields from (built from
+            field_gen when a field has none)
+    """
+    field_type = config.get("type", "string")
+
+    if field_type == "id":
+        values = _format_ids(config.get("prefix", "ID"), config.get("width", 4),
+                             np.arange(start_index, start_index + n))
+    elif field_type == "choice":
+        options = np.array(config["options"], dtype=object)
+        values = options[rng.integers(0, len(options), n)]
+    elif field_type == "float":
+        values = np.round(rng.uniform(config["min"], config["max"], n), 2)
+    elif field_type == "int":
+        values = rng.integers(config["min"], config["max"] + 1, n)
+    elif field_type in ("datetime", "date"):
+        start = field_gen._parse_relative_date(config.get("start", "-30d"))
+        end = field_gen._parse_relative_date(config.get("end", "today"))
+        if field_type == "datetime":
+            low, high = int(start.timestamp()), int(end.timestamp())
+            values = rng.integers(low, max(high, low + 1), n).astype("datetime64[s]")
+        else:
+            low = np.datetime64(start.date(), "D").astype(np.int64)
+            high = np.datetime64(end.date(), "D").astype(np.int64)
+            values = rng.integers(low, high + 1, n).astype("datetime64[D]")
+    elif field_type == "fk":
+        pool = fk_pools.get(config.get("references", ""))
+        if pool is not None and _pool_size(pool) > 0:
+            values = sample_fk(pool, n, rng)
+        else:
+            values = np.full(n, None, dtype=object)
+    elif field_type == "string" and config.get("faker_method") == "bothify" and config.get("text"):
+        values = _pattern_column(config["text"], n, rng)
+    else:
+        pool = (faker_pools or {}).get(field_name)
+        if pool is None:
+            pool = _faker_values(field_name, config, field_gen, min(n, FAKER_POOL_SIZE))
+        values = pool[rng.integers(0, len(pool), n)]
+
+    mask = None
+    null_rate = config.get("null_rate", 0.0)
+    if null_rate > 0:
+        mask = rng.random(n) < null_rate
+    return pa.array(values, type=_ARROW_TYPES.get(field_type, pa.string()), mask=mask)
+
+
+# ─────────────────────────────────────────────────
+# Chunked writers
+# ─────────────────────────────────────────────────
+class ChunkWriter:
+    """Appends Arrow tables to one Parquet or CSV file."""
+
+    def __init__(self, path: Path, fmt: str):
+        self.path = Path(path)
+        self.fmt = fmt
+        self.rows = 0
+        self._writer = None
+
+    def write(self, table: pa.Table):
+        if self._writer is None:
+            if self.fmt == "parquet":
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._writer = pa_csv.CSVWriter(self.path, table.schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def chunk_rng(seed: int, table_name: str, chunk_index: int) -> np.random.Generator:
+    """Random generator of one chunk, derived from the run seed alone."""
+    return np.random.default_rng([seed, zlib.crc32(table_name.encode("utf-8")), chunk_index])
+
+
+# ─────────────────────────────────────────────────
+# Tables
+# ─────────────────────────────────────────────────
+def _table_rows(table_name: str, table_config: Dict[str, Any]) -> int:
+    if table_name == "products":
+        return table_config.get("pool_size", 30)
+    if table_name == "users":
+        return table_config.get("pool_size", 50)
+    if table_name == "transactions":
+        return table_config.get("num_transactions", 100)
+    if table_name == "shipments":
+        return table_config.get("num_shipments", 50)
+    return 100
+
+
+def id_pools(schema: Dict[str, Dict], table_order: List[str]) -> Dict[str, FkPool]:
+    """Id ranges of every table, so any chunk can sample foreign keys without the referenced table."""
+    pools: Dict[str, FkPool] = {}
+    for table_name in table_order:
+        if table_name not in schema:
+            continue
+        for field_name, cfg in schema[table_name]["fields"].items():
+            if cfg.get("type") == "id":
+                pools[f"{table_name}.{field_name}"] = IdRange(
+                    cfg.get("prefix", "ID"), cfg.get("width", 4), _table_rows(table_name, schema[table_name]))
+    return pools
+
+
+def _inventory_keys(table_config: Dict[str, Any], fk_pools: Dict[str, FkPool]):
+    fields = table_config["fields"]
+    products = fk_pools.get(fields["product_id"].get("references", "products.product_id"))
+    stores = np.array(fields["store_id"]["options"], dtype=object)
+    if products is None:
+        return np.array([], dtype=object), stores
+    product_ids = (_format_ids(products.prefix, products.width, np.arange(1, products.count + 1))
+                   if isinstance(products, IdRange) else products)
+    return product_ids, stores
+
+
+def plan_chunks(table_name: str, table_config: Dict[str, Any], fk_pools: Dict[str, FkPool],
+                chunk_rows: int) -> List[Tuple[int, int]]:
+    """
+    (start, count) of each chunk of a table, in the table's own unit:
+    transactions (each expands to several line items), product x store
+    pairs for inventory, rows otherwise.
+    """
+    if table_name == "transactions":
+        low, high = table_config.get("products_per_transaction", [1, 5])
+        total, chunk = _table_rows(table_name, table_config), max(1, chunk_rows * 2 // (low + high))
+    elif table_name == "inventory":
+        product_ids, stores = _inventory_keys(table_config, fk_pools)
+        total, chunk = len(product_ids) * len(stores), chunk_rows
+    else:
+        total, chunk = _table_rows(table_name, table_config), chunk_rows
+    return [(start, min(chunk, total - start)) for start in range(0, total, max(chunk, 1))]
+
+
+def _plain_chunk(fields, start, n, rng, field_gen, fk_pools, faker_pools) -> pa.Table:
+    return pa.table({name: generate_column(name, cfg, n, rng, field_gen, fk_pools, start + 1, faker_pools)
+                     for name, cfg in fields.items()})
+
+
+def _transactions_chunk(table_config, start, n, rng, field_gen, fk_pools, faker_pools) -> pa.Table:
+    """Line items: 1..N products per transaction sharing its id, user, time and store."""
+    fields = table_config["fields"]
+    low, high = table_config.get("products_per_transaction", [1, 5])
+    duplicate_rate = table_config.get("duplicate_rate", 0.02)
+
+    lines = rng.integers(low, high + 1, n)
+    total = int(lines.sum())
+    txn_level = {name: generate_column(name, fields[name], n, rng, field_gen, fk_pools, start + 1, faker_pools)
+                 for name in ("transaction_id", "user_id", "timestamp", "store_id")}
+    line_level = {name: generate_column(name, fields[name], total, rng, field_gen, fk_pools, 1, faker_pools)
+                  for name in ("product_id", "amount")}
+    repeat_index = pa.array(np.repeat(np.arange(n), lines))
+    chunk = pa.table({
+        name: txn_level[name].take(repeat_index) if name in txn_level else line_level[name]
+        for name in ("transaction_id", "user_id", "product_id", "timestamp", "amount", "store_id")
+    })
+
+    # Inject exact duplicate lines, like the row generator
+    if total > 10 and duplicate_rate > 0:
+        dupes = max(1, int(total * duplicate_rate))
+        chunk = pa.concat_tables([chunk, chunk.take(pa.array(rng.integers(0, total, dupes)))])
+    return chunk
+
+
+def _inventory_chunk(table_config, start, n, rng, field_gen, fk_pools, faker_pools) -> pa.Table:
+    """One row per product x store, with stock_status derived from the stock level."""
+    fields = table_config["fields"]
+    product_ids, stores = _inventory_keys(table_config, fk_pools)
+    status_options = fields.get("stock_status", {}).get("options", [])
+    in_stock = next((o for o in status_options if o not in ("out_of_stock", "low_stock")), None)
+
+    index = np.arange(start, start + n)
+    columns = {"product_id": pa.array(product_ids[index // len(stores)], type=pa.string()),
+               "store_id": pa.array(stores[index % len(stores)], type=pa.string())}
+    for name, cfg in fields.items():
+        if name not in columns and cfg["type"] != "fk":
+            columns[name] = generate_column(name, cfg, n, rng, field_gen, fk_pools, start + 1, faker_pools)
+    if "stock_level" in columns and "stock_status" in columns:
+        stock = columns["stock_level"].to_numpy(zero_copy_only=False)
+        reorder = (columns["reorder_point"].to_numpy(zero_copy_only=False)
+                   if "reorder_point" in columns else np.full(n, 50))
+        current = columns["stock_status"].to_numpy(zero_copy_only=False)
+        status = np.where(stock == 0, "out_of_stock",
+                          np.where(stock <= reorder, "low_stock",
+                                   in_stock if in_stock is not None else current))
+        # Rows with a NULL stock level keep their sampled status
+        status = np.where(np.isnan(stock.astype(float)), current, status)
+        columns["stock_status"] = pa.array(status.astype(object), type=pa.string())
+    return pa.table(columns)
+
+
+def build_chunk(table_name: str, table_config: Dict[str, Any], chunk_index: int, start: int, n: int,
+                seed: int, as_of: datetime, fk_pools: Dict[str, FkPool]) -> pa.Table:
+    """Rows of one chunk of a table; deterministic in (seed, table, chunk_index, start, n, as_of)."""
+    rng = chunk_rng(seed, table_name, chunk_index)
+    field_gen = FieldGenerator(as_of=as_of)
+    pool_size = min(_table_rows(table_name, table_config), FAKER_POOL_SIZE)
+    faker_pools = {name: _seeded_faker_pool(table_name, name, cfg, pool_size, seed, as_of)
+                   for name, cfg in table_config["fields"].items() if _is_faker_field(cfg)}
+    if table_name == "transactions":
+        return _transactions_chunk(table_config, start, n, rng, field_gen, fk_pools, faker_pools)
+    if table_name == "inventory":
+        return _inventory_chunk(table_config, start, n, rng, field_gen, fk_pools, faker_pools)
+    return _plain_chunk(table_config["fields"], start, n, rng, field_gen, fk_pools, faker_pools)
+
+
+def _write_chunk_file(task: Tuple) -> int:
+    """Process-pool entry point: build one chunk and write it to its own file."""
+    table_name, table_config, chunk_index, start, n, seed, as_of, fk_pools, path, fmt = task
+    writer = ChunkWriter(path, fmt)
+    try:
+        writer.write(build_chunk(table_name, table_config, chunk_index, start, n, seed, as_of, fk_pools))
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def generate_all(schema: Dict[str, Dict], out_dir: Path, timestamp: str, fmt: str = "csv",
+                 seed: Optional[int] = None, chunk_rows: Optional[int] = None,
+                 as_of: Optional[datetime] = None, workers: Optional[int] = None,
+                 table_order: List[str] = ("users", "products", "transactions", "inventory", "shipments"),
+                 ) -> Dict[str, Dict[str, Any]]:
+    """
+    Generate every schema table into `out_dir`.
+
+    Args:
+        seed: Run seed (default: fresh entropy)
+        as_of: Reference time for relative dates (default: now)
+        workers: Processes generating chunks; above 1 each chunk gets its own
+            <table>_<timestamp>_<chunk>.<fmt> file
+
+    Returns:
+        {table: {"files": [paths], "rows"}}
+    """
+    seed = int(np.random.SeedSequence().entropy) if seed is None else seed
+    as_of = as_of or datetime.now()
+    chunk_rows = CHUNK_ROWS if chunk_rows is None else chunk_rows
+    workers = WORKERS if workers is None else workers
+    fk_pools = id_pools(schema, table_order)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written: Dict[str, Dict[str, Any]] = {}
+
+    if workers <= 1:
+        for table_name in table_order:
+            if table_name not in schema:
+                continue
+            chunks = plan_chunks(table_name, schema[table_name], fk_pools, chunk_rows)
+            if not chunks:
+                continue
+            writer = ChunkWriter(out_dir / f"{table_name}_{timestamp}.{fmt}", fmt)
+            try:
+                for chunk_index, (start, n) in enumerate(chunks):
+                    writer.write(build_chunk(table_name, schema[table_name], chunk_index, start, n,
+                                             seed, as_of, fk_pools))
+            finally:
+                writer.close()
+            written[table_name] = {"files": [writer.path], "rows": writer.rows}
+        return written
+
+    tasks = []
+    for table_name in table_order:
+        if table_name not in schema:
+            continue
+        for chunk_index, (start, n) in enumerate(plan_chunks(table_name, schema[table_name], fk_pools, chunk_rows)):
+            path = out_dir / f"{table_name}_{timestamp}_{chunk_index:05d}.{fmt}"
+            tasks.append((table_name, schema[table_name], chunk_index, start, n, seed, as_of, fk_pools, path, fmt))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for task, rows in zip(tasks, pool.map(_write_chunk_file, tasks)):
+            entry = written.setdefault(task[0], {"files": [], "rows": 0})
+            entry["files"].append(task[8])
+            entry["rows"] += rows
+    return written
@@ -26,13 +26,9 @@ logger = get_logger(__name__)
 SLEEP_INTERVAL_SECONDS = 60 * 5  # Run every 5 minutes (when enabled)
 
 # We split generator from the rest of the pipeline so we can control whether
-# synthetic data keeps being generated in the background.
+# synthetic data keeps being generated in the background. Both run in-process
+# (warm imports, shared DuckDB engine) rather than as one interpreter per step.
 GENERATOR_SCRIPT = "src/ingestion/generator.py"
-PIPELINE_SCRIPTS = [
-    "src/transformation/cleaner.py",
-    "src/transformation/scd_logic.py",
-    "src/transformation/star_schema.py",
-]
 
 # By default we run ONE full pipeline cycle on startup (including generator)
 # so the app has data, but we DO NOT keep generating new data in the
@@ -130,6 +126,28 @@ class Orchestrator:
                 logger.error(f"  STDOUT: {e.stdout}")
             return False
 
+    def run_generator(self):
+        """Generate a batch of synthetic raw data in-process."""
+        logger.info(f"Running generator: {GENERATOR_SCRIPT}")
+        try:
+            from src.ingestion.generator import main as generate
+            generate()
+            return True
+        except Exception as e:
+            logger.error(f"Generator failed: {e}")
+            return False
+
+    def run_pipeline(self):
+        """Run Cleaner -> SCD Type 2 -> Star Schema in-process."""
+        from src.transformation.pipeline import run_pipeline
+        result = run_pipeline(owner="orchestrator")
+        for name, step in result["steps"].items():
+            logger.debug(f"  > {name}: {step['status']} in {step['seconds']:.2f}s")
+        if result["status"] != "success":
+            logger.error(f"Pipeline failed: {result.get('error')}")
+            return False
+        return True
+
     def run(self):
         logger.info("="*50)
         logger.info("RetailNexus Real-Time Orchestrator Started")
@@ -147,15 +165,12 @@ class Orchestrator:
         success = True
         
         # Run generator once to seed data
-        if not self.run_script(GENERATOR_SCRIPT):
+        if not self.run_generator():
             success = False
         
         # Then run the transformation pipeline steps
-        if success:
-            for script in PIPELINE_SCRIPTS:
-                if not self.run_script(script):
-                    success = False
-                    break
+        if success and not self.run_pipeline():
+            success = False
         
         duration = time.time() - start_time
         if success:
@@ -193,14 +208,11 @@ class Orchestrator:
                 
                 success = True
                 # Optional: generate more synthetic data each pulse
-                if not self.run_script(GENERATOR_SCRIPT):
+                if not self.run_generator():
                     success = False
                 
-                if success:
-                    for script in PIPELINE_SCRIPTS:
-                        if not self.run_script(script):
-                            success = False
-                            break # Stop the pulse if a critical step fails
+                if success and not self.run_pipeline():
+                    success = False
                 
                 duration = time.time() - start_time
                 if success:
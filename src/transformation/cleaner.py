@@ -1,81 +1,313 @@
 """
 RetailNexus - Bronze -> Silver Cleaner
-Reads raw CSVs from data/raw/, deduplicates, handles nulls, casts types,
-and writes cleaned Parquet to data/silver/.
+Reads raw CSVs and typed Parquet (written by the stream processor) from
+data/raw/, deduplicates, handles nulls, casts types, and writes cleaned
+Parquet to data/silver/.
 Uses union_by_name=true for schema evolution resilience.
 Each cleaner is OPTIONAL — if raw files don't exist, it is skipped.
+
+Incremental mode (default, see INCREMENTAL_CLEAN):
+A manifest in data/silver/_manifest.json records every raw file (name, size,
+mtime, sha256) already folded into each Silver table. Only files not in the
+manifest are read, and their cleaned rows are merged into the existing Silver
+parquet with the same DISTINCT ON keys and ordering as a full rebuild.
+If a recorded file was modified or removed, that table falls back to a full
+rebuild so Silver never drifts from Bronze.
+
+Small processed raw files are periodically merged by compaction.py; compacted
+files keep each row's original file name, which is used for `_src`.
 """
 import os
 import sys
+import json
+import hashlib
+import functools
+import threading
 import glob as globmod
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import duckdb
 
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.transformation import run_metrics
+from src.transformation.scheduler import run_dag
+from src.utils import duckdb_utils
 from src.utils.retry_utils import retry_with_backoff
 
 _BASE = os.path.join(os.path.dirname(__file__), "..", "..")
-RAW_DIR = os.path.join(_BASE, "data", "raw")
-SILVER_DIR = os.path.join(_BASE, "data", "silver")
+# RETAILNEXUS_DATA_DIR relocates raw/silver/gold (e.g. benchmark datasets)
+_DATA = os.getenv("RETAILNEXUS_DATA_DIR") or os.path.join(_BASE, "data")
+RAW_DIR = os.path.join(_DATA, "raw")
+SILVER_DIR = os.path.join(_DATA, "silver")
+
+# Set INCREMENTAL_CLEAN=false to always rebuild Silver from every raw file.
+INCREMENTAL_CLEAN = os.getenv("INCREMENTAL_CLEAN", "true").lower() == "true"
+
+_manifest_lock = threading.Lock()
 
 
 def _ensure_dirs():
     os.makedirs(SILVER_DIR, exist_ok=True)
 
 
+# Bronze file formats, read per entity as <entity>_*.<ext>
+BRONZE_FORMATS = ("csv", "parquet")
+# Name tag of Parquet files written by the Bronze compaction job (compaction.py)
+COMPACTED_MARKER = "_compacted_"
+
+
 def _glob(pattern: str) -> str:
     """Build an absolute glob path for DuckDB's read_csv."""
     return os.path.join(RAW_DIR, pattern).replace("\\", "/")
 
 
-def _has_files(pattern: str) -> bool:
-    """Check if any files match the given glob pattern in the raw directory."""
-    return len(globmod.glob(os.path.join(RAW_DIR, pattern))) > 0
+def _bronze_files(entity: str) -> List[str]:
+    """All raw files (CSV and Parquet) for an entity, sorted by path."""
+    files = []
+    for ext in BRONZE_FORMATS:
+        files.extend(globmod.glob(os.path.join(RAW_DIR, f"{entity}_*.{ext}")))
+    return sorted(files)
+
+
+def _has_files(entity: str) -> bool:
+    """Check if any raw files exist for the given entity."""
+    return len(_bronze_files(entity)) > 0
+
+
+def _silver_path(entity: str) -> str:
+    return os.path.join(SILVER_DIR, f"{entity}.parquet").replace("\\", "/")
+
+
+def _manifest_path() -> str:
+    return os.path.join(SILVER_DIR, "_manifest.json")
+
+
+# ─────────────────────────────────────────────────
+# Processed-file manifest
+# ─────────────────────────────────────────────────
+def load_manifest() -> Dict[str, dict]:
+    """Load the processed-file manifest ({entity: {"files": {name: fingerprint}}})."""
+    path = _manifest_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[Cleaner] Manifest unreadable ({e}) - treating as empty")
+        return {}
+
+
+def _save_manifest(manifest: Dict[str, dict]):
+    """Write the manifest atomically (temp file + rename)."""
+    path = _manifest_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _record_processed(entity: str, fingerprints: Dict[str, dict]):
+    """Record the full set of raw files now reflected in a Silver table."""
+    with _manifest_lock:
+        manifest = load_manifest()
+        manifest[entity] = {
+            "files": fingerprints,
+            "updated_at": datetime.now().isoformat(),
+        }
+        _save_manifest(manifest)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprint(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": _sha256(path)}
+
+
+def _plan_files(entity: str, incremental: bool) -> Tuple[List[str], bool, Dict[str, dict]]:
+    """
+    Decide which raw files a cleaner has to read.
+
+    Returns:
+        (files_to_read, merge_with_existing_silver, fingerprints_of_all_files)
+    Files whose size and mtime match the manifest are trusted without
+    re-hashing, so the per-tick cost is one stat() per historical file.
+    """
+    all_files = _bronze_files(entity)
+    recorded = load_manifest().get(entity, {}).get("files", {}) if incremental else {}
+
+    if not recorded or not os.path.exists(_silver_path(entity)):
+        return all_files, False, {os.path.basename(p): _fingerprint(p) for p in all_files}
+
+    present = {os.path.basename(p) for p in all_files}
+    missing = [name for name in recorded if name not in present]
+    if missing:
+        print(f"[Cleaner] {entity}: {len(missing)} processed file(s) removed - full rebuild")
+        return all_files, False, {os.path.basename(p): _fingerprint(p) for p in all_files}
+
+    fingerprints = {}
+    new_files = []
+    for path in all_files:
+        name = os.path.basename(path)
+        known = recorded.get(name)
+        stat = os.stat(path)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            fingerprints[name] = known
+            continue
+        fp = _fingerprint(path)
+        if known and known["sha256"] != fp["sha256"]:
+            print(f"[Cleaner] {entity}: processed file {name} changed - full rebuild")
+            return all_files, False, {os.path.basename(p): _fingerprint(p) for p in all_files}
+        fingerprints[name] = fp
+        if not known:
+            new_files.append(path)
+
+    return new_files, True, fingerprints
+
+
+def _file_list(files: List[str]) -> str:
+    """DuckDB file-list literal for read_csv / read_parquet."""
+    return "[" + ", ".join(f"'{p.replace(chr(92), '/')}'" for p in files) + "]"
+
+
+def _is_compacted(path: str) -> bool:
+    return COMPACTED_MARKER in os.path.basename(path)
+
+
+def _bronze_source(files: List[str]) -> str:
+    """
+    Subquery reading raw files of either format with a `filename` column.
+    CSVs are sniffed with auto_detect; Parquet carries its own schema. The
+    parts are combined with UNION ALL BY NAME so union_by_name semantics hold
+    across formats.
+
+    `filename` is the base name of the originating raw file. Rows in
+    compacted files carry it in `_bronze_file`, so tie-breaks on `_src` come
+    out the same before and after compaction.
+
+    The files are counted as read by the current pipeline step (run_metrics).
+    """
+    run_metrics.record_read(files)
+    csv_files = [f for f in files if f.endswith(".csv")]
+    parquet_files = [f for f in files if f.endswith(".parquet") and not _is_compacted(f)]
+    compacted_files = [f for f in files if f.endswith(".parquet") and _is_compacted(f)]
+    parts = []
+    if csv_files:
+        parts.append(f"SELECT * REPLACE (parse_filename(filename) AS filename) "
+                     f"FROM read_csv({_file_list(csv_files)}, "
+                     f"union_by_name=true, auto_detect=true, filename=true)")
+    if parquet_files:
+        parts.append(f"SELECT * REPLACE (parse_filename(filename) AS filename) "
+                     f"FROM read_parquet({_file_list(parquet_files)}, "
+                     f"union_by_name=true, filename=true)")
+    if compacted_files:
+        parts.append(f"SELECT * EXCLUDE (_bronze_file) REPLACE (_bronze_file AS filename) "
+                     f"FROM read_parquet({_file_list(compacted_files)}, "
+                     f"union_by_name=true, filename=true)")
+    return "(" + " UNION ALL BY NAME ".join(parts) + ")"
+
+
+def _write_silver(entity: str, cleaned_sql: str, columns: List[str],
+                  keys: str, order_by: str, merge: bool) -> int:
+    """
+    Deduplicate cleaned rows (optionally unioned with the current Silver table)
+    and atomically replace the Silver parquet.
+
+    `cleaned_sql` must project `columns` plus `_src` (the source file name).
+    Rows already in Silver get `_src = ''`, so on ties rows from newly
+    arrived files win — the same `filename DESC` preference a full rebuild
+    applies to timestamped batch files.
+    """
+    _ensure_dirs()
+    out_path = _silver_path(entity)
+    tmp_path = f"{out_path}.tmp"
+    col_list = ", ".join(columns)
+
+    source = cleaned_sql
+    if merge:
+        run_metrics.record_read(out_path)
+        source = f"""
+            SELECT {col_list}, '' AS _src FROM '{out_path}'
+            UNION ALL BY NAME
+            {cleaned_sql}
+        """
+
+    duckdb_utils.sql(f"""
+        COPY (
+            SELECT DISTINCT ON ({keys}) {col_list}
+            FROM ({source}) merged
+            ORDER BY {order_by}
+        ) TO '{tmp_path}' (FORMAT PARQUET)
+    """)
+    os.replace(tmp_path, out_path)
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM '{out_path}'").fetchone()[0]
+    run_metrics.record_written(out_path, cnt)
+    return cnt
+
+
+def _resolve_incremental(incremental: Optional[bool]) -> bool:
+    return INCREMENTAL_CLEAN if incremental is None else incremental
 
 
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
-def clean_transactions():
+def clean_transactions(incremental: Optional[bool] = None):
     """Deduplicate, drop null PKs, validate positive amounts, cast types.
     Handles multiple column naming conventions via COALESCE fallbacks.
     When union_by_name=true merges CSVs with different schemas, both column
     names exist but only one will be non-NULL per row."""
-    if not _has_files("transactions_*.csv"):
-        print("[Cleaner] No transactions CSVs found - skipping")
+    if not _has_files("transactions"):
+        print("[Cleaner] No transactions raw files found - skipping")
         return False
-    glob_path = _glob("transactions_*.csv")
-    
-    # Discover all columns across all CSV files
+    files, merge, fingerprints = _plan_files("transactions", _resolve_incremental(incremental))
+    if merge and not files:
+        print("[Cleaner] transactions: no new raw files - Silver up to date")
+        return True
+    src = _bronze_source(files)
+
+    # Discover all columns across the raw files being read
     try:
-        cols = [c[0].lower() for c in duckdb.sql(
-            f"SELECT column_name FROM (DESCRIBE SELECT * FROM read_csv('{glob_path}', union_by_name=true, auto_detect=true))"
-        ).fetchall()]
+        cols = [c[0].lower() for c in duckdb_utils.sql(
+            f"SELECT column_name FROM (DESCRIBE SELECT * FROM {src})"
+        ).fetchall() if c[0].lower() != "filename"]
     except Exception as e:
-        print(f"[Cleaner] Cannot read transactions CSVs: {e}")
+        print(f"[Cleaner] Cannot read transactions raw files: {e}")
         return False
-    
+
     print(f"[Cleaner] Detected columns: {cols}")
-    
+
     # Build COALESCE expressions — cast each part to target type BEFORE coalescing
     # to avoid type mismatches (e.g., TIMESTAMP vs VARCHAR)
-    
+
     # transaction_id (all cast to VARCHAR)
     tid_parts = [f'TRY_CAST("{c}" AS VARCHAR)' for c in ['transaction_id', 'invoice', 'order_id', 'invoice_no'] if c in cols]
+    if not tid_parts and merge:
+        # Synthetic row-number IDs are only unique within a single full read
+        print("[Cleaner] transactions: new files lack an ID column - full rebuild")
+        return clean_transactions.__wrapped__(incremental=False)
     tid_expr = f"COALESCE({', '.join(tid_parts)})" if tid_parts else "CAST(ROW_NUMBER() OVER () AS VARCHAR)"
-    
+
     # product_id (all cast to VARCHAR)
     pid_parts = [f'TRY_CAST("{c}" AS VARCHAR)' for c in ['product_id', 'stockcode', 'sku', 'item_id', 'product_code'] if c in cols]
     pid_expr = f"COALESCE({', '.join(pid_parts)})" if pid_parts else "'UNKNOWN'"
-    
+
     # user_id (all cast to VARCHAR — handles numeric user IDs like 17850.0)
     uid_parts = [f'TRY_CAST("{c}" AS VARCHAR)' for c in ['user_id', 'customer_id', 'client_id', 'customerid'] if c in cols]
     uid_expr = f"COALESCE({', '.join(uid_parts)})" if uid_parts else "'U001'"
-    
+
     # timestamp (all cast to TIMESTAMP)
     ts_parts = [f'TRY_CAST("{c}" AS TIMESTAMP)' for c in ['timestamp', 'invoicedate', 'date', 'order_date', 'invoice_date'] if c in cols]
     ts_expr = f"COALESCE({', '.join(ts_parts)})" if ts_parts else "CURRENT_TIMESTAMP"
-    
+
     # amount (try amount, price*quantity, price — all cast to DOUBLE)
     amt_candidates = []
     if 'amount' in cols:
@@ -87,141 +319,167 @@ def clean_transactions():
     if 'total' in cols:
         amt_candidates.append('TRY_CAST("total" AS DOUBLE)')
     amt_expr = f"COALESCE({', '.join(amt_candidates)}, 0)" if amt_candidates else "0"
-    
+
     # store_id (all cast to VARCHAR)
     sid_parts = [f'TRY_CAST("{c}" AS VARCHAR)' for c in ['store_id', 'country', 'location', 'branch'] if c in cols]
     sid_expr = f"COALESCE({', '.join(sid_parts)})" if sid_parts else "'S001'"
 
-    
-    out_path = os.path.join(SILVER_DIR, "transactions.parquet").replace(chr(92), "/")
-    
-    # Use aliases in DISTINCT ON to avoid expression repetition
-    duckdb.sql(f"""
-        COPY (
-            SELECT DISTINCT ON (txn_id, prod_id)
-                txn_id   AS transaction_id,
-                uid      AS user_id,
-                prod_id  AS product_id,
-                ts       AS timestamp,
-                amt      AS amount,
-                sid      AS store_id
-            FROM (
-                SELECT
-                    {tid_expr} AS txn_id,
-                    {uid_expr} AS uid,
-                    {pid_expr} AS prod_id,
-                    {ts_expr}  AS ts,
-                    {amt_expr} AS amt,
-                    {sid_expr} AS sid
-                FROM read_csv('{glob_path}', union_by_name=true, auto_detect=true)
-            ) sub
-            WHERE txn_id IS NOT NULL 
-              AND prod_id IS NOT NULL
-              AND amt > 0
-            ORDER BY txn_id, prod_id, ts
-        ) TO '{out_path}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM '{out_path}'").fetchone()[0]
-    print(f"[Cleaner] Silver transactions: {cnt} rows")
+    # Use aliases to avoid expression repetition in the WHERE clause
+    cleaned_sql = f"""
+        SELECT
+            txn_id   AS transaction_id,
+            uid      AS user_id,
+            prod_id  AS product_id,
+            ts       AS timestamp,
+            amt      AS amount,
+            sid      AS store_id,
+            _src
+        FROM (
+            SELECT
+                {tid_expr} AS txn_id,
+                {uid_expr} AS uid,
+                {pid_expr} AS prod_id,
+                {ts_expr}  AS ts,
+                {amt_expr} AS amt,
+                {sid_expr} AS sid,
+                filename   AS _src
+            FROM {src}
+        ) sub
+        WHERE txn_id IS NOT NULL
+          AND prod_id IS NOT NULL
+          AND amt > 0
+    """
+    cnt = _write_silver(
+        "transactions", cleaned_sql,
+        ["transaction_id", "user_id", "product_id", "timestamp", "amount", "store_id"],
+        keys="transaction_id, product_id",
+        order_by="transaction_id, product_id, timestamp, _src DESC",
+        merge=merge,
+    )
+    _record_processed("transactions", fingerprints)
+    mode = f"merged {len(files)} new file(s)" if merge else "full rebuild"
+    print(f"[Cleaner] Silver transactions: {cnt} rows ({mode})")
     return True
 
 
 
 
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
-def clean_users():
+def clean_users(incremental: Optional[bool] = None):
     """Deduplicate on user_id, keeping the LATEST record."""
-    if not _has_files("users_*.csv"):
-        print("[Cleaner] No users CSVs found - skipping")
+    if not _has_files("users"):
+        print("[Cleaner] No users raw files found - skipping")
         return False
-    glob_path = _glob("users_*.csv")
-    duckdb.sql(f"""
-        COPY (
-            SELECT DISTINCT ON (user_id)
+    files, merge, fingerprints = _plan_files("users", _resolve_incremental(incremental))
+    if merge and not files:
+        print("[Cleaner] users: no new raw files - Silver up to date")
+        return True
+    cnt = _write_silver(
+        "users",
+        f"""
+            SELECT
                 user_id::VARCHAR                      AS user_id,
                 name::VARCHAR                         AS name,
                 email::VARCHAR                        AS email,
                 COALESCE(city, 'Unknown')::VARCHAR    AS city,
-                signup_date::DATE                     AS signup_date
-            FROM read_csv('{glob_path}', union_by_name=true, auto_detect=true, filename=true)
+                signup_date::DATE                     AS signup_date,
+                filename                              AS _src
+            FROM {_bronze_source(files)}
             WHERE user_id IS NOT NULL
-            ORDER BY user_id, filename DESC, signup_date DESC
-        ) TO '{os.path.join(SILVER_DIR, "users.parquet").replace(chr(92), "/")}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"""
-        SELECT COUNT(*) FROM '{os.path.join(SILVER_DIR, "users.parquet").replace(chr(92), "/")}'
-    """).fetchone()[0]
+        """,
+        ["user_id", "name", "email", "city", "signup_date"],
+        keys="user_id",
+        order_by="user_id, _src DESC, signup_date DESC",
+        merge=merge,
+    )
+    _record_processed("users", fingerprints)
     print(f"[Cleaner] Silver users: {cnt} rows")
     return True
 
 
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
-def clean_products():
+def clean_products(incremental: Optional[bool] = None):
     """Deduplicate on product_id, validate positive prices."""
-    if not _has_files("products_*.csv"):
-        print("[Cleaner] No products CSVs found - skipping")
+    if not _has_files("products"):
+        print("[Cleaner] No products raw files found - skipping")
         return False
-    glob_path = _glob("products_*.csv")
-    duckdb.sql(f"""
-        COPY (
-            SELECT DISTINCT ON (product_id)
+    files, merge, fingerprints = _plan_files("products", _resolve_incremental(incremental))
+    if merge and not files:
+        print("[Cleaner] products: no new raw files - Silver up to date")
+        return True
+    cnt = _write_silver(
+        "products",
+        f"""
+            SELECT
                 product_id::VARCHAR               AS product_id,
                 product_name::VARCHAR             AS product_name,
                 category::VARCHAR                 AS category,
-                COALESCE(price, 0)::DOUBLE        AS price
-            FROM read_csv('{glob_path}', union_by_name=true, auto_detect=true)
+                COALESCE(price, 0)::DOUBLE        AS price,
+                filename                          AS _src
+            FROM {_bronze_source(files)}
             WHERE product_id IS NOT NULL
               AND COALESCE(price, 0) > 0
-            ORDER BY product_id
-        ) TO '{os.path.join(SILVER_DIR, "products.parquet").replace(chr(92), "/")}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"""
-        SELECT COUNT(*) FROM '{os.path.join(SILVER_DIR, "products.parquet").replace(chr(92), "/")}'
-    """).fetchone()[0]
+        """,
+        ["product_id", "product_name", "category", "price"],
+        keys="product_id",
+        order_by="product_id, _src DESC",
+        merge=merge,
+    )
+    _record_processed("products", fingerprints)
     print(f"[Cleaner] Silver products: {cnt} rows")
     return True
 
 
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
-def clean_inventory():
+def clean_inventory(incremental: Optional[bool] = None):
     """Clean inventory data, validate stock levels."""
-    if not _has_files("inventory_*.csv"):
-        print("[Cleaner] No inventory CSVs found - skipping")
+    if not _has_files("inventory"):
+        print("[Cleaner] No inventory raw files found - skipping")
         return False
-    glob_path = _glob("inventory_*.csv")
-    duckdb.sql(f"""
-        COPY (
-            SELECT DISTINCT ON (product_id, store_id)
+    files, merge, fingerprints = _plan_files("inventory", _resolve_incremental(incremental))
+    if merge and not files:
+        print("[Cleaner] inventory: no new raw files - Silver up to date")
+        return True
+    cnt = _write_silver(
+        "inventory",
+        f"""
+            SELECT
                 product_id::VARCHAR                AS product_id,
                 store_id::VARCHAR                  AS store_id,
                 stock_level::INTEGER               AS stock_level,
                 reorder_point::INTEGER             AS reorder_point,
                 last_restock_date::DATE            AS last_restock_date,
-                stock_status::VARCHAR              AS stock_status
-            FROM read_csv('{glob_path}', union_by_name=true, auto_detect=true)
-            WHERE product_id IS NOT NULL 
+                stock_status::VARCHAR              AS stock_status,
+                filename                           AS _src
+            FROM {_bronze_source(files)}
+            WHERE product_id IS NOT NULL
               AND store_id IS NOT NULL
               AND stock_level >= 0
-            ORDER BY product_id, store_id
-        ) TO '{os.path.join(SILVER_DIR, "inventory.parquet").replace(chr(92), "/")}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"""
-        SELECT COUNT(*) FROM '{os.path.join(SILVER_DIR, "inventory.parquet").replace(chr(92), "/")}'
-    """).fetchone()[0]
+        """,
+        ["product_id", "store_id", "stock_level", "reorder_point", "last_restock_date", "stock_status"],
+        keys="product_id, store_id",
+        order_by="product_id, store_id, _src DESC",
+        merge=merge,
+    )
+    _record_processed("inventory", fingerprints)
     print(f"[Cleaner] Silver inventory: {cnt} rows")
     return True
 
 
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
-def clean_shipments():
+def clean_shipments(incremental: Optional[bool] = None):
     """Clean shipment data, validate dates and costs."""
-    if not _has_files("shipments_*.csv"):
-        print("[Cleaner] No shipments CSVs found - skipping")
+    if not _has_files("shipments"):
+        print("[Cleaner] No shipments raw files found - skipping")
         return False
-    glob_path = _glob("shipments_*.csv")
-    duckdb.sql(f"""
-        COPY (
-            SELECT DISTINCT ON (shipment_id)
+    files, merge, fingerprints = _plan_files("shipments", _resolve_incremental(incremental))
+    if merge and not files:
+        print("[Cleaner] shipments: no new raw files - Silver up to date")
+        return True
+    cnt = _write_silver(
+        "shipments",
+        f"""
+            SELECT
                 shipment_id::VARCHAR               AS shipment_id,
                 transaction_id::VARCHAR            AS transaction_id,
                 origin_store_id::VARCHAR           AS origin_store_id,
@@ -232,46 +490,71 @@ def clean_shipments():
                 carrier::VARCHAR                   AS carrier,
                 tracking_number::VARCHAR           AS tracking_number,
                 status::VARCHAR                    AS status,
-                shipping_cost::DOUBLE              AS shipping_cost
-            FROM read_csv('{glob_path}', union_by_name=true, auto_detect=true)
+                shipping_cost::DOUBLE              AS shipping_cost,
+                filename                           AS _src
+            FROM {_bronze_source(files)}
             WHERE shipment_id IS NOT NULL
               AND COALESCE(shipping_cost, 0) >= 0
-            ORDER BY shipment_id
-        ) TO '{os.path.join(SILVER_DIR, "shipments.parquet").replace(chr(92), "/")}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"""
-        SELECT COUNT(*) FROM '{os.path.join(SILVER_DIR, "shipments.parquet").replace(chr(92), "/")}'
-    """).fetchone()[0]
+        """,
+        ["shipment_id", "transaction_id", "origin_store_id", "dest_store_id", "shipped_date",
+         "delivered_date", "delivery_days", "carrier", "tracking_number", "status", "shipping_cost"],
+        keys="shipment_id",
+        order_by="shipment_id, _src DESC",
+        merge=merge,
+    )
+    _record_processed("shipments", fingerprints)
     print(f"[Cleaner] Silver shipments: {cnt} rows")
     return True
 
 
-def clean_all():
-    """Run all cleaners: Bronze -> Silver. Each is independent and optional."""
+CLEANERS = [
+    ("transactions", clean_transactions),
+    ("users", clean_users),
+    ("products", clean_products),
+    ("inventory", clean_inventory),
+    ("shipments", clean_shipments),
+]
+
+
+def cleaner_steps(incremental: Optional[bool] = None) -> list:
+    """Scheduler steps for the cleaners, named clean_<entity>; none depend on each other."""
+    return [
+        (f"clean_{name}", [], functools.partial(func, incremental=incremental))
+        for name, func in CLEANERS
+    ]
+
+
+def clean_all(incremental: Optional[bool] = None, workers: Optional[int] = None):
+    """Run all cleaners: Bronze -> Silver. Each is independent and optional,
+    so they run concurrently (see scheduler.py).
+
+    Args:
+        incremental: Only fold raw files missing from the manifest into Silver.
+                     Defaults to INCREMENTAL_CLEAN (env, on by default).
+        workers: Cleaners running at once (default: PIPELINE_WORKERS).
+    """
     _ensure_dirs()
-    results = {}
-    
-    for name, func in [
-        ("transactions", clean_transactions),
-        ("users", clean_users),
-        ("products", clean_products),
-        ("inventory", clean_inventory),
-        ("shipments", clean_shipments),
-    ]:
-        try:
-            results[name] = func()
-        except Exception as e:
-            print(f"[Cleaner] {name} failed: {e}")
-            results[name] = False
-    
+    outcomes = run_dag(cleaner_steps(incremental), workers=workers, tag="Cleaner")
+    results = {name: outcomes[f"clean_{name}"]["result"] for name, _ in CLEANERS}
+    report_cleaned(results)
+    return results
+
+
+def report_cleaned(results: Dict[str, bool]):
+    """Log which Silver tables a run produced."""
     cleaned = [k for k, v in results.items() if v]
     if cleaned:
         print(f"[Cleaner] Bronze -> Silver complete. Cleaned: {', '.join(cleaned)}")
     else:
         print("[Cleaner] No raw data files found to clean.")
-    
-    return results
 
 
 if __name__ == "__main__":
-    clean_all()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RetailNexus Bronze -> Silver Cleaner")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Ignore the processed-file manifest and rebuild Silver from all raw files")
+    args = parser.parse_args()
+
+    clean_all(incremental=False if args.full_refresh else None)
@@ -0,0 +1,168 @@
+"""
+RetailNexus — Bronze Compaction
+================================
+Merges the many small raw files left by stream ticks and uploads into larger
+Parquet files per entity, so the cleaner opens a handful of files instead of
+thousands.
+
+Only files already recorded in the Silver manifest (and unchanged since) are
+compacted, so Silver does not need to be rebuilt. Each output is written as
+data/raw/<entity>_compacted_<stamp>.parquet; every row keeps the base name of
+its original file in `_bronze_file`, which the cleaner reads back as
+`filename` so `_src` tie-breaks are unchanged. The manifest is updated to
+swap the originals for the compacted file before the originals are retired
+(deleted, or moved to data/raw/_archive/ with BRONZE_COMPACT_RETENTION=archive).
+"""
+import os
+import sys
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.transformation import cleaner, run_metrics
+from src.utils import duckdb_utils
+
+ENTITIES = ["transactions", "users", "products", "inventory", "shipments"]
+
+# Only files smaller than this are compaction candidates
+SMALL_FILE_BYTES = int(float(os.getenv("BRONZE_COMPACT_SMALL_FILE_MB", "16")) * 1024 * 1024)
+# Compact an entity once it has at least this many small files
+MIN_FILES = int(os.getenv("BRONZE_COMPACT_MIN_FILES", "20"))
+# Upper bound on input bytes merged into one compacted file
+TARGET_BYTES = int(float(os.getenv("BRONZE_COMPACT_TARGET_MB", "128")) * 1024 * 1024)
+RETENTION = os.getenv("BRONZE_COMPACT_RETENTION", "delete").lower()  # delete | archive
+
+ARCHIVE_DIR = os.path.join(cleaner.RAW_DIR, "_archive")
+
+
+def _candidates(entity: str) -> List[str]:
+    """Small raw files already folded into Silver and unchanged since."""
+    recorded = cleaner.load_manifest().get(entity, {}).get("files", {})
+    if not recorded or not os.path.exists(cleaner._silver_path(entity)):
+        return []
+    files = []
+    for path in cleaner._bronze_files(entity):
+        known = recorded.get(os.path.basename(path))
+        stat = os.stat(path)
+        if (known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime
+                and stat.st_size < SMALL_FILE_BYTES):
+            files.append(path)
+    return files
+
+
+def _groups(files: List[str]) -> List[List[str]]:
+    """Split candidates into runs of at most TARGET_BYTES input."""
+    groups, current, size = [], [], 0
+    for path in files:
+        file_size = os.path.getsize(path)
+        if current and size + file_size > TARGET_BYTES:
+            groups.append(current)
+            current, size = [], 0
+        current.append(path)
+        size += file_size
+    if current:
+        groups.append(current)
+    return [g for g in groups if len(g) > 1]
+
+
+def _retire(path: str):
+    try:
+        if RETENTION == "archive":
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            shutil.move(path, os.path.join(ARCHIVE_DIR, os.path.basename(path)))
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _compact_group(entity: str, files: List[str], seq: int) -> Optional[str]:
+    """Write one compacted file for `files`; returns its path."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = f"{entity}{cleaner.COMPACTED_MARKER}{stamp}_{seq:03d}.parquet"
+    out_path = os.path.join(cleaner.RAW_DIR, name).replace("\\", "/")
+    tmp_path = f"{out_path}.tmp"
+
+    source = cleaner._bronze_source(files)
+    expected = duckdb_utils.sql(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+    duckdb_utils.sql(f"""
+        COPY (
+            SELECT * EXCLUDE (filename), filename AS _bronze_file
+            FROM {source}
+            ORDER BY _bronze_file
+        ) TO '{tmp_path}' (FORMAT PARQUET)
+    """)
+    written = duckdb_utils.sql(f"SELECT COUNT(*) FROM read_parquet('{tmp_path}')").fetchone()[0]
+
+    if written != expected:
+        os.remove(tmp_path)
+        print(f"[Compaction] {entity}: row count mismatch ({written} != {expected}) - skipped")
+        return None
+    os.replace(tmp_path, out_path)
+    run_metrics.record_written(out_path, written)
+    return out_path
+
+
+def compact_entity(entity: str, min_files: Optional[int] = None) -> int:
+    """
+    Compact the small processed raw files of one entity.
+
+    Returns:
+        Number of raw files retired.
+    """
+    min_files = MIN_FILES if min_files is None else min_files
+    files = _candidates(entity)
+    if len(files) < max(min_files, 2):
+        return 0
+
+    retired = 0
+    for seq, group in enumerate(_groups(files)):
+        in_bytes = sum(os.path.getsize(p) for p in group)
+        out_path = _compact_group(entity, group, seq)
+        if out_path is None:
+            continue
+
+        # Swap the originals for the compacted file in one manifest write, so the
+        # cleaner never sees "processed file removed" and never re-reads the rows
+        with cleaner._manifest_lock:
+            manifest = cleaner.load_manifest()
+            entry = manifest.get(entity, {"files": {}})
+            for path in group:
+                entry["files"].pop(os.path.basename(path), None)
+            entry["files"][os.path.basename(out_path)] = cleaner._fingerprint(out_path)
+            entry["updated_at"] = datetime.now().isoformat()
+            manifest[entity] = entry
+            cleaner._save_manifest(manifest)
+
+        for path in group:
+            _retire(path)
+        retired += len(group)
+        print(f"[Compaction] {entity}: {len(group)} files ({in_bytes / 1024:.0f} KB) "
+              f"-> {os.path.basename(out_path)} ({os.path.getsize(out_path) / 1024:.0f} KB)")
+    return retired
+
+
+def compact_bronze(min_files: Optional[int] = None) -> Dict[str, int]:
+    """Compact every entity. Each is independent — failures are logged and skipped."""
+    results = {}
+    for entity in ENTITIES:
+        try:
+            results[entity] = compact_entity(entity, min_files=min_files)
+        except Exception as e:
+            print(f"[Compaction] {entity} failed: {e}")
+            results[entity] = 0
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RetailNexus Bronze compaction")
+    parser.add_argument("--min-files", type=int, default=None,
+                        help=f"Compact entities with at least this many small files (default {MIN_FILES})")
+    args = parser.parse_args()
+
+    results = compact_bronze(min_files=args.min_files)
+    print(f"[Compaction] Retired {sum(results.values())} raw file(s)")
@@ -0,0 +1,192 @@
+"""
+RetailNexus — Pipeline Run Coordinator
+=======================================
+Single point through which every pipeline trigger (API uploads and manual
+runs, the stream processor, the orchestrator) requests a Bronze -> Silver ->
+Gold run, across processes.
+
+A trigger is appended to the pending requests in
+data/_pipeline_coordinator.json. Whoever holds the pipeline lease
+(data/_pipeline.lease) drains them: it waits until no new trigger has arrived
+for PIPELINE_DEBOUNCE_SECONDS, takes *all* pending requests and serves them
+with one run, and repeats while requests keep arriving. So there is at most
+one run in flight plus one pending, however many triggers fire. The raw
+files of all merged triggers are already in Bronze, so one run covers them.
+
+A caller whose request is served by another process's run gets that run's
+summary back (with "coalesced": true).
+"""
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.utils.file_lease import FileLease
+
+_DATA_DIR = Path(os.getenv("RETAILNEXUS_DATA_DIR") or Path(__file__).resolve().parents[2] / "data")
+PIPELINE_LEASE_FILE = _DATA_DIR / "_pipeline.lease"
+STATE_FILE = _DATA_DIR / "_pipeline_coordinator.json"
+_STATE_LOCK_FILE = _DATA_DIR / "_pipeline_coordinator.lock"
+
+# A holder that stops renewing (crash) loses the lease after this many seconds
+PIPELINE_LEASE_TTL = float(os.getenv("PIPELINE_LEASE_TTL_SECONDS", "300"))
+# How long a caller waits for its request to be served before giving up
+PIPELINE_LEASE_WAIT = float(os.getenv("PIPELINE_LEASE_WAIT_SECONDS", "600"))
+# Quiet period after the latest trigger before a run starts (bursts merge)
+DEBOUNCE_SECONDS = float(os.getenv("PIPELINE_DEBOUNCE_SECONDS", "1"))
+# Never hold a run back longer than this, even if triggers keep arriving
+DEBOUNCE_MAX_SECONDS = float(os.getenv("PIPELINE_DEBOUNCE_MAX_SECONDS", "10"))
+
+_POLL_SECONDS = 0.2
+_MAX_TRIGGERS_KEPT = 50
+
+
+def pipeline_lease(owner: str) -> FileLease:
+    """The single-writer lease held while a pipeline run executes."""
+    return FileLease(PIPELINE_LEASE_FILE, owner=owner, ttl=PIPELINE_LEASE_TTL)
+
+
+# ─────────────────────────────────────────────────
+# Shared state (pending requests + last run)
+# ─────────────────────────────────────────────────
+def _read_state() -> Dict:
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"next_request": 1, "pending": [], "served_through": 0, "last_run": None}
+
+
+def _update_state(mutate: Callable[[Dict], object]):
+    """Read-modify-write the state file under a short cross-process mutex."""
+    mutex = FileLease(_STATE_LOCK_FILE, owner="coordinator", ttl=30, poll_interval=0.01)
+    with mutex.hold(timeout=30):
+        state = _read_state()
+        value = mutate(state)
+        tmp_path = STATE_FILE.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, STATE_FILE)
+    return value
+
+
+def _enqueue(trigger: str) -> int:
+    def mutate(state):
+        seq = state["next_request"]
+        state["next_request"] = seq + 1
+        state["pending"].append({"seq": seq, "trigger": trigger, "at": time.time()})
+        return seq
+    return _update_state(mutate)
+
+
+def _take_pending() -> List[Dict]:
+    def mutate(state):
+        batch, state["pending"] = state["pending"], []
+        return batch
+    return _update_state(mutate)
+
+
+def _record_run(batch: List[Dict], owner: str, result: Dict) -> Dict:
+    summary = {k: v for k, v in result.items() if k != "output"}
+    triggers = [r["trigger"] for r in batch]
+    summary.update(
+        owner=owner,
+        triggers=triggers[:_MAX_TRIGGERS_KEPT],
+        requests=len(batch),
+        finished_at=datetime.now().isoformat(),
+    )
+
+    def mutate(state):
+        state["served_through"] = max(state["served_through"], max(r["seq"] for r in batch))
+        state["last_run"] = summary
+    _update_state(mutate)
+    return summary
+
+
+def _debounce():
+    """Wait until no trigger arrived for DEBOUNCE_SECONDS (bounded by DEBOUNCE_MAX_SECONDS)."""
+    started = time.monotonic()
+    while time.monotonic() - started < DEBOUNCE_MAX_SECONDS:
+        pending = _read_state()["pending"]
+        if not pending:
+            return
+        quiet = time.time() - max(r["at"] for r in pending)
+        if quiet >= DEBOUNCE_SECONDS:
+            return
+        time.sleep(min(DEBOUNCE_SECONDS - quiet, _POLL_SECONDS) + 0.01)
+
+
+def _drain(lease: FileLease, runner: Callable[[List[str]], Dict]) -> Dict[int, Dict]:
+    """While holding the lease: serve pending requests until none are left."""
+    served = {}
+    while True:
+        _debounce()
+        batch = _take_pending()
+        if not batch:
+            return served
+        triggers = [r["trigger"] for r in batch]
+        print(f"[Coordinator] Run for {len(batch)} request(s): {', '.join(sorted(set(triggers)))}")
+        try:
+            result = runner(triggers)
+        except Exception as e:
+            result = {"status": "error", "message": f"Pipeline error: {e}", "error": str(e)}
+        summary = _record_run(batch, lease.owner, result)
+        for request in batch:
+            served[request["seq"]] = {**result, **summary}
+
+
+def request_run(trigger: str, runner: Callable[[List[str]], Dict], owner: str,
+                timeout: Optional[float] = None) -> Dict:
+    """
+    Request a pipeline run and wait until a run has served the request.
+
+    Args:
+        trigger: What asked for the run (e.g. "upload:sales.csv", "stream_processor")
+        runner: Executes one run given the merged triggers; only called if
+                this caller ends up holding the lease
+        owner: Name recorded in the lease while this caller runs the pipeline
+        timeout: Max seconds to wait (default PIPELINE_LEASE_WAIT)
+
+    Returns:
+        The result of the run that served the request.
+    """
+    timeout = PIPELINE_LEASE_WAIT if timeout is None else timeout
+    seq = _enqueue(trigger)
+    deadline = time.monotonic() + timeout
+    lease = pipeline_lease(owner)
+
+    while True:
+        if lease.try_acquire():
+            try:
+                served = _drain(lease, runner)
+            finally:
+                lease.release()
+            if seq in served:
+                return served[seq]
+
+        state = _read_state()
+        if state["served_through"] >= seq:
+            # Served by another runner; report that run
+            return {**(state["last_run"] or {"status": "success", "message": "Pipeline completed"}),
+                    "coalesced": True}
+        if time.monotonic() >= deadline:
+            holder = lease.holder() or {}
+            message = (f"request {seq} still pending; {PIPELINE_LEASE_FILE.name} "
+                       f"held by {holder.get('owner', 'unknown')} (pid {holder.get('pid', '?')})")
+            print(f"[Coordinator] Not served in {timeout:.0f}s: {message}")
+            return {"status": "error", "message": "Pipeline busy", "error": message, "steps": {}}
+        time.sleep(_POLL_SECONDS)
+
+
+def coordinator_status() -> Dict:
+    """Pending requests, the last run and the current lease holder."""
+    state = _read_state()
+    return {
+        "pending_requests": len(state["pending"]),
+        "pending_triggers": [r["trigger"] for r in state["pending"]][:_MAX_TRIGGERS_KEPT],
+        "served_through": state["served_through"],
+        "last_run": state["last_run"],
+        "lease_holder": pipeline_lease("status").holder(),
+    }
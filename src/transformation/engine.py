@@ -0,0 +1,229 @@
+"""
+RetailNexus — In-Process Pipeline Engine
+=========================================
+Runs the transformation pipeline (pipeline.run_pipeline) on a long-lived
+single worker thread instead of spawning a Python interpreter per run.
+Imports stay warm and every run reuses the shared DuckDB database from
+src/utils/duckdb_utils.py.
+
+Every run is a job with an ID, a status and per-stage progress (see
+/api/jobs/{id}). Runs are serialized: while one job runs, at most one more is
+queued, and further requests coalesce into that queued job — so a burst of
+uploads is folded into a single pipeline run. Output printed by the worker is
+captured into the result's "output" field, so callers get the same
+status/result dict the subprocess runner returned. A caller that stops
+waiting after PIPELINE_TIMEOUT gets the job's current status ("queued" or
+"running") and its /api/jobs/{id} URL instead.
+"""
+import asyncio
+import contextvars
+import io
+import os
+import sys
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+PIPELINE_TIMEOUT = float(os.getenv("PIPELINE_TIMEOUT_SECONDS", "120"))
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-worker")
+_install_lock = threading.Lock()
+# The tee wrapping sys.stdout and the number of runs capturing through it
+_tee = {"stream": None, "active": 0}
+
+
+# Capture buffer of the current run; pipeline step threads inherit it (scheduler.py)
+_capture: contextvars.ContextVar = contextvars.ContextVar("pipeline_output", default=None)
+
+
+class _OutputTee(io.TextIOBase):
+    """stdout wrapper that also copies writes made inside a capturing run into its buffer."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buffer = _capture.get()
+        if buffer is not None:
+            buffer.write(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    @property
+    def encoding(self):
+        return getattr(self._stream, "encoding", "utf-8")
+
+
+@contextmanager
+def _stdout_tee():
+    """Wrap sys.stdout in an _OutputTee only while at least one run is capturing."""
+    with _install_lock:
+        if _tee["active"] == 0:
+            _tee["stream"] = _OutputTee(sys.stdout)
+            sys.stdout = _tee["stream"]
+        _tee["active"] += 1
+    try:
+        yield
+    finally:
+        with _install_lock:
+            _tee["active"] -= 1
+            if _tee["active"] == 0:
+                # Leave sys.stdout alone if someone replaced it after us
+                if sys.stdout is _tee["stream"]:
+                    sys.stdout = _tee["stream"]._stream
+                _tee["stream"] = None
+
+
+def _run_captured(progress=None, trigger: str = "api") -> dict:
+    from src.transformation.pipeline import run_pipeline
+
+    buffer = io.StringIO()
+    token = _capture.set(buffer)
+    try:
+        with _stdout_tee():
+            result = run_pipeline(progress=progress, owner="api", trigger=trigger)
+    except Exception as e:
+        traceback.print_exc(file=buffer)
+        result = {"status": "error", "message": f"Pipeline error: {e}", "error": str(e)}
+    finally:
+        _capture.reset(token)
+    result["output"] = buffer.getvalue()
+    return result
+
+
+# ─────────────────────────────────────────────────
+# Job queue
+# ─────────────────────────────────────────────────
+MAX_JOBS_KEPT = 100
+
+_jobs_lock = threading.Lock()
+_jobs: "OrderedDict[str, dict]" = OrderedDict()
+_queued = {"job": None}
+
+
+def _snapshot(job: dict) -> dict:
+    snapshot = {k: v for k, v in job.items() if k != "future"}
+    snapshot["triggers"] = list(job["triggers"])
+    snapshot["stages"] = {name: dict(state) for name, state in job["stages"].items()}
+    return snapshot
+
+
+def _run_job(job: dict) -> dict:
+    with _jobs_lock:
+        if _queued["job"] is job:
+            _queued["job"] = None  # later requests need a new run
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+
+    def progress(stage: str, state: dict):
+        with _jobs_lock:
+            job["stages"][stage] = state
+
+    result = _run_captured(progress, trigger=", ".join(job["triggers"]))
+    with _jobs_lock:
+        job["status"] = result["status"]
+        job["result"] = result
+        job["finished_at"] = datetime.now().isoformat()
+    return result
+
+
+def submit_job(trigger: str = "manual") -> dict:
+    """
+    Request a pipeline run. Returns a snapshot of the job that will serve it:
+    the already-queued job if there is one (the trigger is added to it),
+    otherwise a new job queued behind any running one.
+    """
+    with _jobs_lock:
+        job = _queued["job"]
+        if job is not None:
+            job["triggers"].append(trigger)
+            return _snapshot(job)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "triggers": [trigger],
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "stages": {},
+            "result": None,
+        }
+        _jobs[job["id"]] = job
+        while len(_jobs) > MAX_JOBS_KEPT:
+            oldest = next(iter(_jobs.values()))
+            if oldest["status"] in ("queued", "running"):
+                break
+            _jobs.popitem(last=False)
+        _queued["job"] = job
+        job["future"] = _executor.submit(_run_job, job)
+        return _snapshot(job)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Snapshot of a job, or None if unknown (or aged out)."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _snapshot(job) if job else None
+
+
+def list_jobs(limit: int = 20) -> List[dict]:
+    """Most recent jobs first."""
+    with _jobs_lock:
+        return [_snapshot(job) for job in reversed(list(_jobs.values()))][:limit]
+
+
+def _job_future(job_id: str) -> Future:
+    with _jobs_lock:
+        return _jobs[job_id]["future"]
+
+
+def _timeout_result(timeout: float, job_id: str) -> dict:
+    """
+    The job's current state once a caller stops waiting for it. A thread can't
+    be killed: the run finishes in the background and /api/jobs/{id} reports it.
+    """
+    job = get_job(job_id)
+    if job is not None and job["result"] is not None:
+        return job["result"]  # finished just after the wait gave up
+    print(f"[Engine] Pipeline still running after {timeout:.0f}s - not waiting for it")
+    return {
+        "status": job["status"] if job else "running",
+        "message": f"Pipeline still running after {timeout:.0f}s - poll /api/jobs/{job_id}",
+        "job_id": job_id,
+        "job_url": f"/api/jobs/{job_id}",
+        "stages": job["stages"] if job else {},
+    }
+
+
+def run_pipeline_sync(timeout: Optional[float] = None, trigger: str = "manual") -> dict:
+    """Request a run and wait for the result of the job serving it."""
+    timeout = PIPELINE_TIMEOUT if timeout is None else timeout
+    job_id = submit_job(trigger)["id"]
+    try:
+        return _job_future(job_id).result(timeout=timeout)
+    except FutureTimeout:
+        return _timeout_result(timeout, job_id)
+
+
+async def run_pipeline_async(timeout: Optional[float] = None, trigger: str = "manual") -> dict:
+    """Awaitable variant of run_pipeline_sync for async API handlers."""
+    timeout = PIPELINE_TIMEOUT if timeout is None else timeout
+    job_id = submit_job(trigger)["id"]
+    future = asyncio.wrap_future(_job_future(job_id))
+    try:
+        # shield: the job may be shared with other callers, never cancel it
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        return _timeout_result(timeout, job_id)
@@ -0,0 +1,82 @@
+"""
+RetailNexus - Surrogate Key Registry
+Keeps a persistent natural key -> surrogate key map per Gold dimension so a
+rebuild never renumbers existing members:
+
+    data/gold/_registry/<dim>.parquet    (<natural key>, <surrogate key>)
+
+Members seen for the first time get max(key) + 1, 2, ... in natural key
+order; keys are never reused, even after a member leaves Silver. Fact rows
+written by earlier builds therefore stay valid and can be appended to
+without re-keying. A dimension without a registry is seeded from its current
+Gold file, so the keys existing facts were built with carry over.
+All joins via duckdb_utils.sql().
+"""
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.transformation import write_policy
+from src.utils import duckdb_utils
+
+_BASE = os.path.join(os.path.dirname(__file__), "..", "..")
+_DATA = os.getenv("RETAILNEXUS_DATA_DIR") or os.path.join(_BASE, "data")
+GOLD_DIR = os.path.join(_DATA, "gold")
+
+# Underscore dir: discover_tables() does not expose registries as tables
+REGISTRY_DIR = "_registry"
+
+
+def registry_path(dim: str, gold_dir: Optional[str] = None) -> str:
+    return os.path.join(gold_dir or GOLD_DIR, REGISTRY_DIR, f"{dim}.parquet").replace("\\", "/")
+
+
+def register_keys(dim: str, natural_key: str, surrogate_key: str, members_sql: str,
+                  gold_dir: Optional[str] = None) -> int:
+    """
+    Add the natural keys in `members_sql` that have no surrogate key yet to
+    the registry of `dim`. Returns the number of keys assigned.
+
+    Args:
+        dim: Gold dimension name, e.g. "dim_products".
+        natural_key: Business key column of `members_sql`.
+        surrogate_key: Surrogate key column name in the dimension.
+        members_sql: Query or read expression with a `natural_key` column.
+    """
+    path = registry_path(dim, gold_dir)
+    dim_file = os.path.join(gold_dir or GOLD_DIR, f"{dim}.parquet").replace("\\", "/")
+    if os.path.isfile(path):
+        existing = f"'{path}'"
+    elif os.path.isfile(dim_file):
+        existing = f"(SELECT DISTINCT {natural_key}, {surrogate_key} FROM '{dim_file}')"
+    else:
+        existing = f"(SELECT NULL::VARCHAR AS {natural_key}, NULL::INTEGER AS {surrogate_key} WHERE FALSE)"
+
+    new_members = f"""
+        SELECT DISTINCT m.{natural_key}
+        FROM {members_sql} m
+        ANTI JOIN {existing} r ON m.{natural_key} = r.{natural_key}
+        WHERE m.{natural_key} IS NOT NULL
+    """
+    added = duckdb_utils.sql(f"SELECT COUNT(*) FROM ({new_members})").fetchone()[0]
+    if added == 0 and os.path.isfile(path):
+        return 0
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    duckdb_utils.sql(write_policy.copy_statement(f"registry_{dim}", f"""
+        SELECT {natural_key}, {surrogate_key}::INTEGER AS {surrogate_key} FROM {existing}
+        UNION ALL
+        SELECT
+            {natural_key},
+            ((SELECT COALESCE(MAX({surrogate_key}), 0) FROM {existing})
+             + ROW_NUMBER() OVER (ORDER BY {natural_key}))::INTEGER AS {surrogate_key}
+        FROM ({new_members})
+        ORDER BY {surrogate_key}
+    """, f"{path}.tmp"))
+    os.replace(f"{path}.tmp", path)
+    if added:
+        print(f"[KeyRegistry] {dim}: {added} new key(s)")
+    return added
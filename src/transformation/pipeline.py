@@ -1,59 +1,162 @@
 """
 RetailNexus - Transformation Pipeline Orchestrator
-Runs the full Bronze -> Silver -> Gold pipeline in order:
-  1. Cleaner   (Bronze -> Silver)
+Runs the full Bronze -> Silver -> Gold pipeline as one dependency graph:
+  1. Cleaners   (Bronze -> Silver, one per entity)
   2. SCD Type 2 (Silver -> Gold dim_users)
-  3. Star Schema (Silver -> Gold dims + fact)
+  3. Star Schema (Silver -> Gold dims + facts + rollups)
+  4. Compaction (merge small processed Bronze files)
 
-Each step is independent — missing data is skipped gracefully.
+Independent steps run concurrently (see scheduler.py); e.g. dim_products
+starts as soon as Silver products exists, while fact_transactions waits for
+the dimensions it looks keys up in. Each step is independent — missing data
+is skipped gracefully and a failure does not block other steps.
+
+Every caller (API jobs, stream processor, orchestrator) goes through the run
+coordinator (coordinator.py): triggers are debounced and merged, and the run
+executes under the single-writer lease in data/_pipeline.lease, so two runs
+never read and write the same Silver/Gold files at once.
+
+Each run records per-stage wall time, rows, bytes and DuckDB memory in the
+run history (run_metrics.py).
 """
 import sys
 import os
+import time
+from typing import Callable, Dict, List, Optional
 
 # ensure project root is on path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
-from src.transformation.cleaner import clean_all
+from src.transformation.cleaner import CLEANERS, cleaner_steps, report_cleaned
 from src.transformation.scd_logic import apply_scd_type_2
-from src.transformation.star_schema import build_star_schema
-
-
-def run_pipeline():
-    """Execute the full transformation pipeline.
-    Each step runs independently — failures in one step do not block others."""
-    print("=" * 60)
-    print("  RetailNexus Transformation Pipeline")
-    print("=" * 60)
+from src.transformation.star_schema import _ensure_gold, gold_steps, publish_gold
+from src.transformation.compaction import compact_bronze
+from src.transformation.scheduler import run_dag
+from src.transformation.coordinator import request_run
+from src.transformation import run_metrics
 
-    # Step 1: Bronze -> Silver
-    print("\n> Step 1/3: Cleaning raw data (Bronze -> Silver)")
-    try:
-        clean_results = clean_all()
-        any_cleaned = any(v for v in clean_results.values()) if isinstance(clean_results, dict) else False
-    except Exception as e:
-        print(f"[Pipeline] Cleaner error: {e}")
-        any_cleaned = False
 
-    # Step 2: SCD Type 2 on Users (only if users were cleaned)
-    print("\n> Step 2/3: Applying SCD Type 2 (dim_users)")
+def _apply_scd():
     try:
         apply_scd_type_2()
+        return True
     except FileNotFoundError:
         print("[Pipeline] Silver users not found - skipping SCD (no user data uploaded)")
-    except Exception as e:
-        print(f"[Pipeline] SCD error: {e}")
+        return False
+
+
+def pipeline_steps() -> list:
+    """Every pipeline step as (name, depends_on, func)."""
+    cleaners = cleaner_steps()
+    return (
+        cleaners
+        + [("dim_users", ["clean_users"], _apply_scd)]
+        + gold_steps()
+        # Compaction rewrites raw files and the manifest, so it waits for every cleaner
+        + [("compaction", [name for name, _, _ in cleaners], compact_bronze)]
+    )
+
+
+def run_pipeline(workers: Optional[int] = None,
+                 progress: Optional[Callable[[str, Dict], None]] = None,
+                 owner: str = "pipeline",
+                 trigger: Optional[str] = None) -> dict:
+    """Request a pipeline run through the coordinator and return the result of
+    the run that served it (possibly another process's, merged with ours).
+    Each step runs independently — failures in one step do not block others.
+
+    Args:
+        workers: Steps running at once (default: PIPELINE_WORKERS).
+        progress: Called with (step, state) as steps are queued, start and finish
+                  (only when this caller executes the run).
+        owner: Name recorded in the lease while this caller runs the pipeline.
+        trigger: What asked for the run (default: owner).
+
+    Returns:
+        {"status", "message", "run_id", "duration_seconds",
+         "steps": {name: {"status", "seconds", "rows_in", "rows_out", "bytes_read",
+                          "bytes_written", "peak_memory_bytes"[, "error"]}},
+         "triggers"[, "error", "coalesced"]}
+    """
+    def runner(triggers: List[str]) -> dict:
+        return execute_pipeline(workers, progress, triggers)
+
+    return request_run(trigger or owner, runner, owner=owner)
+
+
+def execute_pipeline(workers: Optional[int] = None,
+                     progress: Optional[Callable[[str, Dict], None]] = None,
+                     triggers: Optional[List[str]] = None) -> dict:
+    """Run every pipeline step now and append the run to the run history.
+    Callers must hold the pipeline lease — use run_pipeline() unless you are
+    the coordinator."""
+    started = time.perf_counter()
+    with run_metrics.RunMetrics() as metrics:
+        outcomes = _run_steps(workers, progress, metrics)
+
+    steps = {name: {**{k: v for k, v in outcome.items() if k != "result"},
+                    **metrics.stages.get(name, {})}
+             for name, outcome in outcomes.items()}
+    failed = [name for name, step in steps.items() if step["status"] == "error"]
+    result = {
+        "status": "error" if failed else "success",
+        "message": f"Pipeline failed: {', '.join(failed)}" if failed else "Pipeline completed",
+        "run_id": metrics.run_id,
+        "steps": steps,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "triggers": list(triggers or []),
+    }
+    if failed:
+        result["error"] = "; ".join(f"{name}: {steps[name]['error']}" for name in failed)
 
-    # Step 3: Build Star Schema (works with whatever Silver data is available)
-    print("\n> Step 3/3: Building Star Schema (Silver -> Gold)")
     try:
-        build_star_schema()
-    except Exception as e:
-        print(f"[Pipeline] Star Schema error: {e}")
+        run_metrics.append_run_history(run_metrics.build_run_record(metrics, result))
+    except OSError as e:
+        print(f"[Pipeline] Could not record run history: {e}")
 
     print("\n" + "=" * 60)
-    print("  Pipeline complete OK")
+    print(f"  Pipeline complete {'OK' if not failed else 'with errors'} "
+          f"({result['duration_seconds']:.2f}s)")
+    print("=" * 60)
+    for name, step in sorted(steps.items(), key=lambda item: -item[1].get("seconds", 0)):
+        print(f"  {name:<20} {step.get('seconds', 0):>8.2f}s  "
+              f"{step.get('rows_in', 0):>10} -> {step.get('rows_out', 0):<10} rows  "
+              f"peak {step.get('peak_memory_bytes', 0) / 1e6:.1f} MB")
+    return result
+
+
+def _run_steps(workers: Optional[int], progress: Optional[Callable[[str, Dict], None]],
+               metrics: run_metrics.RunMetrics) -> Dict[str, Dict]:
     print("=" * 60)
+    print("  RetailNexus Transformation Pipeline")
+    print("=" * 60)
+
+    _ensure_gold()
+    outcomes = run_dag(metrics.instrument(pipeline_steps()), workers=workers,
+                       tag="Pipeline", on_update=progress)
+
+    report_cleaned({name: outcomes[f"clean_{name}"]["result"] for name, _ in CLEANERS})
+    gold_names = [name for name, _, _ in gold_steps()]
+    started = time.perf_counter()
+    try:
+        with metrics.stage("publish"):
+            publish_gold({name: outcomes[name]["result"] for name in gold_names})
+        outcomes["publish"] = {"status": "success"}
+    except Exception as e:
+        print(f"[Pipeline] Gold publish error: {e}")
+        outcomes["publish"] = {"status": "error", "error": str(e)}
+    outcomes["publish"]["seconds"] = round(time.perf_counter() - started, 3)
+    if progress:
+        progress("publish", outcomes["publish"])
+    return outcomes
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RetailNexus Transformation Pipeline")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Pipeline steps to run concurrently (default: PIPELINE_WORKERS)")
+    args = parser.parse_args()
+
+    sys.exit(0 if run_pipeline(workers=args.workers)["status"] == "success" else 1)
@@ -1,166 +1,278 @@
 """
-RetailNexus - SCD Type 2 for User Dimension
-Tracks changes to user attributes (city) over time.
-Compares Silver users against existing Gold dim_users and manages
+RetailNexus - SCD Type 2 Dimensions
+Tracks changes to dimension attributes over time (dim_users today).
+Compares Silver rows against the existing Gold dimension and manages
 effective_date / end_date / is_current flags.
-All joins via duckdb.sql().
+All joins via duckdb_utils.sql().
+
+Each dimension is configured in config/scd_config.json:
+    source                 Silver table (silver/<source>.parquet)
+    natural_key            business key, e.g. user_id
+    surrogate_key          Gold key column
+    columns                attribute columns copied into the dimension
+    tracked_columns        columns whose change opens a new version; other
+                           columns keep the value the version started with
+    effective_date_column  Silver column used as the first version's
+                           effective_date (optional, default: load date)
+
+Change detection is a hash diff: every row stores row_hash, an md5 of the
+tracked columns computed in one pass (NULL-safe: to_json keeps NULL distinct
+from every value), and each run compares Silver's hashes with the current
+rows only. A run writes just the changed versions - superseded rows closed,
+new versions opened - as one delta file:
+
+    data/gold/<dim>.parquet                      base dimension
+    data/gold/_delta/<dim>/delta_<stamp>.parquet
+
+Delta rows replace base rows with the same surrogate key (later files win);
+readers go through dimension_source(), which overlays the deltas on the
+base. Once SCD_COMPACT_DELTAS deltas exist they are compacted into a new
+base. Changing tracked_columns re-hashes the existing rows first, so only
+rows whose newly tracked values differ get new versions.
 """
+import json
 import os
 import sys
-from datetime import date
+from datetime import date, datetime
 from pathlib import Path
+from typing import Dict, List, Optional
 
 import duckdb
 
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.transformation import run_metrics, write_policy
+from src.utils import duckdb_utils, gold_layout
+from src.utils.gold_layout import SCD_CONFIG_FILE
 from src.utils.retry_utils import retry_with_backoff
 
 _BASE = os.path.join(os.path.dirname(__file__), "..", "..")
-SILVER_DIR = os.path.join(_BASE, "data", "silver")
-GOLD_DIR = os.path.join(_BASE, "data", "gold")
+_DATA = os.getenv("RETAILNEXUS_DATA_DIR") or os.path.join(_BASE, "data")
+SILVER_DIR = os.path.join(_DATA, "silver")
+GOLD_DIR = os.path.join(_DATA, "gold")
+
+# Tracked columns the dimension's row_hash values were computed from
+_TRACKED_STATE = "_tracked_columns.json"
+# Deltas kept before they are compacted into the base file
+SCD_COMPACT_DELTAS = int(os.getenv("SCD_COMPACT_DELTAS", "8"))
+
 
-SILVER_USERS = os.path.join(SILVER_DIR, "users.parquet").replace("\\", "/")
-GOLD_DIM_USERS = os.path.join(GOLD_DIR, "dim_users.parquet").replace("\\", "/")
+def load_scd_config() -> Dict[str, Dict]:
+    """SCD2 dimension settings by Gold table name (see module docstring)."""
+    with open(SCD_CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    for dim, settings in config.items():
+        unknown = set(settings["tracked_columns"]) - set(settings["columns"])
+        if unknown or not settings["tracked_columns"]:
+            raise ValueError(f"[SCD2] {dim}: tracked_columns must be a non-empty subset of columns "
+                             f"(unknown: {sorted(unknown)})")
+    return config
 
 
 def _ensure_gold():
     os.makedirs(GOLD_DIR, exist_ok=True)
 
 
+def _dim_path(dim: str, gold_dir: Optional[str] = None) -> str:
+    return gold_layout.dim_path(dim, gold_dir or GOLD_DIR)
+
+
+def _delta_dir(dim: str, gold_dir: Optional[str] = None) -> str:
+    return gold_layout.delta_dir(dim, gold_dir or GOLD_DIR)
+
+
+def delta_files(dim: str, gold_dir: Optional[str] = None) -> List[str]:
+    """Delta files of an SCD2 dimension, oldest first."""
+    return gold_layout.delta_files(dim, gold_dir or GOLD_DIR)
+
+
+def dimension_source(table: str, gold_dir: Optional[str] = None) -> str:
+    """Read expression for a Gold dimension with its deltas (see gold_layout.py)."""
+    return gold_layout.dimension_source(table, gold_dir or GOLD_DIR)
+
+
+def _row_hash_sql(tracked: List[str], alias: str = "") -> str:
+    """md5 over the tracked columns; to_json keeps NULLs distinct from any value."""
+    prefix = f"{alias}." if alias else ""
+    fields = ", ".join(f"{col} := {prefix}{col}" for col in tracked)
+    return f"md5(to_json(struct_pack({fields})))"
+
+
+def _columns(path: str) -> List[str]:
+    return [row[0] for row in duckdb_utils.sql(f"DESCRIBE SELECT * FROM '{path}'").fetchall()]
+
+
+def _hashed_with(dim: str) -> Optional[List[str]]:
+    try:
+        with open(os.path.join(_delta_dir(dim), _TRACKED_STATE), "r", encoding="utf-8") as f:
+            return json.load(f)["tracked_columns"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_hashed_with(dim: str, tracked: List[str]):
+    os.makedirs(_delta_dir(dim), exist_ok=True)
+    path = os.path.join(_delta_dir(dim), _TRACKED_STATE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"tracked_columns": list(tracked)}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def compact_dimension(dim: str) -> int:
+    """
+    Fold a dimension's delta files into a new base, re-hashing every row with
+    the configured tracked columns. Returns the base row count.
+    """
+    settings = load_scd_config()[dim]
+    base = _dim_path(dim)
+    deltas = delta_files(dim)
+    source = dimension_source(dim)
+    row_hash = _row_hash_sql(settings["tracked_columns"])
+    # Bases written before hash diffing get their row_hash here
+    select = (f"* REPLACE ({row_hash} AS row_hash)" if "row_hash" in _columns(base)
+              else f"*, {row_hash} AS row_hash")
+    run_metrics.record_read([base] + deltas)
+    duckdb_utils.sql(write_policy.copy_statement(
+        dim, f"SELECT {select} FROM {source} ORDER BY {settings['natural_key']}, effective_date", f"{base}.tmp"))
+    os.replace(f"{base}.tmp", base)
+    _save_hashed_with(dim, settings["tracked_columns"])
+    # Deltas left behind by a crash here are already in the base; re-applying them is a no-op
+    for path in deltas:
+        os.remove(path)
+    total = duckdb_utils.sql(f"SELECT COUNT(*) FROM '{base}'").fetchone()[0]
+    run_metrics.record_written(base, total)
+    if deltas:
+        print(f"[SCD2] Compacted {len(deltas)} delta(s) into {dim} ({total} rows)")
+    else:
+        print(f"[SCD2] Re-hashed {dim} on {', '.join(settings['tracked_columns'])} ({total} rows)")
+    return total
+
+
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError, FileNotFoundError))
-def apply_scd_type_2():
+def apply_scd2(dim: str):
     """
-    SCD Type 2 merge for user dimension.
-    - Unchanged rows -> carry forward
-    - Changed city   -> close old record, insert new version
-    - Brand-new user -> insert with is_current=True
+    SCD Type 2 merge for a configured dimension.
+    - Unchanged rows -> untouched
+    - Changed tracked columns (row_hash differs) -> close old record, insert new version
+    - Brand-new member -> insert with is_current=True
+    Only closed and new versions are written, as a delta file.
     """
     _ensure_gold()
-    
-    # Guard: skip entirely if no Silver users data exists
-    if not os.path.exists(SILVER_USERS):
-        print("[SCD2] No Silver users.parquet found - skipping dim_users")
+    settings = load_scd_config()[dim]
+    silver = os.path.join(SILVER_DIR, f"{settings['source']}.parquet").replace("\\", "/")
+    base = _dim_path(dim)
+    key, sk = settings["natural_key"], settings["surrogate_key"]
+    tracked = settings["tracked_columns"]
+    attributes = ",\n                    ".join(settings["columns"])
+    effective = settings.get("effective_date_column")
+
+    # Guard: skip entirely if no Silver data exists
+    if not os.path.exists(silver):
+        print(f"[SCD2] No Silver {settings['source']}.parquet found - skipping {dim}")
         return
     
     today = date.today().isoformat()
+    first_effective = f"{effective}::DATE" if effective else f"DATE '{today}'"
 
     # -- First run: no history exists yet --
-    if not os.path.exists(GOLD_DIM_USERS):
-        duckdb.sql(f"""
-            COPY (
-                SELECT
-                    ROW_NUMBER() OVER (ORDER BY user_id)::INTEGER AS surrogate_key,
-                    user_id,
-                    name,
-                    email,
-                    city,
-                    signup_date     AS effective_date,
-                    NULL::DATE      AS end_date,
-                    TRUE            AS is_current
-                FROM '{SILVER_USERS}'
-            ) TO '{GOLD_DIM_USERS}' (FORMAT PARQUET)
-        """)
-        cnt = duckdb.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_USERS}'").fetchone()[0]
-        print(f"[SCD2] Initial dim_users load: {cnt} rows")
+    if not os.path.exists(base):
+        run_metrics.record_read(silver)
+        duckdb_utils.sql(write_policy.copy_statement(dim, f"""
+            SELECT
+                ROW_NUMBER() OVER (ORDER BY {key})::INTEGER AS {sk},
+                {key},
+                {attributes},
+                {first_effective} AS effective_date,
+                NULL::DATE      AS end_date,
+                TRUE            AS is_current,
+                {_row_hash_sql(tracked)} AS row_hash
+            FROM '{silver}'
+            ORDER BY {key}
+        """, f"{base}.tmp"))
+        for path in delta_files(dim):
+            os.remove(path)  # deltas of a dimension that was deleted
+        os.replace(f"{base}.tmp", base)
+        _save_hashed_with(dim, tracked)
+        cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM '{base}'").fetchone()[0]
+        run_metrics.record_written(base, cnt)
+        print(f"[SCD2] Initial {dim} load: {cnt} rows")
         return
 
-    # -- Subsequent runs: detect changes --
-    max_sk = duckdb.sql(f"""
-        SELECT COALESCE(MAX(surrogate_key), 0) FROM '{GOLD_DIM_USERS}'
-    """).fetchone()[0]
+    if _hashed_with(dim) != list(tracked) or "row_hash" not in _columns(base):
+        compact_dimension(dim)
 
-    duckdb.sql(f"""
-        CREATE OR REPLACE TEMP TABLE existing AS
-            SELECT * FROM '{GOLD_DIM_USERS}';
+    # -- Subsequent runs: hash-diff Silver against the current versions --
+    deltas = delta_files(dim)
+    run_metrics.record_read([silver, base] + deltas)
+    source = dimension_source(dim)
+    files = ", ".join(f"'{path}'" for path in [base] + deltas)
+    max_sk = duckdb_utils.sql(f"""
+        SELECT COALESCE(MAX({sk}), 0) FROM read_parquet([{files}], union_by_name=true)
+    """).fetchone()[0]
 
-        CREATE OR REPLACE TEMP TABLE incoming AS
-            SELECT * FROM '{SILVER_USERS}';
+    try:
+        duckdb_utils.sql(f"""
+            CREATE OR REPLACE TEMP TABLE scd_current AS
+                SELECT * FROM {source} WHERE is_current = TRUE;
 
-        -- Rows that haven't changed: carry forward as-is
-        CREATE OR REPLACE TEMP TABLE unchanged AS
-            SELECT e.*
-            FROM existing e
-            JOIN incoming i ON e.user_id = i.user_id
-            WHERE e.is_current = TRUE
-              AND e.city = i.city;
+            -- Silver rows that are new or whose tracked columns changed
+            CREATE OR REPLACE TEMP TABLE scd_changes AS
+                SELECT i.*, c.{sk} AS old_key
+                FROM (
+                    SELECT
+                        {key},
+                        {attributes},
+                        {first_effective} AS first_effective,
+                        {_row_hash_sql(tracked)} AS row_hash
+                    FROM '{silver}'
+                ) i
+                LEFT JOIN scd_current c ON c.{key} = i.{key}
+                WHERE c.{key} IS NULL OR c.row_hash IS DISTINCT FROM i.row_hash;
+        """)
+        changed, new = duckdb_utils.sql("""
+            SELECT COUNT(*) FILTER (WHERE old_key IS NOT NULL), COUNT(*) FILTER (WHERE old_key IS NULL)
+            FROM scd_changes
+        """).fetchone()
+        if changed + new == 0:
+            print(f"[SCD2] {dim} unchanged")
+            return
 
-        -- Old current rows whose city changed -> close them
-        CREATE OR REPLACE TEMP TABLE closed AS
-            SELECT
-                e.surrogate_key,
-                e.user_id,
-                e.name,
-                e.email,
-                e.city,
-                e.effective_date,
-                DATE '{today}'     AS end_date,
-                FALSE              AS is_current
-            FROM existing e
-            JOIN incoming i ON e.user_id = i.user_id
-            WHERE e.is_current = TRUE
-              AND e.city != i.city;
-
-        -- New versions for changed users
-        CREATE OR REPLACE TEMP TABLE new_versions AS
-            SELECT
-                ({max_sk} + ROW_NUMBER() OVER (ORDER BY i.user_id))::INTEGER AS surrogate_key,
-                i.user_id,
-                i.name,
-                i.email,
-                i.city,
-                DATE '{today}'     AS effective_date,
-                NULL::DATE         AS end_date,
-                TRUE               AS is_current
-            FROM incoming i
-            JOIN existing e ON e.user_id = i.user_id
-            WHERE e.is_current = TRUE
-              AND e.city != i.city;
-
-        -- Brand-new users (no match in existing)
-        CREATE OR REPLACE TEMP TABLE brand_new AS
+        delta_dir = _delta_dir(dim)
+        os.makedirs(delta_dir, exist_ok=True)
+        delta_path = f"{delta_dir}/delta_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.parquet"
+        duckdb_utils.sql(write_policy.copy_statement(dim, f"""
+            -- Old current rows whose tracked columns changed -> close them
+            SELECT c.* REPLACE (DATE '{today}' AS end_date, FALSE AS is_current)
+            FROM scd_current c
+            WHERE c.{sk} IN (SELECT old_key FROM scd_changes)
+            UNION ALL BY NAME
+            -- New versions for changed members, then brand-new members
             SELECT
-                ({max_sk} + (SELECT COUNT(*) FROM new_versions)
-                    + ROW_NUMBER() OVER (ORDER BY i.user_id))::INTEGER AS surrogate_key,
-                i.user_id,
-                i.name,
-                i.email,
-                i.city,
-                i.signup_date      AS effective_date,
+                ({max_sk} + ROW_NUMBER() OVER (ORDER BY old_key IS NULL, {key}))::INTEGER AS {sk},
+                {key},
+                {attributes},
+                CASE WHEN old_key IS NULL THEN first_effective ELSE DATE '{today}' END AS effective_date,
                 NULL::DATE         AS end_date,
-                TRUE               AS is_current
-            FROM incoming i
-            WHERE i.user_id NOT IN (SELECT user_id FROM existing);
-
-        -- Historical rows that are already closed (not current) -> keep
-        CREATE OR REPLACE TEMP TABLE already_closed AS
-            SELECT * FROM existing WHERE is_current = FALSE;
-    """)
-
-    # -- Merge all pieces and write --
-    duckdb.sql(f"""
-        COPY (
-            SELECT * FROM unchanged
-            UNION ALL
-            SELECT * FROM closed
-            UNION ALL
-            SELECT * FROM new_versions
-            UNION ALL
-            SELECT * FROM brand_new
-            UNION ALL
-            SELECT * FROM already_closed
-            ORDER BY user_id, effective_date
-        ) TO '{GOLD_DIM_USERS}' (FORMAT PARQUET)
-    """)
-
-    changed = duckdb.sql("SELECT COUNT(*) FROM closed").fetchone()[0]
-    new = duckdb.sql("SELECT COUNT(*) FROM brand_new").fetchone()[0]
-    total = duckdb.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_USERS}'").fetchone()[0]
-    print(f"[SCD2] dim_users updated - {changed} closed, {new} new, {total} total rows")
-
-    # cleanup temp tables
-    for t in ["existing", "incoming", "unchanged", "closed", "new_versions", "brand_new", "already_closed"]:
-        duckdb.sql(f"DROP TABLE IF EXISTS {t}")
+                TRUE               AS is_current,
+                row_hash
+            FROM scd_changes
+            ORDER BY {key}, effective_date
+        """, f"{delta_path}.tmp"))
+        os.replace(f"{delta_path}.tmp", delta_path)
+        run_metrics.record_written(delta_path)
+        print(f"[SCD2] {dim} updated - {changed} closed, {new} new "
+              f"(delta {os.path.basename(delta_path)})")
+    finally:
+        for t in ["scd_current", "scd_changes"]:
+            duckdb_utils.sql(f"DROP TABLE IF EXISTS {t}")
+
+    if len(delta_files(dim)) >= SCD_COMPACT_DELTAS:
+        compact_dimension(dim)
+
+
+def apply_scd_type_2():
+    """SCD Type 2 merge for the user dimension (dim_users)."""
+    apply_scd2("dim_users")
 
 
 if __name__ == "__main__":
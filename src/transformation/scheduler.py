@@ -0,0 +1,114 @@
+"""
+RetailNexus — Pipeline DAG Scheduler
+=====================================
+Runs pipeline steps as a dependency graph: a step starts as soon as every
+step it depends on has finished, and independent steps (the five cleaners,
+the Gold dimensions, the three fact tables) run concurrently on a pool of
+PIPELINE_WORKERS threads. Wall-clock time approaches the longest path of the
+graph instead of the sum of all steps.
+
+Steps are (name, depends_on, func) tuples, like the rollup definitions in
+star_schema.py. Dependencies only order steps — a failed step is logged and
+its dependents still run, as in the sequential pipeline. Dependencies on
+steps that are not part of the graph are ignored, so a subset (e.g. only the
+Gold builders) can be scheduled on its own.
+
+All steps share the process-wide DuckDB database (src/utils/duckdb_utils.py),
+whose thread budget DUCKDB_THREADS is divided among concurrent queries by
+DuckDB itself.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Concurrent pipeline steps; 1 runs the graph sequentially in dependency order
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+
+Step = Tuple[str, Sequence[str], Callable[[], object]]
+
+
+def _check_graph(steps: List[Step]) -> Dict[str, set]:
+    """Dependencies restricted to the scheduled steps; raises on cycles or duplicates."""
+    names = [name for name, _, _ in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate pipeline steps: {names}")
+    pending = {name: {d for d in deps if d in names} for name, deps, _ in steps}
+
+    remaining = {name: set(deps) for name, deps in pending.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cycle between pipeline steps: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return pending
+
+
+def _run_step(name: str, func: Callable[[], object], tag: str,
+              on_update: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    started = time.perf_counter()
+    if on_update:
+        on_update(name, {"status": "running"})
+    try:
+        outcome = {"status": "success", "result": func()}
+    except Exception as e:
+        print(f"[{tag}] {name} failed: {e}")
+        outcome = {"status": "error", "result": False, "error": str(e)}
+    outcome["seconds"] = round(time.perf_counter() - started, 3)
+    if on_update:
+        on_update(name, {k: v for k, v in outcome.items() if k != "result"})
+    return outcome
+
+
+def run_dag(steps: List[Step], workers: Optional[int] = None, tag: str = "Scheduler",
+            on_update: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """
+    Run `steps` respecting their dependencies.
+
+    Args:
+        steps: (name, depends_on, func) tuples; func takes no arguments
+        workers: Max steps running at once (default: PIPELINE_WORKERS)
+        tag: Log prefix used when a step fails
+        on_update: Called with (name, state) as each step is queued, starts and finishes
+
+    Returns:
+        {name: {"status": "success"|"error", "result", "seconds"[, "error"]}}
+        in the order the steps were given.
+    """
+    pending = _check_graph(steps)
+    funcs = {name: func for name, _, func in steps}
+    workers = max(1, PIPELINE_WORKERS if workers is None else workers)
+    results: Dict[str, Dict] = {}
+    if on_update:
+        for name in funcs:
+            on_update(name, {"status": "pending"})
+
+    if workers == 1:
+        while pending:
+            name = next(n for n, deps in pending.items() if not deps)
+            results[name] = _run_step(name, funcs[name], tag, on_update)
+            del pending[name]
+            for deps in pending.values():
+                deps.discard(name)
+        return {name: results[name] for name, _, _ in steps}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline-step") as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n, deps in pending.items() if not deps]:
+                del pending[name]
+                # Run in a copy of the caller's context so output capture follows the step
+                context = contextvars.copy_context()
+                running[pool.submit(context.run, _run_step, name, funcs[name], tag, on_update)] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                for deps in pending.values():
+                    deps.discard(name)
+
+    return {name: results[name] for name, _, _ in steps}
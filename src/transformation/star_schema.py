@@ -2,22 +2,37 @@
 RetailNexus - Silver -> Gold Star Schema Builder
 Builds dimension tables (dim_products, dim_stores, dim_dates) and fact_transactions
 from Silver-layer Parquet files.  dim_users is handled by scd_logic.py.
-All transformations via duckdb.sql().
+Also materializes agg_* rollups of fact_transactions for the dashboard KPIs.
+product_key / store_key come from the persistent key registry (key_registry.py),
+so adding a member never renumbers the others.
+All transformations via duckdb_utils.sql(); every Parquet write follows the
+per-table Gold write policy in write_policy.py (sort order, row groups, ZSTD).
 Each builder is OPTIONAL — if its Silver source is missing, it is skipped.
 """
 import os
 import sys
+import json
+import uuid
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 import duckdb
 
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.transformation import key_registry, run_metrics, write_policy
+from src.transformation.scheduler import run_dag
+from src.utils import duckdb_utils, gold_layout
+from src.utils.gold_layout import GOLD_GENERATION_FILE
 from src.utils.retry_utils import retry_with_backoff
+from src.analytics import warehouse
+from src.analytics.schema_inspector import discover_tables
 
 _BASE = os.path.join(os.path.dirname(__file__), "..", "..")
-SILVER_DIR = os.path.join(_BASE, "data", "silver")
-GOLD_DIR = os.path.join(_BASE, "data", "gold")
+_DATA = os.getenv("RETAILNEXUS_DATA_DIR") or os.path.join(_BASE, "data")
+SILVER_DIR = os.path.join(_DATA, "silver")
+GOLD_DIR = os.path.join(_DATA, "gold")
 
 SILVER_TXN = os.path.join(SILVER_DIR, "transactions.parquet").replace("\\", "/")
 SILVER_PRODUCTS = os.path.join(SILVER_DIR, "products.parquet").replace("\\", "/")
@@ -27,6 +42,16 @@ GOLD_DIM_DATES = os.path.join(GOLD_DIR, "dim_dates.parquet").replace("\\", "/")
 GOLD_FACT_TXN = os.path.join(GOLD_DIR, "fact_transactions.parquet").replace("\\", "/")
 GOLD_DIM_USERS = os.path.join(GOLD_DIR, "dim_users.parquet").replace("\\", "/")
 
+# fact_transactions is a directory partitioned by date_key; its ledger and the
+# dim key maps used for the last build live in an underscore dir that
+# discover_tables() skips.
+FACT_STATE_DIR = os.path.join(GOLD_DIR, "_fact_transactions_state").replace("\\", "/")
+FACT_LEDGER_DIR = os.path.join(FACT_STATE_DIR, "ledger").replace("\\", "/")
+FACT_IN_PROGRESS = os.path.join(FACT_STATE_DIR, "_in_progress")
+FACT_INCREMENTAL = os.getenv("FACT_INCREMENTAL", "true").lower() == "true"
+# Partitions with more files than this are compacted on the next build
+FACT_COMPACT_MAX_FILES = int(os.getenv("FACT_COMPACT_MAX_FILES", "8"))
+
 
 def _ensure_gold():
     os.makedirs(GOLD_DIR, exist_ok=True)
@@ -37,52 +62,91 @@ def _silver_exists(filename: str) -> bool:
     return os.path.isfile(os.path.join(SILVER_DIR, filename))
 
 
+def _fact_source() -> str:
+    """DuckDB read expression for the partitioned fact_transactions table."""
+    return f"read_parquet('{GOLD_FACT_TXN}/**/*.parquet', hive_partitioning=true)"
+
+
 def _gold_exists(filename: str) -> bool:
     """Check if a Gold-layer parquet file or directory exists."""
     path = os.path.join(GOLD_DIR, filename)
     return os.path.isfile(path) or os.path.isdir(path)
 
 
+def read_gold_generation(gold_dir: str = GOLD_DIR) -> Optional[dict]:
+    """Return the current Gold generation record, or None if nothing was published."""
+    try:
+        with open(os.path.join(gold_dir, GOLD_GENERATION_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def publish_gold_generation(gold_dir: str = GOLD_DIR) -> dict:
+    """Atomically bump the Gold generation after a build is complete.
+    The random token keeps generations unique even if the counter restarts
+    after a data reset."""
+    current = read_gold_generation(gold_dir) or {}
+    record = {
+        "generation": int(current.get("generation", 0)) + 1,
+        "token": uuid.uuid4().hex,
+        "published_at": datetime.now().isoformat(),
+    }
+    path = os.path.join(gold_dir, GOLD_GENERATION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+    return record
+
+
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def build_dim_products():
-    """Straight copy from Silver with a surrogate key."""
+    """Straight copy from Silver with a registered surrogate key."""
     if not _silver_exists("products.parquet"):
         print("[StarSchema] No Silver products - skipping dim_products")
         return False
-    duckdb.sql(f"""
-        COPY (
-            SELECT
-                ROW_NUMBER() OVER (ORDER BY product_id)::INTEGER AS product_key,
-                product_id,
-                product_name,
-                category,
-                price
-            FROM '{SILVER_PRODUCTS}'
-        ) TO '{GOLD_DIM_PRODUCTS}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_PRODUCTS}'").fetchone()[0]
+    run_metrics.record_read(SILVER_PRODUCTS)
+    key_registry.register_keys("dim_products", "product_id", "product_key", f"'{SILVER_PRODUCTS}'", GOLD_DIR)
+    registry = key_registry.registry_path("dim_products", GOLD_DIR)
+    duckdb_utils.sql(write_policy.copy_statement("dim_products", f"""
+        SELECT
+            r.product_key,
+            p.product_id,
+            p.product_name,
+            p.category,
+            p.price
+        FROM '{SILVER_PRODUCTS}' p
+        JOIN '{registry}' r ON p.product_id = r.product_id
+    """, f"{GOLD_DIM_PRODUCTS}.tmp"))
+    os.replace(f"{GOLD_DIM_PRODUCTS}.tmp", GOLD_DIM_PRODUCTS)
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_PRODUCTS}'").fetchone()[0]
+    run_metrics.record_written(GOLD_DIM_PRODUCTS, cnt)
     print(f"[StarSchema] dim_products: {cnt} rows")
     return True
 
 
 @retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
 def build_dim_stores():
-    """Extract distinct stores from transactions."""
+    """Extract distinct stores from transactions, keyed by the store registry."""
     if not _silver_exists("transactions.parquet"):
         print("[StarSchema] No Silver transactions - skipping dim_stores")
         return False
-    duckdb.sql(f"""
-        COPY (
-            SELECT
-                ROW_NUMBER() OVER (ORDER BY store_id)::INTEGER AS store_key,
-                store_id,
-                'Region_' || RIGHT(store_id, 3)  AS region
-            FROM (
-                SELECT DISTINCT store_id FROM '{SILVER_TXN}'
-            ) s
-        ) TO '{GOLD_DIM_STORES}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_STORES}'").fetchone()[0]
+    run_metrics.record_read(SILVER_TXN)
+    stores = f"(SELECT DISTINCT store_id FROM '{SILVER_TXN}')"
+    key_registry.register_keys("dim_stores", "store_id", "store_key", stores, GOLD_DIR)
+    registry = key_registry.registry_path("dim_stores", GOLD_DIR)
+    duckdb_utils.sql(write_policy.copy_statement("dim_stores", f"""
+        SELECT
+            r.store_key,
+            s.store_id,
+            'Region_' || RIGHT(s.store_id, 3)  AS region
+        FROM {stores} s
+        JOIN '{registry}' r ON s.store_id = r.store_id
+    """, f"{GOLD_DIM_STORES}.tmp"))
+    os.replace(f"{GOLD_DIM_STORES}.tmp", GOLD_DIM_STORES)
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_STORES}'").fetchone()[0]
+    run_metrics.record_written(GOLD_DIM_STORES, cnt)
     print(f"[StarSchema] dim_stores: {cnt} rows")
     return True
 
@@ -93,125 +157,376 @@ def build_dim_dates():
     if not _silver_exists("transactions.parquet"):
         print("[StarSchema] No Silver transactions - skipping dim_dates")
         return False
-    duckdb.sql(f"""
-        COPY (
-            SELECT
-                CAST(STRFTIME(d.date_val, '%Y%m%d') AS INTEGER) AS date_key,
-                d.date_val::DATE                                AS full_date,
-                EXTRACT(YEAR FROM d.date_val)::INTEGER          AS year,
-                EXTRACT(QUARTER FROM d.date_val)::INTEGER       AS quarter,
-                EXTRACT(MONTH FROM d.date_val)::INTEGER         AS month,
-                DAYNAME(d.date_val)                             AS day_of_week,
-                CASE WHEN DAYOFWEEK(d.date_val) IN (0, 6) THEN TRUE ELSE FALSE END AS is_weekend
-            FROM (
-                SELECT UNNEST(
-                    GENERATE_SERIES(
-                        (SELECT MIN(timestamp)::DATE FROM '{SILVER_TXN}'),
-                        (SELECT MAX(timestamp)::DATE FROM '{SILVER_TXN}'),
-                        INTERVAL 1 DAY
-                    )
-                ) AS date_val
-            ) d
-        ) TO '{GOLD_DIM_DATES}' (FORMAT PARQUET)
-    """)
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_DATES}'").fetchone()[0]
+    run_metrics.record_read(SILVER_TXN)
+    duckdb_utils.sql(write_policy.copy_statement("dim_dates", f"""
+        SELECT
+            CAST(STRFTIME(d.date_val, '%Y%m%d') AS INTEGER) AS date_key,
+            d.date_val::DATE                                AS full_date,
+            EXTRACT(YEAR FROM d.date_val)::INTEGER          AS year,
+            EXTRACT(QUARTER FROM d.date_val)::INTEGER       AS quarter,
+            EXTRACT(MONTH FROM d.date_val)::INTEGER         AS month,
+            DAYNAME(d.date_val)                             AS day_of_week,
+            CASE WHEN DAYOFWEEK(d.date_val) IN (0, 6) THEN TRUE ELSE FALSE END AS is_weekend
+        FROM (
+            SELECT UNNEST(
+                GENERATE_SERIES(
+                    (SELECT MIN(timestamp)::DATE FROM '{SILVER_TXN}'),
+                    (SELECT MAX(timestamp)::DATE FROM '{SILVER_TXN}'),
+                    INTERVAL 1 DAY
+                )
+            ) AS date_val
+        ) d
+    """, f"{GOLD_DIM_DATES}.tmp"))
+    os.replace(f"{GOLD_DIM_DATES}.tmp", GOLD_DIM_DATES)
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM '{GOLD_DIM_DATES}'").fetchone()[0]
+    run_metrics.record_written(GOLD_DIM_DATES, cnt)
     print(f"[StarSchema] dim_dates: {cnt} rows")
     return True
 
 
-@retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
-def build_fact_transactions():
-    """
-    Join Silver transactions with Gold dim tables to produce the fact table.
-    Handles missing dims by using LEFT JOINs with fallback values.
+# ─────────────────────────────────────────────────
+# fact_transactions (date_key-partitioned, incremental)
+# ─────────────────────────────────────────────────
+# Every row also gets a narrow ledger entry (natural keys + measures) in the
+# same partition layout under _fact_transactions_state/. The ledger lets an
+# incremental run find new, changed and deleted Silver rows without
+# re-joining the whole table, and the saved dim key maps tell it which
+# existing rows a dimension rebuild would re-key.
+# user_key is resolved point-in-time: an ASOF join picks the dim_users version
+# in effect on the transaction date, so a new SCD2 version only re-keys that
+# user's rows from its effective date on and older rows keep their key.
+_FACT_COLUMNS = "transaction_id, date_key, timestamp, amount, user_key, product_key, store_key, region"
+_LEDGER_COLUMNS = "transaction_id, product_id, user_id, store_id, timestamp, amount, date_key"
+_LEDGER_GLOB = f"read_parquet('{FACT_LEDGER_DIR}/**/*.parquet', hive_partitioning=true)"
+_DATE_KEY_SQL = "CAST(STRFTIME({alias}.timestamp, '%Y%m%d') AS INTEGER)"
+# Directory DuckDB writes NULL date_keys to (timestamps that failed TRY_CAST)
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# dim -> (gold file, natural key, map query, empty map schema)
+# {dim_users} is filled in at load time: dim_users may have SCD2 delta files.
+# user_versions has one row per (user_id, effective date), the last version of
+# the day winning; the first version is open-ended backwards so transactions
+# dated before a user's signup_date still resolve.
+_FACT_DIM_MAPS = {
+    "products": ("dim_products.parquet", "product_id",
+                 f"SELECT product_id, product_key FROM '{GOLD_DIM_PRODUCTS}'",
+                 "product_id VARCHAR, product_key INTEGER"),
+    "stores": ("dim_stores.parquet", "store_id",
+               f"SELECT store_id, store_key, region FROM '{GOLD_DIM_STORES}'",
+               "store_id VARCHAR, store_key INTEGER, region VARCHAR"),
+    "user_versions": ("dim_users.parquet", "user_id", """
+        SELECT
+            user_id,
+            user_key,
+            CASE WHEN effective_date = MIN(effective_date) OVER (PARTITION BY user_id)
+                 THEN DATE '1900-01-01' ELSE effective_date END AS effective_from
+        FROM (
+            SELECT user_id, surrogate_key AS user_key,
+                   COALESCE(effective_date, DATE '1900-01-01') AS effective_date
+            FROM {dim_users}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id, effective_date ORDER BY surrogate_key DESC) = 1
+        )
+        ORDER BY user_id, effective_from
+    """, "user_id VARCHAR, user_key INTEGER, effective_from DATE"),
+}
+# Key map of builds before point-in-time user keys; removed on the next save
+_LEGACY_USER_MAP = os.path.join(FACT_STATE_DIR, "map_users.parquet")
+
+
+def _load_fact_key_maps():
+    """Create temp tables fact_map_<dim> from the current Gold dims (empty if a dim is missing)."""
+    for dim, (filename, _, query, schema) in _FACT_DIM_MAPS.items():
+        if _gold_exists(filename):
+            query = query.replace("{dim_users}", gold_layout.dimension_source("dim_users", GOLD_DIR))
+            duckdb_utils.sql(f"CREATE OR REPLACE TEMP TABLE fact_map_{dim} AS {query}")
+        else:
+            duckdb_utils.sql(f"CREATE OR REPLACE TEMP TABLE fact_map_{dim} ({schema})")
+
+
+def _save_fact_key_maps():
+    """Persist the key maps the fact table was joined with; a missing dim leaves no file."""
+    for dim, (filename, _, _, _) in _FACT_DIM_MAPS.items():
+        path = os.path.join(FACT_STATE_DIR, f"map_{dim}.parquet").replace("\\", "/")
+        if _gold_exists(filename):
+            duckdb_utils.sql(write_policy.copy_statement(f"map_{dim}", f"SELECT * FROM fact_map_{dim}", f"{path}.tmp"))
+            os.replace(f"{path}.tmp", path)
+        elif os.path.exists(path):
+            os.remove(path)
+    if os.path.exists(_LEGACY_USER_MAP):
+        os.remove(_LEGACY_USER_MAP)
+
+
+def _changed_key_ids(dim: str) -> str:
+    """SQL returning natural keys whose surrogate mapping changed since the last build."""
+    _, natural_key, _, schema = _FACT_DIM_MAPS[dim]
+    path = os.path.join(FACT_STATE_DIR, f"map_{dim}.parquet").replace("\\", "/")
+    if os.path.isfile(path):
+        previous = f"'{path}'"
+    else:
+        previous = f"(SELECT * FROM fact_map_{dim} WHERE FALSE)"
+    value_cols = [c.split()[0] for c in schema.split(", ") if c.split()[0] != natural_key]
+    old_vals = ", ".join(f"o.{c}" for c in value_cols)
+    new_vals = ", ".join(f"n.{c}" for c in value_cols)
+    return f"""
+        SELECT COALESCE(o.{natural_key}, n.{natural_key})
+        FROM {previous} o
+        FULL OUTER JOIN fact_map_{dim} n ON o.{natural_key} = n.{natural_key}
+        WHERE o.{natural_key} IS NULL OR n.{natural_key} IS NULL
+           OR ({old_vals}) IS DISTINCT FROM ({new_vals})
     """
-    if not _silver_exists("transactions.parquet"):
-        print("[StarSchema] No Silver transactions - skipping fact_transactions")
-        return False
 
-    # Build the query dynamically based on available dims
-    select_parts = [
-        "t.transaction_id",
-        "CAST(STRFTIME(t.timestamp, '%Y%m%d') AS INTEGER) AS date_key",
-        "t.timestamp",
-        "t.amount",
-    ]
-    join_parts = []
 
-    if _gold_exists("dim_users.parquet"):
-        select_parts.append("COALESCE(du.surrogate_key, -1) AS user_key")
-        join_parts.append(f"LEFT JOIN '{GOLD_DIM_USERS}' du ON t.user_id = du.user_id AND du.is_current = TRUE")
+def _changed_user_partitions() -> str:
+    """SQL returning ledger date_keys whose point-in-time user_key may have changed.
+    A version added, removed or re-keyed since the last build only affects that
+    user's rows dated on or after the version's effective_from."""
+    path = os.path.join(FACT_STATE_DIR, "map_user_versions.parquet").replace("\\", "/")
+    if os.path.isfile(path):
+        previous = f"'{path}'"
     else:
-        select_parts.append("-1 AS user_key")
+        previous = "(SELECT * FROM fact_map_user_versions WHERE FALSE)"
+    return f"""
+        SELECT l.date_key
+        FROM {_LEDGER_GLOB} l
+        JOIN (
+            (SELECT user_id, user_key, effective_from FROM {previous}
+             EXCEPT SELECT * FROM fact_map_user_versions)
+            UNION
+            (SELECT * FROM fact_map_user_versions
+             EXCEPT SELECT user_id, user_key, effective_from FROM {previous})
+        ) c ON l.user_id = c.user_id
+        WHERE l.date_key >= CAST(STRFTIME(c.effective_from, '%Y%m%d') AS INTEGER)
+    """
 
-    if _gold_exists("dim_products.parquet"):
-        select_parts.append("COALESCE(dp.product_key, -1) AS product_key")
-        join_parts.append(f"LEFT JOIN '{GOLD_DIM_PRODUCTS}' dp ON t.product_id = dp.product_id")
-    else:
-        select_parts.append("-1 AS product_key")
 
-    if _gold_exists("dim_stores.parquet"):
-        select_parts.append("COALESCE(ds.store_key, -1) AS store_key")
-        select_parts.append("COALESCE(ds.region, 'Unknown') AS region")
-        join_parts.append(f"LEFT JOIN '{GOLD_DIM_STORES}' ds ON t.store_id = ds.store_id")
-    else:
-        select_parts.append("-1 AS store_key")
-        select_parts.append("'Unknown' AS region")
+def _fact_select(source_sql: str) -> str:
+    """Join Silver-shaped rows to the key maps, keeping natural keys for the ledger.
+    user_key comes from an ASOF join: the latest user version whose
+    effective_from is on or before the transaction timestamp."""
+    return f"""
+        SELECT
+            t.transaction_id,
+            {_DATE_KEY_SQL.format(alias='t')} AS date_key,
+            t.timestamp,
+            t.amount,
+            COALESCE(uv.user_key, -1)       AS user_key,
+            COALESCE(mp.product_key, -1)    AS product_key,
+            COALESCE(ms.store_key, -1)      AS store_key,
+            COALESCE(ms.region, 'Unknown')  AS region,
+            t.product_id,
+            t.user_id,
+            t.store_id
+        FROM {source_sql} t
+        ASOF LEFT JOIN fact_map_user_versions uv
+            ON t.user_id = uv.user_id AND t.timestamp >= uv.effective_from
+        LEFT JOIN fact_map_products mp ON t.product_id = mp.product_id
+        LEFT JOIN fact_map_stores ms ON t.store_id = ms.store_id
+    """
 
-    select_clause = ",\n            ".join(select_parts)
-    join_clause = "\n        ".join(join_parts)
 
-    duckdb.sql(f"""
-        CREATE OR REPLACE TABLE fact_transactions_temp AS
-        SELECT
-            {select_clause}
-        FROM '{SILVER_TXN}' t
-        {join_clause}
-    """)
-    
-    
-    # Write to temp file first, then atomic rename to prevent file locking
-    # This ensures backend can always read a complete, valid file
+def _stage_fact_rows(select_sql: str, stamp: str) -> Tuple[Optional[str], int]:
+    """Write fact + ledger partitions for `select_sql` into a staging dir.
+    Returns (staging dir or None if there were no rows, row count)."""
+    duckdb_utils.sql(f"CREATE OR REPLACE TEMP TABLE fact_transactions_temp AS {select_sql}")
+    try:
+        cnt = duckdb_utils.sql("SELECT COUNT(*) FROM fact_transactions_temp").fetchone()[0]
+        if cnt == 0:
+            return None, 0
+        staging = os.path.join(FACT_STATE_DIR, f"_staging_{stamp}").replace("\\", "/")
+        os.makedirs(staging, exist_ok=True)
+        for sub, columns, policy in (("fact", _FACT_COLUMNS, "fact_transactions"),
+                                     ("ledger", _LEDGER_COLUMNS, "fact_transactions_ledger")):
+            duckdb_utils.sql(write_policy.copy_statement(
+                policy, f"SELECT {columns} FROM fact_transactions_temp", f"{staging}/{sub}",
+                f"PARTITION_BY (date_key), FILENAME_PATTERN 'part_{stamp}_{{i}}'"))
+        run_metrics.record_written(f"{staging}/fact", cnt)
+        return staging, cnt
+    finally:
+        duckdb_utils.sql("DROP TABLE IF EXISTS fact_transactions_temp")
+
+
+def _swap_dir(new_path: Optional[str], target: str):
+    """Replace `target` (file or dir) with `new_path`; the gap is two renames."""
     import shutil
-    temp_file = f"{GOLD_FACT_TXN}.tmp"
-    
+    trash = None
+    if os.path.exists(target):
+        trash = f"{target}.old"
+        if os.path.isdir(trash):
+            shutil.rmtree(trash)
+        os.replace(target, trash)
+    if new_path is not None:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(new_path, target)
+    if trash is not None:
+        if os.path.isdir(trash):
+            shutil.rmtree(trash, ignore_errors=True)
+        else:
+            os.remove(trash)
+
+
+def _partition_name(date_key: Optional[int]) -> str:
+    """Hive directory name of a date_key partition; None is the NULL partition."""
+    return f"date_key={_NULL_PARTITION if date_key is None else date_key}"
+
+
+def _partition_dirs(table_dir: str) -> Dict[Optional[int], str]:
+    """date_key -> partition directory for a hive-partitioned table (None: NULL date_key)."""
+    partitions = {}
+    if os.path.isdir(table_dir):
+        for name in os.listdir(table_dir):
+            if name == _partition_name(None):
+                partitions[None] = os.path.join(table_dir, name)
+            elif name.startswith("date_key=") and name[9:].lstrip("-").isdigit():
+                partitions[int(name[9:])] = os.path.join(table_dir, name)
+    return partitions
+
+
+def _date_key_in(expr: str, date_keys: set) -> str:
+    """NULL-safe SQL predicate: `expr` is one of `date_keys` (None matches NULL)."""
+    keys = sorted(k for k in date_keys if k is not None)
+    parts = [f"{expr} IN ({', '.join(str(k) for k in keys)})"] if keys else []
+    if None in date_keys:
+        parts.append(f"{expr} IS NULL")
+    return f"COALESCE({' OR '.join(parts)}, FALSE)" if parts else "FALSE"
+
+
+def _fact_state_valid() -> bool:
+    """Incremental builds need a partitioned fact, its ledger and a clean last run."""
+    return (
+        os.path.isdir(GOLD_FACT_TXN)
+        and os.path.isdir(FACT_LEDGER_DIR)
+        and not os.path.exists(FACT_IN_PROGRESS)
+    )
+
+
+def _rebuild_fact_transactions(stamp: str):
+    """Full rebuild: join all of Silver and swap the whole table in.
+    The fact and ledger swaps are guarded by FACT_IN_PROGRESS, which
+    build_fact_transactions() removes once the key maps are saved."""
+    import shutil
+    staging, _ = _stage_fact_rows(_fact_select(f"'{SILVER_TXN}'"), stamp)
+    with open(FACT_IN_PROGRESS, "w") as f:
+        f.write(stamp)
+    _swap_dir(f"{staging}/fact" if staging else None, GOLD_FACT_TXN)
+    _swap_dir(f"{staging}/ledger" if staging else None, FACT_LEDGER_DIR)
+    if staging:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _update_fact_transactions(stamp: str) -> Tuple[int, int]:
+    """
+    Incremental build. Rows new to Silver are appended as new files in their
+    date partitions. Partitions holding changed/deleted rows, rows whose dim
+    keys were remapped, or more than FACT_COMPACT_MAX_FILES files are
+    rewritten from Silver. Returns (appended rows, rewritten partitions).
+    """
+    import shutil
+    silver_date_key = _DATE_KEY_SQL.format(alias="s")
+    changed = {dim: _changed_key_ids(dim) for dim in ("products", "stores")}
+    rows = duckdb_utils.sql(f"""
+        WITH diff AS (
+            SELECT l.date_key AS old_date, {silver_date_key} AS new_date, s.present
+            FROM {_LEDGER_GLOB} l
+            LEFT JOIN (SELECT *, TRUE AS present FROM '{SILVER_TXN}') s
+                ON l.transaction_id IS NOT DISTINCT FROM s.transaction_id
+               AND l.product_id IS NOT DISTINCT FROM s.product_id
+            WHERE s.present IS NULL
+               OR (l.user_id, l.store_id, l.timestamp, l.amount)
+                  IS DISTINCT FROM (s.user_id, s.store_id, s.timestamp, s.amount)
+        )
+        SELECT old_date FROM diff
+        UNION SELECT new_date FROM diff WHERE present
+        UNION SELECT date_key FROM {_LEDGER_GLOB}
+              WHERE product_id IN ({changed['products']})
+                 OR store_id IN ({changed['stores']})
+        UNION {_changed_user_partitions()}
+    """).fetchall()
+    # None is the NULL date_key partition (rows whose timestamp failed to parse)
+    rewrite = {r[0] for r in rows}
+    for date_key, path in _partition_dirs(GOLD_FACT_TXN).items():
+        if len(os.listdir(path)) > FACT_COMPACT_MAX_FILES:
+            rewrite.add(date_key)
+
+    new_rows_sql = f"""(
+        SELECT s.* FROM '{SILVER_TXN}' s
+        ANTI JOIN {_LEDGER_GLOB} l
+            ON s.transaction_id IS NOT DISTINCT FROM l.transaction_id
+           AND s.product_id IS NOT DISTINCT FROM l.product_id
+    )"""
+    append_filter = f"WHERE NOT {_date_key_in('date_key', rewrite)}" if rewrite else ""
+
+    with open(FACT_IN_PROGRESS, "w") as f:
+        f.write(stamp)
+
+    staging, appended = _stage_fact_rows(
+        f"SELECT * FROM ({_fact_select(new_rows_sql)}) {append_filter}",
+        f"{stamp}_append",
+    )
+    if staging:
+        for sub, table_dir in (("fact", GOLD_FACT_TXN), ("ledger", FACT_LEDGER_DIR)):
+            for name in os.listdir(f"{staging}/{sub}"):
+                os.makedirs(os.path.join(table_dir, name), exist_ok=True)
+                for part in os.listdir(f"{staging}/{sub}/{name}"):
+                    os.replace(f"{staging}/{sub}/{name}/{part}", os.path.join(table_dir, name, part))
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if rewrite:
+        staging, _ = _stage_fact_rows(
+            _fact_select(f"(SELECT * FROM '{SILVER_TXN}' s WHERE {_date_key_in(silver_date_key, rewrite)})"),
+            f"{stamp}_rewrite",
+        )
+        for sub, table_dir in (("fact", GOLD_FACT_TXN), ("ledger", FACT_LEDGER_DIR)):
+            for date_key in rewrite:
+                name = _partition_name(date_key)
+                new_path = f"{staging}/{sub}/{name}" if staging else None
+                if new_path is not None and not os.path.isdir(new_path):
+                    new_path = None
+                _swap_dir(new_path, os.path.join(table_dir, name))
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    return appended, len(rewrite)
+
+
+@retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
+def build_fact_transactions(incremental: Optional[bool] = None):
+    """
+    Join Silver transactions with Gold dim tables to produce the fact table,
+    partitioned by date_key so date filters prune whole directories.
+    Handles missing dims by using LEFT JOINs with fallback values.
+
+    Args:
+        incremental: Append only new Silver rows (default: FACT_INCREMENTAL).
+                     Falls back to a full rebuild when no valid state exists.
+    """
+    if not _silver_exists("transactions.parquet"):
+        print("[StarSchema] No Silver transactions - skipping fact_transactions")
+        return False
+
+    if incremental is None:
+        incremental = FACT_INCREMENTAL
+    os.makedirs(FACT_STATE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+    run_metrics.record_read([SILVER_TXN] + [os.path.join(GOLD_DIR, filename)
+                                            for filename, _, _, _ in _FACT_DIM_MAPS.values()])
+    _load_fact_key_maps()
     try:
-        # Write to temporary file (won't interfere with reads)
-        duckdb.sql(f"""
-            COPY fact_transactions_temp 
-            TO '{temp_file}' 
-            (FORMAT PARQUET)
-        """)
-        
-        # Clean up temp table now that data is written
-        duckdb.sql("DROP TABLE IF EXISTS fact_transactions_temp")
-        
-        # Remove old file if exists (handle both file and directory cases)
-        if os.path.exists(GOLD_FACT_TXN):
-            if os.path.isdir(GOLD_FACT_TXN):
-                shutil.rmtree(GOLD_FACT_TXN)
-            else:
-                os.remove(GOLD_FACT_TXN)
-        
-        # Atomic rename - this is instantaneous, no lock window
-        os.rename(temp_file, GOLD_FACT_TXN)
-        
-    except Exception as e:
-        # Clean up temp table if it still exists
-        try:
-            duckdb.sql("DROP TABLE IF EXISTS fact_transactions_temp")
-        except:
-            pass
-        # Clean up temp file on error
-        if os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except:
-                pass
-        raise e
-    
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM '{GOLD_FACT_TXN}'").fetchone()[0]
-    print(f"[StarSchema] fact_transactions: {cnt} rows")
+        if incremental and _fact_state_valid():
+            appended, rewritten = _update_fact_transactions(stamp)
+            mode = f"+{appended} rows appended, {rewritten} partitions rewritten"
+        else:
+            _rebuild_fact_transactions(stamp)
+            mode = "full rebuild"
+        _save_fact_key_maps()
+        if os.path.exists(FACT_IN_PROGRESS):
+            os.remove(FACT_IN_PROGRESS)
+    finally:
+        for dim in _FACT_DIM_MAPS:
+            duckdb_utils.sql(f"DROP TABLE IF EXISTS fact_map_{dim}")
+
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM {_fact_source()}").fetchone()[0] if os.path.isdir(GOLD_FACT_TXN) else 0
+    print(f"[StarSchema] fact_transactions: {cnt} rows ({mode})")
     return True
 
 
@@ -227,8 +542,9 @@ def build_fact_inventory():
     
     import shutil
     
-    duckdb.sql(f"""
-        CREATE OR REPLACE TABLE fact_inventory_temp AS
+    run_metrics.record_read([SILVER_INVENTORY, GOLD_DIM_PRODUCTS, GOLD_DIM_STORES])
+    duckdb_utils.sql(f"""
+        CREATE OR REPLACE TEMP TABLE fact_inventory_temp AS
         SELECT
             COALESCE(dp.product_key, -1)                     AS product_key,
             COALESCE(ds.store_key, -1)                       AS store_key,
@@ -256,14 +572,13 @@ def build_fact_inventory():
     except PermissionError:
         pass
     
-    duckdb.sql(f"""
-        COPY fact_inventory_temp
-        TO '{GOLD_FACT_INVENTORY}'
-        (FORMAT PARQUET, PARTITION_BY (region, date_key), OVERWRITE_OR_IGNORE)
-    """)
+    duckdb_utils.sql(write_policy.copy_statement(
+        "fact_inventory", "SELECT * FROM fact_inventory_temp", GOLD_FACT_INVENTORY,
+        "PARTITION_BY (region, date_key), OVERWRITE_OR_IGNORE"))
     
-    duckdb.sql("DROP TABLE IF EXISTS fact_inventory_temp")
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM read_parquet('{GOLD_FACT_INVENTORY}/**/*.parquet', hive_partitioning=true)").fetchone()[0]
+    duckdb_utils.sql("DROP TABLE IF EXISTS fact_inventory_temp")
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM read_parquet('{GOLD_FACT_INVENTORY}/**/*.parquet', hive_partitioning=true)").fetchone()[0]
+    run_metrics.record_written(GOLD_FACT_INVENTORY, cnt)
     print(f"[StarSchema] fact_inventory: {cnt} rows")
     return True
 
@@ -280,8 +595,9 @@ def build_fact_shipments():
     
     import shutil
     
-    duckdb.sql(f"""
-        CREATE OR REPLACE TABLE fact_shipments_temp AS
+    run_metrics.record_read([SILVER_SHIPMENTS, GOLD_DIM_STORES])
+    duckdb_utils.sql(f"""
+        CREATE OR REPLACE TEMP TABLE fact_shipments_temp AS
         SELECT
             s.shipment_id,
             s.transaction_id,
@@ -317,46 +633,219 @@ def build_fact_shipments():
     except PermissionError:
         pass
     
-    duckdb.sql(f"""
-        COPY fact_shipments_temp
-        TO '{GOLD_FACT_SHIPMENTS}'
-        (FORMAT PARQUET, PARTITION_BY (origin_region, date_key), OVERWRITE_OR_IGNORE)
-    """)
+    duckdb_utils.sql(write_policy.copy_statement(
+        "fact_shipments", "SELECT * FROM fact_shipments_temp", GOLD_FACT_SHIPMENTS,
+        "PARTITION_BY (origin_region, date_key), OVERWRITE_OR_IGNORE"))
     
-    duckdb.sql("DROP TABLE IF EXISTS fact_shipments_temp")
-    cnt = duckdb.sql(f"SELECT COUNT(*) FROM read_parquet('{GOLD_FACT_SHIPMENTS}/**/*.parquet', hive_partitioning=true)").fetchone()[0]
+    duckdb_utils.sql("DROP TABLE IF EXISTS fact_shipments_temp")
+    cnt = duckdb_utils.sql(f"SELECT COUNT(*) FROM read_parquet('{GOLD_FACT_SHIPMENTS}/**/*.parquet', hive_partitioning=true)").fetchone()[0]
+    run_metrics.record_written(GOLD_FACT_SHIPMENTS, cnt)
     print(f"[StarSchema] fact_shipments: {cnt} rows")
     return True
 
 
-def build_star_schema():
-    """Build all Gold-layer tables (excluding dim_users, handled by SCD).
-    Each builder is independent — missing Silver files are skipped."""
-    _ensure_gold()
-    results = {}
-    
-    for name, func in [
-        ("dim_products", build_dim_products),
-        ("dim_stores", build_dim_stores),
-        ("dim_dates", build_dim_dates),
-        ("fact_transactions", build_fact_transactions),
-        ("fact_inventory", build_fact_inventory),
-        ("fact_shipments", build_fact_shipments),
-    ]:
-        try:
-            results[name] = func()
-        except Exception as e:
-            print(f"[StarSchema] {name} failed: {e}")
-            results[name] = False
-    
+# ─────────────────────────────────────────────────
+# Rollups (pre-aggregated Gold tables for dashboard KPIs)
+# ─────────────────────────────────────────────────
+def _rollup_definitions() -> list:
+    """
+    (table name, required Gold inputs, SELECT) for each rollup.
+    Every rollup is an exact pre-aggregation of fact_transactions at the grain
+    a KPI reports on; distinct counts are computed per grain, never summed.
+    user_key is point-in-time, so one customer has a key per dim_users version;
+    a day holds one version per customer, coarser grains count du.user_id.
+    """
+    fact = _fact_source()
+    dates = f"'{GOLD_DIM_DATES}'"
+    products = f"'{GOLD_DIM_PRODUCTS}'"
+    users = gold_layout.dimension_source("dim_users", GOLD_DIR)
+    return [
+        ("agg_sales_daily", ["dim_dates.parquet"], f"""
+            SELECT
+                dd.date_key, dd.full_date, dd.day_of_week, dd.year, dd.quarter, dd.month,
+                SUM(ft.amount)                                             AS revenue,
+                COUNT(DISTINCT ft.transaction_id)                          AS order_count,
+                COUNT(*)                                                   AS line_count,
+                COUNT(DISTINCT ft.user_key) FILTER (WHERE ft.user_key != -1) AS unique_customers
+            FROM {fact} ft
+            JOIN {dates} dd ON ft.date_key = dd.date_key
+            GROUP BY ALL
+        """),
+        ("agg_sales_monthly", ["dim_dates.parquet", "dim_users.parquet"], f"""
+            SELECT
+                dd.year, dd.quarter, dd.month,
+                SUM(ft.amount)                                             AS revenue,
+                COUNT(DISTINCT ft.transaction_id)                          AS order_count,
+                COUNT(*)                                                   AS line_count,
+                COUNT(DISTINCT du.user_id)                                 AS unique_customers
+            FROM {fact} ft
+            JOIN {dates} dd ON ft.date_key = dd.date_key
+            LEFT JOIN {users} du ON ft.user_key = du.surrogate_key
+            GROUP BY ALL
+        """),
+        ("agg_store_daily", [], f"""
+            SELECT
+                ft.date_key, ft.store_key, ft.region,
+                SUM(ft.amount)                                             AS revenue,
+                COUNT(DISTINCT ft.transaction_id)                          AS order_count,
+                COUNT(*)                                                   AS line_count,
+                COUNT(DISTINCT ft.user_key) FILTER (WHERE ft.user_key != -1) AS unique_customers
+            FROM {fact} ft
+            GROUP BY ALL
+        """),
+        ("agg_product_sales", ["dim_products.parquet", "dim_users.parquet"], f"""
+            SELECT
+                dp.product_name, dp.category, dp.price,
+                COUNT(*)                                                   AS units_sold,
+                SUM(ft.amount)                                             AS total_revenue,
+                COUNT(DISTINCT ft.transaction_id)                          AS order_count,
+                COUNT(DISTINCT du.user_id)                                 AS unique_customers
+            FROM {fact} ft
+            JOIN {products} dp ON ft.product_key = dp.product_key
+            LEFT JOIN {users} du ON ft.user_key = du.surrogate_key
+            WHERE ft.product_key != -1
+            GROUP BY ALL
+        """),
+        ("agg_category_monthly", ["dim_dates.parquet", "dim_products.parquet"], f"""
+            SELECT
+                dd.year, dd.quarter, dd.month, dp.category,
+                COUNT(*)                                                   AS units_sold,
+                SUM(ft.amount)                                             AS revenue
+            FROM {fact} ft
+            JOIN {dates} dd ON ft.date_key = dd.date_key
+            JOIN {products} dp ON ft.product_key = dp.product_key
+            WHERE ft.product_key != -1
+            GROUP BY ALL
+        """),
+        # Revenue goes to the city the customer lived in at purchase time
+        ("agg_city_sales", ["dim_users.parquet"], f"""
+            SELECT
+                du.city,
+                COUNT(DISTINCT ft.transaction_id)                          AS order_count,
+                COUNT(*)                                                   AS line_count,
+                SUM(ft.amount)                                             AS total_revenue,
+                COUNT(DISTINCT du.user_id)                                 AS unique_customers
+            FROM {fact} ft
+            JOIN {users} du ON ft.user_key = du.surrogate_key
+            WHERE ft.user_key != -1
+            GROUP BY ALL
+        """),
+    ]
+
+
+def _drop_gold_table(filename: str):
+    """Remove a Gold table so readers fall back instead of seeing stale data."""
+    import shutil
+    path = os.path.join(GOLD_DIR, filename)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.isfile(path):
+        os.remove(path)
+
+
+@retry_with_backoff(max_attempts=3, exceptions=(duckdb.IOException, OSError))
+def build_rollups():
+    """
+    Materialize agg_* rollups from fact_transactions so time-series and top-N
+    KPIs scan a few thousand pre-aggregated rows instead of the full fact table.
+    A rollup whose inputs are missing is removed, never left stale.
+    """
+    if not _gold_exists("fact_transactions.parquet"):
+        print("[StarSchema] No fact_transactions - skipping rollups")
+        return False
+
+    built = []
+    definitions = _rollup_definitions()
+    try:
+        for name, required, select_sql in definitions:
+            filename = f"{name}.parquet"
+            if not all(_gold_exists(dep) for dep in required):
+                _drop_gold_table(filename)
+                continue
+            target = os.path.join(GOLD_DIR, filename).replace("\\", "/")
+            temp_file = f"{target}.tmp"
+            run_metrics.record_read([GOLD_FACT_TXN] + [os.path.join(GOLD_DIR, dep) for dep in required])
+            duckdb_utils.sql(write_policy.copy_statement(name, select_sql, temp_file))
+            os.replace(temp_file, target)
+            run_metrics.record_written(target)
+            built.append(name)
+    except Exception:
+        # Rollups must agree with each other and with the fact table
+        for name, _, _ in definitions:
+            _drop_gold_table(f"{name}.parquet")
+            _drop_gold_table(f"{name}.parquet.tmp")
+        raise
+
+    print(f"[StarSchema] rollups: {', '.join(built) if built else 'none'}")
+    return bool(built)
+
+
+def gold_steps(incremental: Optional[bool] = None) -> list:
+    """
+    Scheduler steps for the Gold builders (dim_users is built by SCD).
+    Dependencies name the Silver cleaners and dim_users too, so the same
+    steps slot into the full pipeline graph; on their own those are ignored.
+    """
+    return [
+        ("dim_products", ["clean_products"], build_dim_products),
+        ("dim_stores", ["clean_transactions"], build_dim_stores),
+        ("dim_dates", ["clean_transactions"], build_dim_dates),
+        ("fact_transactions", ["clean_transactions", "dim_products", "dim_stores", "dim_users"],
+         lambda: build_fact_transactions(incremental)),
+        ("fact_inventory", ["clean_inventory", "dim_products", "dim_stores"], build_fact_inventory),
+        ("fact_shipments", ["clean_shipments", "dim_stores"], build_fact_shipments),
+        ("rollups", ["fact_transactions", "dim_dates", "dim_products", "dim_users"], build_rollups),
+    ]
+
+
+def publish_gold(results: Dict[str, bool]):
+    """Refresh the warehouse and publish a new Gold generation if anything was built."""
     built = [k for k, v in results.items() if v]
     if built:
         print(f"[StarSchema] Silver -> Gold complete. Built: {', '.join(built)}")
     else:
         print("[StarSchema] No Silver data available to build Gold layer.")
-    
+
+    if warehouse.WAREHOUSE_ENABLED and built:
+        try:
+            warehouse.refresh_warehouse(discover_tables(GOLD_DIR))
+        except Exception as e:
+            print(f"[StarSchema] Warehouse refresh failed (KPIs fall back to parquet): {e}")
+            try:
+                warehouse.unpublish_warehouse()
+            except OSError as unpublish_error:
+                # Readers would keep the old snapshot: don't announce new Gold data
+                print(f"[StarSchema] Cannot unpublish the warehouse snapshot, "
+                      f"Gold generation not published: {unpublish_error}")
+                return
+
+    if built:
+        generation = publish_gold_generation(GOLD_DIR)
+        print(f"[StarSchema] Published Gold generation {generation['generation']}")
+
+
+def build_star_schema(incremental: Optional[bool] = None, workers: Optional[int] = None):
+    """Build all Gold-layer tables (excluding dim_users, handled by SCD).
+    Each builder is independent — missing Silver files are skipped. Builders
+    run concurrently once their inputs exist (see scheduler.py).
+
+    Args:
+        incremental: Passed to build_fact_transactions (default: FACT_INCREMENTAL).
+        workers: Builders running at once (default: PIPELINE_WORKERS).
+    """
+    _ensure_gold()
+    outcomes = run_dag(gold_steps(incremental), workers=workers, tag="StarSchema")
+    results = {name: outcome["result"] for name, outcome in outcomes.items()}
+    publish_gold(results)
     return results
 
 
 if __name__ == "__main__":
-    build_star_schema()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RetailNexus Silver -> Gold Star Schema Builder")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Rebuild fact_transactions from all Silver rows instead of appending")
+    args = parser.parse_args()
+
+    build_star_schema(incremental=False if args.full_refresh else None)
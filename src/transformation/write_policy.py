@@ -0,0 +1,66 @@
+"""
+RetailNexus - Gold Write Policy
+Parquet layout for every Gold COPY, per table:
+
+    sort_by         rows are written in this order, so each row group covers
+                    a narrow range of the leading columns and the min/max
+                    statistics let date/store filters skip most row groups
+    row_group_size  rows per row group; facts use smaller groups
+                    (GOLD_FACT_ROW_GROUP_SIZE) so a store filter inside one
+                    date partition can skip groups, not just whole files
+    compression     GOLD_PARQUET_COMPRESSION (zstd) for dimensions, rollups
+                    and state files; facts use GOLD_FACT_COMPRESSION (lz4_raw),
+                    since KPI queries scan them in full and ZSTD decoding
+                    cost more CPU than its smaller files saved
+
+DuckDB writes min/max/null-count statistics for every column chunk and
+dictionary-encodes low-cardinality columns (region, category, keys) on its
+own; the policy only has to keep rows ordered so those statistics are
+selective. Tables without a policy keep their query order and the default
+row groups; SCD2 dimensions already write in (natural key, effective_date)
+order.
+"""
+import os
+from typing import Optional
+
+GOLD_PARQUET_COMPRESSION = os.getenv("GOLD_PARQUET_COMPRESSION", "zstd")
+GOLD_ROW_GROUP_SIZE = int(os.getenv("GOLD_ROW_GROUP_SIZE", "122880"))
+GOLD_FACT_COMPRESSION = os.getenv("GOLD_FACT_COMPRESSION", "lz4_raw")
+GOLD_FACT_ROW_GROUP_SIZE = int(os.getenv("GOLD_FACT_ROW_GROUP_SIZE", "16384"))
+
+_FACT = (GOLD_FACT_ROW_GROUP_SIZE, GOLD_FACT_COMPRESSION)
+_DEFAULT = (GOLD_ROW_GROUP_SIZE, GOLD_PARQUET_COMPRESSION)
+
+# table -> (sort_by, (row_group_size, compression))
+WRITE_POLICIES = {
+    "fact_transactions": (("date_key", "store_key"), _FACT),
+    "fact_transactions_ledger": (("date_key", "transaction_id"), _DEFAULT),
+    "fact_inventory": (("region", "date_key", "store_key"), _FACT),
+    "fact_shipments": (("origin_region", "date_key", "origin_store_key"), _FACT),
+    "dim_products": (("product_key",), _DEFAULT),
+    "dim_stores": (("store_key",), _DEFAULT),
+    "dim_dates": (("date_key",), _DEFAULT),
+    "agg_sales_daily": (("date_key",), _DEFAULT),
+    "agg_sales_monthly": (("year", "month"), _DEFAULT),
+    "agg_store_daily": (("date_key", "store_key"), _DEFAULT),
+    "agg_category_monthly": (("year", "month", "category"), _DEFAULT),
+}
+
+
+def copy_statement(table: str, select_sql: str, target: str, options: Optional[str] = None) -> str:
+    """
+    COPY statement writing `select_sql` to `target` with the table's policy.
+
+    Args:
+        table: Policy name (usually the Gold table name).
+        select_sql: Query producing the rows.
+        target: Output file or directory.
+        options: Extra COPY options, e.g. "PARTITION_BY (date_key)".
+    """
+    sort_by, (row_group_size, compression) = WRITE_POLICIES.get(table, ((), _DEFAULT))
+    if sort_by:
+        select_sql = f"SELECT * FROM ({select_sql}) ORDER BY {', '.join(sort_by)}"
+    parquet = f"FORMAT PARQUET, COMPRESSION {compression}, ROW_GROUP_SIZE {row_group_size}"
+    if options:
+        parquet = f"{parquet}, {options}"
+    return f"COPY ({select_sql}) TO '{target}' ({parquet})"
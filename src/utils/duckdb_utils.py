@@ -0,0 +1,60 @@
+"""
+RetailNexus — Shared DuckDB Engine
+===================================
+One in-memory DuckDB database per process for the transformation steps, with
+a cursor per thread.
+
+Pipeline modules run their SQL through `sql()` instead of `duckdb.sql()`, so
+a long-lived worker reuses the same database (and its warm caches) across
+runs without sharing DuckDB's module-level default connection with API
+threads. Temp tables stay private to the thread that created them.
+
+DUCKDB_THREADS caps the worker threads of the shared database; concurrent
+pipeline steps split that budget instead of each claiming every core.
+"""
+import os
+import threading
+
+import duckdb
+
+_lock = threading.Lock()
+_local = threading.local()
+_engine = {"database": None}
+
+# Thread budget of the shared database (default: DuckDB's own, one per core)
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "0"))
+
+
+def get_database() -> duckdb.DuckDBPyConnection:
+    """The process-wide database, created on first use."""
+    with _lock:
+        if _engine["database"] is None:
+            config = {"threads": DUCKDB_THREADS} if DUCKDB_THREADS > 0 else {}
+            _engine["database"] = duckdb.connect(":memory:", config=config)
+        return _engine["database"]
+
+
+def cursor() -> duckdb.DuckDBPyConnection:
+    """This thread's cursor over the shared database."""
+    database = get_database()
+    current = getattr(_local, "cursor", None)
+    if current is None or getattr(_local, "database", None) is not database:
+        current = database.cursor()
+        _local.cursor, _local.database = current, database
+    return current
+
+
+def sql(query: str) -> duckdb.DuckDBPyRelation:
+    """Drop-in replacement for duckdb.sql() on the shared engine."""
+    return cursor().sql(query)
+
+
+def reset_engine():
+    """Close the shared database; the next call opens a fresh one."""
+    with _lock:
+        database, _engine["database"] = _engine["database"], None
+    if database is not None:
+        try:
+            database.close()
+        except duckdb.Error:
+            pass
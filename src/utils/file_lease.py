@@ -0,0 +1,170 @@
+"""
+RetailNexus — File Lease
+=========================
+Cross-process mutual exclusion through a lease file, used to guarantee a
+single writer for the Bronze -> Silver -> Gold pipeline across the API, the
+stream processor and the orchestrator.
+
+The lease file is created with O_EXCL and records its holder and expiry. A
+background thread renews it while held, so a crashed holder loses it after
+`ttl` seconds (or immediately, on POSIX, once its PID is gone).
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def _read_record(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+class LeaseTimeout(TimeoutError):
+    """The lease could not be acquired in time."""
+
+
+class FileLease:
+    """Exclusive, renewable lease backed by a file."""
+
+    def __init__(self, path: Path, owner: str, ttl: float = 300.0, poll_interval: float = 0.5):
+        """
+        Args:
+            path: Lease file shared by all contenders
+            owner: Human-readable holder name, shown to waiting contenders
+            ttl: Seconds the lease stays valid without renewal
+            poll_interval: Seconds between acquisition attempts while waiting
+        """
+        self.path = Path(path)
+        self.owner = owner
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._token = None
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def _record(self) -> Dict:
+        now = time.time()
+        return {
+            "owner": self.owner,
+            "token": self._token,
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "acquired_at": datetime.now().isoformat(),
+            "expires_at": now + self.ttl,
+        }
+
+    def holder(self) -> Optional[Dict]:
+        """Current lease record, or None if the lease is free."""
+        return _read_record(self.path)
+
+    def _is_stale(self, record: Optional[Dict]) -> bool:
+        if record is None:
+            # Unreadable: being written right now, or corrupt — trust mtime
+            try:
+                return time.time() - self.path.stat().st_mtime > self.ttl
+            except FileNotFoundError:
+                return False
+        if record.get("expires_at", 0) < time.time():
+            return True
+        if os.name != "nt" and record.get("host") == socket.gethostname():
+            try:
+                os.kill(int(record.get("pid", 0)), 0)
+            except ProcessLookupError:
+                return True
+            except (OSError, ValueError):
+                pass
+        return False
+
+    def try_acquire(self) -> bool:
+        """Take the lease if it is free or stale; never blocks."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        token = uuid.uuid4().hex
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                record = self.holder()
+                if not self._is_stale(record):
+                    return False
+                # Move the stale lease aside atomically, then retry O_EXCL
+                stale = self.path.with_name(f"{self.path.name}.{token}.stale")
+                try:
+                    os.replace(self.path, stale)
+                except FileNotFoundError:
+                    continue
+                moved = _read_record(stale)
+                if record and moved and moved.get("token") != record.get("token"):
+                    # Another contender replaced the stale lease first: put theirs back
+                    try:
+                        os.link(stale, self.path)
+                    except OSError:
+                        pass
+                os.remove(stale)
+                continue
+            self._token = token
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._record(), f)
+            self._start_renewer()
+            return True
+        return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` seconds (forever if None) for the lease."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def _start_renewer(self):
+        self._stop.clear()
+        self._renewer = threading.Thread(target=self._renew_loop, name="lease-renewer", daemon=True)
+        self._renewer.start()
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.ttl / 3):
+            record = self.holder()
+            if not record or record.get("token") != self._token:
+                print(f"[Lease] {self.path.name}: lost by {self.owner}")
+                return
+            tmp_path = self.path.with_name(f"{self.path.name}.{self._token}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**record, "expires_at": time.time() + self.ttl}, f)
+            os.replace(tmp_path, self.path)
+
+    def release(self):
+        """Give the lease up (only if this instance still holds it)."""
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        record = self.holder()
+        if record and record.get("token") == self._token:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self._token = None
+
+    @contextmanager
+    def hold(self, timeout: Optional[float] = None):
+        """Context manager around acquire()/release(); raises LeaseTimeout."""
+        if not self.acquire(timeout):
+            holder = self.holder() or {}
+            raise LeaseTimeout(f"{self.path.name} held by {holder.get('owner', 'unknown')} "
+                               f"(pid {holder.get('pid', '?')})")
+        try:
+            yield self
+        finally:
+            self.release()
@@ -0,0 +1,66 @@
+"""
+RetailNexus - Gold Layout
+File layout of the Gold Layer shared by its writers (src/transformation) and
+its readers (src/analytics), so reading Gold never imports the build stack:
+
+    data/gold/_generation.json                   generation marker, bumped
+                                                 after every publish
+    data/gold/<dim>.parquet                      SCD2 base dimension
+    data/gold/_delta/<dim>/delta_<stamp>.parquet SCD2 delta files
+
+Delta rows replace base rows with the same surrogate key (later files win);
+see scd_logic.py for how they are written and compacted.
+"""
+import json
+import os
+from pathlib import Path
+from typing import List
+
+# Bumped after every publish; readers key caches on it (see kpi_cache.py)
+GOLD_GENERATION_FILE = "_generation.json"
+# Delta files per dimension live under an underscore dir discover_tables() skips
+DELTA_DIR = "_delta"
+SCD_CONFIG_FILE = Path(__file__).resolve().parents[2] / "config" / "scd_config.json"
+
+
+def dim_path(dim: str, gold_dir: str) -> str:
+    return os.path.join(gold_dir, f"{dim}.parquet").replace("\\", "/")
+
+
+def delta_dir(dim: str, gold_dir: str) -> str:
+    return os.path.join(gold_dir, DELTA_DIR, dim).replace("\\", "/")
+
+
+def delta_files(dim: str, gold_dir: str) -> List[str]:
+    """Delta files of an SCD2 dimension, oldest first."""
+    path = delta_dir(dim, gold_dir)
+    if not os.path.isdir(path):
+        return []
+    return [f"{path}/{name}" for name in sorted(os.listdir(path)) if name.endswith(".parquet")]
+
+
+def _surrogate_key(table: str) -> str:
+    with open(SCD_CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)[table]["surrogate_key"]
+
+
+def dimension_source(table: str, gold_dir: str) -> str:
+    """
+    DuckDB read expression for a Gold dimension: its parquet file, overlaid
+    with any SCD2 delta files (latest version of each key wins).
+    """
+    base = dim_path(table, gold_dir)
+    deltas = delta_files(table, gold_dir)
+    if not deltas:
+        return f"'{base}'"
+    files = ", ".join(f"'{path}'" for path in deltas)
+    return f"""(
+        SELECT * EXCLUDE (_src) FROM (
+            SELECT *, '' AS _src FROM '{base}'
+            UNION ALL BY NAME
+            SELECT * EXCLUDE (filename), filename AS _src
+            FROM read_parquet([{files}], union_by_name=true, filename=true)
+        )
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY {_surrogate_key(table)} ORDER BY _src DESC) = 1
+    )"""
@@ -0,0 +1,55 @@
+"""
+Tests for the cross-process pipeline run coordinator.
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.transformation import coordinator
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordinator, "PIPELINE_LEASE_FILE", tmp_path / "_pipeline.lease")
+    monkeypatch.setattr(coordinator, "STATE_FILE", tmp_path / "_pipeline_coordinator.json")
+    monkeypatch.setattr(coordinator, "_STATE_LOCK_FILE", tmp_path / "_pipeline_coordinator.lock")
+    monkeypatch.setattr(coordinator, "DEBOUNCE_SECONDS", 0.2)
+    monkeypatch.setattr(coordinator, "_POLL_SECONDS", 0.02)
+    return tmp_path
+
+
+def test_concurrent_triggers_are_merged_into_one_run(state_dir):
+    runs = []
+
+    def runner(triggers):
+        runs.append(sorted(triggers))
+        return {"status": "success", "message": "Pipeline completed", "steps": {}}
+
+    results = {}
+
+    def trigger(name):
+        results[name] = coordinator.request_run(name, runner, owner=name, timeout=10)
+
+    threads = [threading.Thread(target=trigger, args=(f"upload:{i}",)) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert runs == [[f"upload:{i}" for i in range(5)]]
+    assert all(r["status"] == "success" and r["requests"] == 5 for r in results.values())
+    assert sum(1 for r in results.values() if r.get("coalesced")) == 4
+    status = coordinator.coordinator_status()
+    assert status["pending_requests"] == 0 and status["lease_holder"] is None
+
+
+def test_runner_failure_is_reported_to_every_merged_caller(state_dir):
+    def runner(triggers):
+        raise RuntimeError("disk full")
+
+    result = coordinator.request_run("manual", runner, owner="api", timeout=10)
+    assert result["status"] == "error" and "disk full" in result["error"]
+    assert coordinator.coordinator_status()["last_run"]["triggers"] == ["manual"]
@@ -0,0 +1,41 @@
+"""
+Pipeline Engine Tests
+======================
+Checks that a timed-out wait reports the job's state instead of an error and
+that stdout is only wrapped while a run captures output.
+"""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import engine
+
+
+def test_timeout_returns_the_running_job(monkeypatch):
+    release = threading.Event()
+
+    def slow_run(progress=None, trigger="api"):
+        release.wait(5)
+        return {"status": "success", "message": "done", "output": ""}
+
+    monkeypatch.setattr(engine, "_run_captured", slow_run)
+    result = engine.run_pipeline_sync(timeout=0.1, trigger="test")
+    try:
+        assert result["status"] == "running"
+        assert result["job_url"] == f"/api/jobs/{result['job_id']}"
+    finally:
+        release.set()
+    assert engine._job_future(result["job_id"]).result(timeout=5)["status"] == "success"
+    assert engine.get_job(result["job_id"])["status"] == "success"
+
+
+def test_stdout_is_only_teed_while_capturing(capsys):
+    original = sys.stdout
+    with engine._stdout_tee():
+        assert isinstance(sys.stdout, engine._OutputTee)
+        with engine._stdout_tee():
+            pass
+        assert isinstance(sys.stdout, engine._OutputTee)
+    assert sys.stdout is original
@@ -0,0 +1,104 @@
+"""
+Tests for the segmented streaming event log.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.ingestion import event_log
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    log = tmp_path / "log"
+    monkeypatch.setattr(event_log, "STREAM_DIR", tmp_path)
+    monkeypatch.setattr(event_log, "LOG_DIR", log)
+    monkeypatch.setattr(event_log, "INDEX_FILE", log / "index.json")
+    monkeypatch.setattr(event_log, "OFFSETS_DIR", log / "offsets")
+    monkeypatch.setattr(event_log, "ARCHIVE_DIR", log / "archive")
+    monkeypatch.setattr(event_log, "LEGACY_BUFFER", tmp_path / "events.jsonl")
+    monkeypatch.setattr(event_log, "SEGMENT_MAX_BYTES", 200)
+    monkeypatch.setattr(event_log, "_writer", {"index": None})
+    return log
+
+
+def _events(start, count):
+    return [{"event_type": "order_created", "seq": i} for i in range(start, start + count)]
+
+
+def test_segments_roll_and_consumers_read_independently(log_dir):
+    for i in range(0, 20, 4):
+        event_log.append_events(_events(i, 4))
+    assert len(event_log.list_segments()) > 1
+    event_log.register_consumer("b")
+    assert event_log.log_stats()["next_seq"] == 20
+
+    events, position = event_log.read_events("a")
+    assert [e["seq"] for e in events] == list(range(20))
+    event_log.commit("a", position)
+
+    event_log.append_events(_events(20, 2))
+    events, _ = event_log.read_events("a")
+    assert [e["seq"] for e in events] == [20, 21]
+
+    # The registered consumer still sees everything from the oldest segment
+    events, _ = event_log.read_events("b")
+    assert [e["seq"] for e in events] == list(range(22))
+
+
+def test_consumed_sealed_segments_are_retired(log_dir):
+    for i in range(0, 20, 4):
+        event_log.append_events(_events(i, 4))
+    before = len(event_log.list_segments())
+
+    events, position = event_log.read_events("processor")
+    event_log.commit("processor", position)
+
+    segments = event_log.list_segments()
+    assert len(segments) == 1 < before
+    assert event_log.read_events("processor")[0] == []
+
+
+def test_legacy_buffer_is_adopted_as_first_segment(log_dir):
+    legacy = event_log.LEGACY_BUFFER
+    legacy.write_text("".join(json.dumps(e) + "\n" for e in _events(0, 3)))
+
+    event_log.append_events(_events(3, 1))
+    events, _ = event_log.read_events("processor")
+
+    assert not legacy.exists()
+    assert [e["seq"] for e in events] == [0, 1, 2, 3]
+    assert event_log.log_stats()["next_seq"] == 4
+
+
+def test_consumer_lag_counts_uncommitted_bytes_and_events(log_dir):
+    event_log.append_lines([json.dumps(e) for e in _events(0, 10)])
+    lag = event_log.consumer_lag("processor")
+    assert lag["events"] == 10
+    assert lag["bytes"] == sum(p.stat().st_size for p in event_log.list_segments())
+
+    events, position = event_log.read_events("processor")
+    event_log.commit("processor", position)
+    event_log.append_events(_events(10, 3))
+
+    assert [e["seq"] for e in event_log.read_events("processor")[0]] == [10, 11, 12]
+    assert event_log.consumer_lag("processor")["events"] == 3
+
+
+def test_max_bytes_stops_inside_a_segment_on_a_line_boundary(log_dir, monkeypatch):
+    monkeypatch.setattr(event_log, "SEGMENT_MAX_BYTES", 10_000)
+    event_log.append_events(_events(0, 10))
+    assert len(event_log.list_segments()) == 1
+
+    seen = []
+    while True:
+        events, position = event_log.read_events("a", max_bytes=50)
+        if not events:
+            break
+        assert len(events) < 10
+        seen.extend(e["seq"] for e in events)
+        event_log.commit("a", position)
+    assert seen == list(range(10))
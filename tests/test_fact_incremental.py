@@ -0,0 +1,73 @@
+"""
+Incremental fact_transactions Tests
+====================================
+Checks that rows with an unparseable (NULL) timestamp survive incremental
+builds in their own NULL date_key partition.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import star_schema
+from src.utils import duckdb_utils
+
+
+@pytest.fixture
+def lake(tmp_path, monkeypatch):
+    gold = (tmp_path / "gold").as_posix()
+    state = f"{gold}/_fact_transactions_state"
+    ledger = f"{state}/ledger"
+    monkeypatch.setattr(star_schema, "SILVER_DIR", tmp_path.as_posix())
+    monkeypatch.setattr(star_schema, "GOLD_DIR", gold)
+    monkeypatch.setattr(star_schema, "SILVER_TXN", (tmp_path / "transactions.parquet").as_posix())
+    monkeypatch.setattr(star_schema, "GOLD_FACT_TXN", f"{gold}/fact_transactions.parquet")
+    monkeypatch.setattr(star_schema, "FACT_STATE_DIR", state)
+    monkeypatch.setattr(star_schema, "FACT_LEDGER_DIR", ledger)
+    monkeypatch.setattr(star_schema, "FACT_IN_PROGRESS", f"{state}/_in_progress")
+    monkeypatch.setattr(star_schema, "_LEGACY_USER_MAP", f"{state}/map_users.parquet")
+    monkeypatch.setattr(star_schema, "_LEDGER_GLOB",
+                        f"read_parquet('{ledger}/**/*.parquet', hive_partitioning=true)")
+    os.makedirs(gold)
+    return tmp_path
+
+
+def _write_silver(lake: Path, rows: list):
+    """rows: (transaction_id, timestamp or None, amount)"""
+    values = ", ".join(
+        f"('{txn}', 'P1', 'U1', 'S1', {f'TIMESTAMP {ts!r}' if ts else 'NULL::TIMESTAMP'}, {amount}::DOUBLE)"
+        for txn, ts, amount in rows
+    )
+    target = (lake / "transactions.parquet").as_posix()
+    duckdb_utils.sql(f"""
+        COPY (SELECT * FROM (VALUES {values}) v(transaction_id, product_id, user_id, store_id, timestamp, amount))
+        TO '{target}.tmp' (FORMAT PARQUET)
+    """)
+    os.replace(f"{target}.tmp", target)
+
+
+def _fact_rows():
+    return sorted(duckdb_utils.sql(
+        f"SELECT transaction_id, date_key, amount FROM {star_schema._fact_source()}"
+    ).fetchall(), key=str)
+
+
+def test_null_timestamp_rows_are_appended_and_rewritten(lake):
+    _write_silver(lake, [("T1", "2025-01-01 10:00", 1.0), ("T2", None, 2.0), ("T3", "2025-01-02 10:00", 3.0)])
+    star_schema.build_fact_transactions(incremental=False)
+    assert _fact_rows() == sorted([("T1", 20250101, 1.0), ("T2", None, 2.0), ("T3", 20250102, 3.0)], key=str)
+
+    # A rewrite of 20250102 is pending while a NULL-timestamp row is appended
+    _write_silver(lake, [("T1", "2025-01-01 10:00", 1.0), ("T2", None, 2.0), ("T3", "2025-01-02 10:00", 30.0),
+                         ("T4", None, 4.0)])
+    star_schema.build_fact_transactions(incremental=True)
+    assert ("T4", None, 4.0) in _fact_rows()
+
+    # Changing and deleting NULL-timestamp rows rewrites the NULL partition
+    _write_silver(lake, [("T1", "2025-01-01 10:00", 1.0), ("T2", None, 20.0), ("T3", "2025-01-02 10:00", 30.0)])
+    star_schema.build_fact_transactions(incremental=True)
+    assert _fact_rows() == sorted([("T1", 20250101, 1.0), ("T2", None, 20.0), ("T3", 20250102, 30.0)], key=str)
+    assert not os.path.exists(star_schema.FACT_IN_PROGRESS)
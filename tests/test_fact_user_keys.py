@@ -0,0 +1,78 @@
+"""
+Point-in-time user_key Tests
+=============================
+Checks that fact rows resolve user_key to the dim_users version in effect on
+the transaction date, and that a new version only marks later partitions.
+"""
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import star_schema
+from src.utils import duckdb_utils
+
+
+@pytest.fixture
+def key_maps(tmp_path, monkeypatch):
+    monkeypatch.setattr(star_schema, "FACT_STATE_DIR", str(tmp_path).replace("\\", "/"))
+    for dim, (_, _, _, schema) in star_schema._FACT_DIM_MAPS.items():
+        duckdb_utils.sql(f"CREATE OR REPLACE TEMP TABLE fact_map_{dim} ({schema})")
+    yield tmp_path
+    for dim in star_schema._FACT_DIM_MAPS:
+        duckdb_utils.sql(f"DROP TABLE IF EXISTS fact_map_{dim}")
+
+
+def _load_user_versions(tmp_path: Path, rows: list):
+    dim = (tmp_path / "dim_users.parquet").as_posix()
+    pd.DataFrame(rows, columns=["surrogate_key", "user_id", "city", "effective_date"]).to_parquet(dim)
+    query = star_schema._FACT_DIM_MAPS["user_versions"][2].replace("{dim_users}", f"'{dim}'")
+    duckdb_utils.sql(f"CREATE OR REPLACE TEMP TABLE fact_map_user_versions AS {query}")
+
+
+def test_user_key_is_the_version_in_effect_on_the_transaction_date(key_maps):
+    _load_user_versions(key_maps, [
+        (1, "U1", "Austin", date(2025, 3, 1)),
+        (2, "U2", "Dallas", date(2025, 1, 1)),
+        (3, "U1", "Houston", date(2025, 6, 1)),
+        # Two changes on one day: the later version wins
+        (4, "U1", "Phoenix", date(2025, 9, 1)),
+        (5, "U1", "Tucson", date(2025, 9, 1)),
+    ])
+    source = """(SELECT *, 1.0 AS amount, 'P1' AS product_id, 'S1' AS store_id FROM (VALUES
+        ('T1', 'U1', TIMESTAMP '2025-01-15 10:00'),
+        ('T2', 'U1', TIMESTAMP '2025-05-31 23:59'),
+        ('T3', 'U1', TIMESTAMP '2025-06-01 00:00'),
+        ('T4', 'U1', TIMESTAMP '2025-12-01 09:00'),
+        ('T5', 'U2', TIMESTAMP '2025-04-01 09:00'),
+        ('T6', 'U9', TIMESTAMP '2025-04-01 09:00')
+    ) v(transaction_id, user_id, timestamp))"""
+    rows = duckdb_utils.sql(f"""
+        SELECT transaction_id, user_key FROM ({star_schema._fact_select(source)}) ORDER BY transaction_id
+    """).fetchall()
+    # Before signup_date still resolves to the first version; unknown users get -1
+    assert rows == [("T1", 1), ("T2", 1), ("T3", 3), ("T4", 5), ("T5", 2), ("T6", -1)]
+
+
+def test_new_version_only_marks_partitions_from_its_effective_date(key_maps, monkeypatch):
+    ledger = key_maps / "ledger"
+    for date_key, user_id in ((20250101, "U1"), (20250601, "U1"), (20250701, "U2")):
+        (ledger / f"date_key={date_key}").mkdir(parents=True)
+        pd.DataFrame({"user_id": [user_id]}).to_parquet(ledger / f"date_key={date_key}" / "part.parquet")
+    monkeypatch.setattr(star_schema, "_LEDGER_GLOB",
+                        f"read_parquet('{ledger.as_posix()}/**/*.parquet', hive_partitioning=true)")
+
+    _load_user_versions(key_maps, [(1, "U1", "Austin", date(2024, 1, 1)), (2, "U2", "Dallas", date(2024, 1, 1))])
+    duckdb_utils.sql(f"COPY fact_map_user_versions TO '{(key_maps / 'map_user_versions.parquet').as_posix()}'")
+    assert duckdb_utils.sql(star_schema._changed_user_partitions()).fetchall() == []
+
+    _load_user_versions(key_maps, [
+        (1, "U1", "Austin", date(2024, 1, 1)),
+        (2, "U2", "Dallas", date(2024, 1, 1)),
+        (3, "U1", "Houston", date(2025, 6, 1)),
+    ])
+    assert duckdb_utils.sql(star_schema._changed_user_partitions()).fetchall() == [(20250601,)]
@@ -0,0 +1,37 @@
+"""
+Tests for the cross-process pipeline lease.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.utils.file_lease import FileLease, LeaseTimeout
+
+
+def test_lease_is_exclusive_until_released(tmp_path):
+    path = tmp_path / "pipeline.lease"
+    first = FileLease(path, owner="api", poll_interval=0.01)
+    second = FileLease(path, owner="stream_processor", poll_interval=0.01)
+
+    with first.hold(timeout=0):
+        assert second.holder()["owner"] == "api"
+        with pytest.raises(LeaseTimeout):
+            with second.hold(timeout=0.05):
+                pass
+    assert not path.exists()
+    assert second.acquire(timeout=0)
+    second.release()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = tmp_path / "pipeline.lease"
+    path.write_text(json.dumps({"owner": "crashed", "token": "x", "pid": -1,
+                                "host": "elsewhere", "expires_at": time.time() - 1}))
+    lease = FileLease(path, owner="api")
+    assert lease.try_acquire()
+    assert lease.holder()["owner"] == "api"
+    lease.release()
@@ -0,0 +1,102 @@
+"""
+Incremental Bronze -> Silver Cleaning Tests
+============================================
+Checks that manifest-driven incremental cleaning matches a full rebuild.
+"""
+import os
+import sys
+from pathlib import Path
+
+import duckdb
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import cleaner
+
+
+@pytest.fixture
+def lake(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    silver = tmp_path / "silver"
+    raw.mkdir()
+    silver.mkdir()
+    monkeypatch.setattr(cleaner, "RAW_DIR", str(raw))
+    monkeypatch.setattr(cleaner, "SILVER_DIR", str(silver))
+    return raw, silver
+
+
+def _write_transactions(raw: Path, name: str, rows: list):
+    lines = ["transaction_id,user_id,product_id,timestamp,amount,store_id"]
+    lines += [",".join(str(v) for v in row) for row in rows]
+    (raw / name).write_text("\n".join(lines) + "\n")
+
+
+def _silver_rows(silver: Path, entity: str) -> list:
+    path = str(silver / f"{entity}.parquet").replace("\\", "/")
+    return sorted(duckdb.sql(f"SELECT * FROM '{path}'").fetchall())
+
+
+def test_incremental_merge_matches_full_rebuild(lake):
+    raw, silver = lake
+    _write_transactions(raw, "transactions_20250101_000000.csv", [
+        ("T1", "U1", "P1", "2025-01-01 10:00:00", 10.0, "S1"),
+        ("T2", "U2", "P2", "2025-01-01 11:00:00", 20.0, "S1"),
+    ])
+    assert cleaner.clean_transactions(incremental=True)
+
+    _write_transactions(raw, "transactions_20250102_000000.csv", [
+        ("T2", "U2", "P2", "2025-01-01 09:00:00", 25.0, "S2"),  # earlier duplicate wins
+        ("T3", "U3", "P3", "2025-01-02 12:00:00", 30.0, "S2"),
+    ])
+    assert cleaner.clean_transactions(incremental=True)
+    manifest = cleaner.load_manifest()["transactions"]["files"]
+    assert set(manifest) == {"transactions_20250101_000000.csv", "transactions_20250102_000000.csv"}
+    incremental_rows = _silver_rows(silver, "transactions")
+
+    assert cleaner.clean_transactions(incremental=False)
+    assert incremental_rows == _silver_rows(silver, "transactions")
+    assert len(incremental_rows) == 3
+
+
+def test_changed_processed_file_triggers_full_rebuild(lake):
+    raw, silver = lake
+    _write_transactions(raw, "transactions_20250101_000000.csv", [
+        ("T1", "U1", "P1", "2025-01-01 10:00:00", 10.0, "S1"),
+    ])
+    assert cleaner.clean_transactions(incremental=True)
+
+    _write_transactions(raw, "transactions_20250101_000000.csv", [
+        ("T9", "U9", "P9", "2025-01-03 10:00:00", 99.0, "S9"),
+    ])
+    os.utime(raw / "transactions_20250101_000000.csv", (1, 1))
+    files, merge, _ = cleaner._plan_files("transactions", True)
+    assert merge is False
+
+    assert cleaner.clean_transactions(incremental=True)
+    assert [r[0] for r in _silver_rows(silver, "transactions")] == ["T9"]
+
+
+def test_compaction_keeps_silver_and_file_precedence(lake):
+    from src.transformation import compaction
+
+    raw, silver = lake
+    header = "user_id,name,email,city,signup_date\n"
+    # The newer file wins even though the older one has the later signup_date
+    (raw / "users_20250101_000000.csv").write_text(header + "U1,Ann,a@x.io,Paris,2025-01-09\n")
+    (raw / "users_20250102_000000.csv").write_text(header + "U1,Ann,a@x.io,Lyon,2025-01-01\n"
+                                                             "U2,Bob,b@x.io,,2025-01-02\n")
+    assert cleaner.clean_users(incremental=True)
+    before = _silver_rows(silver, "users")
+
+    assert compaction.compact_entity("users", min_files=2) == 2
+    remaining = sorted(p.name for p in raw.iterdir())
+    assert len(remaining) == 1 and cleaner.COMPACTED_MARKER in remaining[0]
+    assert set(cleaner.load_manifest()["users"]["files"]) == set(remaining)
+
+    files, merge, _ = cleaner._plan_files("users", True)
+    assert merge and files == []
+
+    assert cleaner.clean_users(incremental=False)
+    assert _silver_rows(silver, "users") == before
+    assert [r[3] for r in before] == ["Lyon", "Unknown"]
@@ -0,0 +1,35 @@
+"""
+Surrogate Key Registry Tests
+=============================
+Checks that registered keys never shift when members are added or removed.
+"""
+import sys
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import key_registry
+
+
+def _register(tmp_path: Path, product_ids: list) -> dict:
+    members = tmp_path / f"products_{len(list(tmp_path.glob('products_*')))}.parquet"
+    pd.DataFrame({"product_id": product_ids}).to_parquet(members)
+    key_registry.register_keys("dim_products", "product_id", "product_key",
+                               f"'{members.as_posix()}'", str(tmp_path))
+    path = key_registry.registry_path("dim_products", str(tmp_path))
+    return dict(duckdb.sql(f"SELECT product_id, product_key FROM '{path}'").fetchall())
+
+
+def test_new_members_get_new_keys_and_existing_keys_never_shift(tmp_path):
+    assert _register(tmp_path, ["P2", "P3", "P3", None]) == {"P2": 1, "P3": 2}
+    # P1 sorts first but must not renumber P2/P3; P3 leaving keeps its key reserved
+    assert _register(tmp_path, ["P1", "P2"]) == {"P2": 1, "P3": 2, "P1": 3}
+    assert _register(tmp_path, ["P3", "P4"]) == {"P2": 1, "P3": 2, "P1": 3, "P4": 4}
+
+
+def test_registry_is_seeded_from_the_existing_dimension(tmp_path):
+    pd.DataFrame({"product_key": [7, 9], "product_id": ["P1", "P2"]}).to_parquet(tmp_path / "dim_products.parquet")
+    assert _register(tmp_path, ["P1", "P2", "P0"]) == {"P1": 7, "P2": 9, "P0": 10}
@@ -0,0 +1,78 @@
+"""
+Tests for the generation-versioned KPI result cache.
+"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analytics.kpi_cache import KPIResultCache, Uncached
+
+
+def test_results_are_reused_until_generation_changes():
+    cache = KPIResultCache(max_bytes=1024 * 1024)
+    generation = {"value": 1}
+    calls = []
+
+    @cache.memoize(lambda: generation["value"])
+    def compute(limit: int = 10):
+        calls.append(limit)
+        return pd.DataFrame({"x": range(limit)})
+
+    compute()
+    compute(limit=10)
+    assert calls == [10]
+
+    compute(5)
+    assert calls == [10, 5]
+
+    generation["value"] = 2
+    compute()
+    assert calls == [10, 5, 10]
+
+
+def test_no_generation_bypasses_cache():
+    cache = KPIResultCache(max_bytes=1024 * 1024)
+    calls = []
+
+    @cache.memoize(lambda: None)
+    def compute():
+        calls.append(1)
+        return {"total": 1}
+
+    compute()
+    compute()
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_respects_entry_limit_and_copies():
+    cache = KPIResultCache(max_bytes=1024 * 1024, max_entries=2)
+    cache.put("a", pd.DataFrame({"x": [1]}))
+    cache.put("b", pd.DataFrame({"x": [2]}))
+    cache.get("a")
+    cache.put("c", pd.DataFrame({"x": [3]}))
+
+    assert cache.get("b") == (False, None)
+    hit, df = cache.get("a")
+    assert hit
+    df.loc[0, "x"] = 99
+    assert cache.get("a")[1].loc[0, "x"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_fallback_results_are_not_cached():
+    cache = KPIResultCache(max_bytes=1024 * 1024)
+    calls = []
+
+    @cache.memoize(lambda: 1)
+    def compute():
+        calls.append(1)
+        return Uncached({"total": 0})
+
+    assert compute() == {"total": 0}
+    assert compute() == {"total": 0}
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["fallbacks"] == 2
@@ -0,0 +1,63 @@
+"""
+Tests for per-stage pipeline run metrics and the run history.
+"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.transformation import run_metrics
+from src.transformation.scheduler import run_dag
+
+
+def test_stages_record_rows_and_bytes_of_their_own_reads_and_writes(tmp_path):
+    raw = tmp_path / "raw.csv"
+    raw.write_text("id,amount\n1,10\n2,20\n3,30\n")
+    silver = tmp_path / "silver.parquet"
+
+    def clean():
+        run_metrics.record_read(str(raw))
+        pd.DataFrame({"id": [1, 2], "amount": [10, 20]}).to_parquet(silver)
+        run_metrics.record_written(str(silver))
+
+    def build():
+        run_metrics.record_read(str(silver))
+
+    # Outside an instrumented run the calls are no-ops
+    clean()
+
+    with run_metrics.RunMetrics(sample_seconds=0.01) as metrics:
+        outcomes = run_dag(metrics.instrument([("clean", [], clean), ("build", ["clean"], build)]), workers=2)
+
+    assert all(o["status"] == "success" for o in outcomes.values())
+    assert metrics.stages["clean"]["rows_in"] == 3
+    assert metrics.stages["clean"]["rows_out"] == 2
+    assert metrics.stages["clean"]["bytes_read"] == raw.stat().st_size
+    assert metrics.stages["clean"]["bytes_written"] == silver.stat().st_size
+    assert metrics.stages["build"] == {
+        "rows_in": 2, "rows_out": 0, "bytes_read": silver.stat().st_size,
+        "bytes_written": 0, "peak_memory_bytes": metrics.stages["build"]["peak_memory_bytes"],
+    }
+
+
+def test_run_history_is_trimmed_and_exported_for_prometheus(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_metrics, "RUN_HISTORY_FILE", tmp_path / "_run_history.jsonl")
+    monkeypatch.setattr(run_metrics, "RUN_HISTORY_KEEP", 2)
+
+    for status in ("success", "error", "success"):
+        with run_metrics.RunMetrics(sample_seconds=0.01) as metrics:
+            with metrics.stage("clean_users"):
+                pass
+        result = {"status": status, "duration_seconds": 1.5,
+                  "steps": {"clean_users": {"status": status, "seconds": 0.25}}}
+        run_metrics.append_run_history(run_metrics.build_run_record(metrics, result))
+
+    runs = run_metrics.load_run_history()
+    assert [r["status"] for r in runs] == ["success", "error"]
+    assert runs[0]["stages"]["clean_users"]["rows_in"] == 0
+
+    text = run_metrics.prometheus_text()
+    assert 'retailnexus_pipeline_recorded_runs{status="error"} 1' in text
+    assert 'retailnexus_pipeline_stage_seconds{stage="clean_users"} 0.25' in text
+    assert "retailnexus_pipeline_last_run_success 1" in text
@@ -0,0 +1,106 @@
+"""
+Hash-diff SCD Type 2 Tests
+===========================
+Checks that dim_users changes land in delta files and compact back into the base.
+"""
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import scd_logic
+
+
+@pytest.fixture
+def lake(tmp_path, monkeypatch):
+    monkeypatch.setattr(scd_logic, "GOLD_DIR", str(tmp_path / "gold"))
+    monkeypatch.setattr(scd_logic, "SILVER_DIR", str(tmp_path))
+    monkeypatch.setattr(scd_logic, "SCD_COMPACT_DELTAS", 3)
+    return tmp_path
+
+
+def _track(lake: Path, monkeypatch, tracked: list):
+    config = json.loads(scd_logic.SCD_CONFIG_FILE.read_text())
+    config["dim_users"]["tracked_columns"] = tracked
+    (lake / "scd_config.json").write_text(json.dumps(config))
+    monkeypatch.setattr(scd_logic, "SCD_CONFIG_FILE", lake / "scd_config.json")
+
+
+def _write_users(lake: Path, cities: dict, emails: dict = None):
+    pd.DataFrame({
+        "user_id": list(cities),
+        "name": [f"Name {u}" for u in cities],
+        "email": [(emails or {}).get(u, f"{u}@example.com") for u in cities],
+        "city": list(cities.values()),
+        "signup_date": [date(2024, 1, 1)] * len(cities),
+    }).to_parquet(lake / "users.parquet")
+
+
+def _dim_rows():
+    return sorted(duckdb.sql(f"""
+        SELECT surrogate_key, user_id, city, end_date IS NULL, is_current
+        FROM {scd_logic.dimension_source('dim_users')}
+    """).fetchall())
+
+
+def test_only_changed_users_are_written_and_compaction_keeps_the_history(lake):
+    _write_users(lake, {"U1": "Austin", "U2": "Dallas", "U3": None})
+    scd_logic.apply_scd_type_2()
+    base = Path(scd_logic.GOLD_DIR) / "dim_users.parquet"
+    base_mtime = base.stat().st_mtime_ns
+
+    # U2 moves, U3 gets a city (NULL -> value is a change), U4 is new
+    _write_users(lake, {"U1": "Austin", "U2": "Houston", "U3": "Phoenix", "U4": "Austin"})
+    scd_logic.apply_scd_type_2()
+    assert base.stat().st_mtime_ns == base_mtime
+    assert len(scd_logic.delta_files("dim_users")) == 1
+    delta_rows = duckdb.sql(f"SELECT COUNT(*) FROM '{scd_logic.delta_files('dim_users')[0]}'").fetchone()[0]
+    assert delta_rows == 5  # 2 closed + 2 new versions + 1 new user
+
+    expected = [
+        (1, "U1", "Austin", True, True),
+        (2, "U2", "Dallas", False, False),
+        (3, "U3", None, False, False),
+        (4, "U2", "Houston", True, True),
+        (5, "U3", "Phoenix", True, True),
+        (6, "U4", "Austin", True, True),
+    ]
+    assert _dim_rows() == expected
+
+    # Unchanged input writes nothing
+    scd_logic.apply_scd_type_2()
+    assert len(scd_logic.delta_files("dim_users")) == 1
+
+    scd_logic.compact_dimension("dim_users")
+    assert scd_logic.delta_files("dim_users") == []
+    assert _dim_rows() == expected
+
+
+def test_newly_tracked_columns_version_only_rows_that_differ(lake, monkeypatch):
+    _track(lake, monkeypatch, ["city"])
+    _write_users(lake, {"U1": "Austin", "U2": "Dallas"})
+    scd_logic.apply_scd_type_2()
+
+    # Email changes are not tracked yet
+    _write_users(lake, {"U1": "Austin", "U2": "Dallas"}, emails={"U2": "new@example.com"})
+    scd_logic.apply_scd_type_2()
+    assert scd_logic.delta_files("dim_users") == []
+
+    # Tracking email re-hashes the dimension; only U2's email differs from Silver
+    _track(lake, monkeypatch, ["city", "email"])
+    scd_logic.apply_scd_type_2()
+    assert _dim_rows() == [
+        (1, "U1", "Austin", True, True),
+        (2, "U2", "Dallas", False, False),
+        (3, "U2", "Dallas", True, True),
+    ]
+
+    with pytest.raises(ValueError):
+        _track(lake, monkeypatch, ["loyalty_tier"])
+        scd_logic.load_scd_config()
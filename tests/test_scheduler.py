@@ -0,0 +1,55 @@
+"""
+Tests for the pipeline DAG scheduler.
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.transformation.scheduler import run_dag
+
+
+def test_dependencies_order_steps_and_independent_steps_overlap():
+    finished, lock = [], threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def step(name):
+        def run():
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.05)
+            with lock:
+                running["now"] -= 1
+                finished.append(name)
+            return name
+        return run
+
+    results = run_dag([
+        ("fact", ["dim_a", "dim_b"], step("fact")),
+        ("dim_a", ["clean"], step("dim_a")),
+        ("dim_b", ["clean", "not_scheduled"], step("dim_b")),
+        ("clean", [], step("clean")),
+    ], workers=4)
+
+    assert finished[0] == "clean" and finished[-1] == "fact"
+    assert running["peak"] == 2
+    assert list(results) == ["fact", "dim_a", "dim_b", "clean"]
+    assert results["fact"]["result"] == "fact"
+
+
+def test_failed_step_is_reported_and_dependents_still_run():
+    def fail():
+        raise RuntimeError("boom")
+
+    results = run_dag([("a", [], fail), ("b", ["a"], lambda: True)], workers=1)
+    assert results["a"]["status"] == "error" and results["a"]["error"] == "boom"
+    assert results["b"]["status"] == "success" and results["b"]["result"] is True
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        run_dag([("a", ["b"], lambda: 1), ("b", ["a"], lambda: 1)])
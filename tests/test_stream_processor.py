@@ -0,0 +1,70 @@
+"""
+Tests for the stream processor's micro-batches.
+"""
+import sys
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.ingestion import event_log, stream_processor
+
+
+@pytest.fixture
+def stream(tmp_path, monkeypatch):
+    log = tmp_path / "streaming" / "log"
+    monkeypatch.setattr(event_log, "LOG_DIR", log)
+    monkeypatch.setattr(event_log, "INDEX_FILE", log / "index.json")
+    monkeypatch.setattr(event_log, "OFFSETS_DIR", log / "offsets")
+    monkeypatch.setattr(event_log, "ARCHIVE_DIR", log / "archive")
+    monkeypatch.setattr(event_log, "LEGACY_BUFFER", tmp_path / "streaming" / "events.jsonl")
+    monkeypatch.setattr(event_log, "_writer", {"index": None})
+    monkeypatch.setattr(stream_processor, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(stream_processor, "trigger_incremental_pipeline", lambda: None)
+    (tmp_path / "raw").mkdir()
+    event_log.register_consumer(stream_processor.CONSUMER)
+    return tmp_path / "raw"
+
+
+def _orders(start, count):
+    return [{
+        "event_type": "order_created",
+        "transaction_id": f"T{i}",
+        "user_id": "U1",
+        "store_id": "S1",
+        "timestamp": "2025-01-01T10:00:00",
+        "products": [{"product_id": "P1", "amount": 1.0}],
+    } for i in range(start, start + count)]
+
+
+def _bronze_ids(raw: Path):
+    files = sorted(raw.glob("transactions_stream_*.parquet"))
+    return files, sorted(pq.read_table(files).column("transaction_id").to_pylist())
+
+
+def test_batches_in_the_same_second_get_their_own_bronze_files(stream):
+    event_log.append_events(_orders(0, 3))
+    assert stream_processor.process_micro_batch() == 3
+    event_log.append_events(_orders(3, 2))
+    assert stream_processor.process_micro_batch() == 2
+
+    files, ids = _bronze_ids(stream)
+    assert len(files) == 2
+    assert ids == sorted(f"T{i}" for i in range(5))
+
+
+def test_a_backlog_drains_in_capped_batches(stream, monkeypatch):
+    event_log.append_events(_orders(0, 20))
+    monkeypatch.setattr(stream_processor, "STREAM_BATCH_MAX_BYTES", 500)
+
+    batches = []
+    while True:
+        processed = stream_processor.process_micro_batch()
+        if not processed:
+            break
+        batches.append(processed)
+    assert len(batches) > 1 and max(batches) < 20
+
+    _, ids = _bronze_ids(stream)
+    assert ids == sorted(f"T{i}" for i in range(20))
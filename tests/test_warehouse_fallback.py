@@ -0,0 +1,57 @@
+"""
+Warehouse Fallback Tests
+=========================
+Checks that a failed warehouse refresh unpublishes the old snapshot, so KPIs
+served under the new Gold generation come from the new Gold parquet.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.analytics import kpi_queries, warehouse
+from src.transformation import star_schema
+from src.utils import duckdb_utils
+
+
+@pytest.fixture
+def lake(tmp_path, monkeypatch):
+    gold = tmp_path / "gold"
+    gold.mkdir()
+    monkeypatch.setenv("RETAILNEXUS_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(star_schema, "GOLD_DIR", gold.as_posix())
+    monkeypatch.setattr(warehouse, "WAREHOUSE_ENABLED", True)
+    monkeypatch.setattr(warehouse, "WAREHOUSE_DIR", tmp_path / "warehouse")
+    monkeypatch.setattr(warehouse, "CURRENT_POINTER", tmp_path / "warehouse" / "CURRENT")
+    kpi_queries.clear_kpi_cache()
+    yield gold
+    warehouse.close_read_connection()
+    kpi_queries.clear_kpi_cache()
+
+
+def _write_fact(gold: Path, amount: float):
+    target = (gold / "fact_transactions.parquet").as_posix()
+    duckdb_utils.sql(f"""
+        COPY (SELECT 'T1' AS transaction_id, 1 AS user_key, {amount}::DOUBLE AS amount)
+        TO '{target}.tmp' (FORMAT PARQUET)
+    """)
+    os.replace(f"{target}.tmp", target)
+
+
+def test_failed_refresh_serves_the_new_gold_parquet(lake, monkeypatch):
+    _write_fact(lake, 10.0)
+    star_schema.publish_gold({"fact_transactions": True})
+    assert warehouse.current_snapshot() is not None
+    assert kpi_queries.compute_summary_kpis()["total_revenue"] == 10.0
+
+    def broken_refresh(tables):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(warehouse, "refresh_warehouse", broken_refresh)
+    _write_fact(lake, 25.0)
+    star_schema.publish_gold({"fact_transactions": True})
+    assert warehouse.current_snapshot() is None
+    assert kpi_queries.compute_summary_kpis()["total_revenue"] == 25.0
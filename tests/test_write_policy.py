@@ -0,0 +1,46 @@
+"""
+Gold Write Policy Tests
+========================
+Checks that policy writes are sorted into row groups whose statistics let
+date/store filters skip data.
+"""
+import sys
+from pathlib import Path
+
+import duckdb
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transformation import write_policy
+
+
+def test_fact_rows_are_sorted_into_skippable_row_groups(tmp_path, monkeypatch):
+    monkeypatch.setitem(write_policy.WRITE_POLICIES, "fact_transactions",
+                        (("date_key", "store_key"), (2048, "zstd")))
+    target = (tmp_path / "fact").as_posix()
+    rows = """
+        SELECT (i % 2 + 20250101)::INTEGER AS date_key, (i * 7 % 10)::INTEGER AS store_key, i::DOUBLE AS amount
+        FROM range(100000) t(i)
+    """
+    duckdb.sql(write_policy.copy_statement("fact_transactions", rows, target, "PARTITION_BY (date_key)"))
+
+    stats = duckdb.sql(f"""
+        SELECT file_name, row_group_id, compression, stats_min::INTEGER, stats_max::INTEGER
+        FROM parquet_metadata('{target}/*/*.parquet')
+        WHERE path_in_schema = 'store_key'
+        ORDER BY file_name, row_group_id
+    """).fetchall()
+    assert {row[2] for row in stats} == {"ZSTD"}
+    assert len(stats) >= 20
+    # Sorted within each partition: row groups cover ascending ranges of at
+    # most two neighbouring stores (each partition holds every other store)
+    for file_name in {row[0] for row in stats}:
+        groups = [(lo, hi) for name, _, _, lo, hi in stats if name == file_name]
+        assert groups == sorted(groups)
+        assert all(hi - lo <= 2 for lo, hi in groups)
+
+
+def test_tables_without_a_policy_keep_their_order():
+    sql = write_policy.copy_statement("agg_city_sales", "SELECT 1 AS x", "/tmp/x.parquet")
+    assert "ORDER BY" not in sql
+    assert f"COMPRESSION {write_policy.GOLD_PARQUET_COMPRESSION}" in sql